@@ -0,0 +1,19 @@
+# Generated by Django 5.0.3 on 2026-10-19 16:25
+
+import apps.core.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0002_employeeprofile_address_employeeprofile_city_and_more'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='employeeprofile',
+            name='contract_document',
+            field=models.FileField(blank=True, null=True, storage=apps.core.storage.get_private_storage, upload_to='contracts/', verbose_name='Document de contrat'),
+        ),
+    ]
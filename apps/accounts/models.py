@@ -1,6 +1,8 @@
 from django.contrib.auth.models import AbstractUser
 from django.db import models
 
+from apps.core.storage import get_private_storage
+
 class User(AbstractUser):
     class Role(models.TextChoices):
         SUPERADMIN = 'SUPERADMIN', 'Super Administrateur'
@@ -18,6 +20,12 @@ class User(AbstractUser):
     phone = models.CharField(max_length=30, blank=True)
     is_employee = models.BooleanField(default=False)
 
+    class Meta(AbstractUser.Meta):
+        indexes = [
+            # Destinataires des notifications staff (get_staff_recipient_ids)
+            models.Index(fields=['is_staff', 'is_active'], name='user_staff_active_idx'),
+        ]
+
     def is_admin_role(self):
         return self.role in {self.Role.SUPERADMIN, self.Role.MANAGER, self.Role.MODERATOR}
 
@@ -60,7 +68,9 @@ class EmployeeProfile(models.Model):
     # 2. Infos contractuelles
     salary = models.DecimalField("Salaire (brut / net)", max_digits=10, decimal_places=2, blank=True, null=True)
     contract_type = models.CharField("Type de contrat", max_length=20, choices=ContractTypeChoices.choices, blank=True)
-    contract_document = models.FileField("Document de contrat", upload_to='contracts/', blank=True, null=True)
+    contract_document = models.FileField(
+        "Document de contrat", upload_to='contracts/', storage=get_private_storage, blank=True, null=True
+    )
     years_of_experience = models.PositiveIntegerField("Années d'expérience", blank=True, null=True)
     education_level = models.CharField("Niveau d'études", max_length=20, choices=EducationLevelChoices.choices, blank=True)
     diploma = models.CharField("Diplômes principaux", max_length=255, blank=True)
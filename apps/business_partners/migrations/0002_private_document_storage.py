@@ -0,0 +1,29 @@
+# Generated by Django 5.0.3 on 2026-10-19 16:25
+
+import apps.core.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('business_partners', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='commissionpayment',
+            name='receipt',
+            field=models.FileField(blank=True, storage=apps.core.storage.get_private_storage, upload_to='partners/payments/', verbose_name='Reçu/Preuve'),
+        ),
+        migrations.AlterField(
+            model_name='contract',
+            name='contract_file',
+            field=models.FileField(blank=True, storage=apps.core.storage.get_private_storage, upload_to='partners/contracts/', verbose_name='Contrat signé'),
+        ),
+        migrations.AlterField(
+            model_name='partnerapplication',
+            name='id_document',
+            field=models.FileField(blank=True, storage=apps.core.storage.get_private_storage, upload_to='partners/documents/', verbose_name='Copie de la pièce'),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.0.3 on 2026-10-19 16:27
+
+import apps.core.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('business_partners', '0002_private_document_storage'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='contract',
+            name='contract_file',
+            field=models.FileField(blank=True, storage=apps.core.storage.get_private_cas_storage, upload_to='partners/contracts/', verbose_name='Contrat signé'),
+        ),
+        migrations.AlterField(
+            model_name='partnerapplication',
+            name='id_document',
+            field=models.FileField(blank=True, storage=apps.core.storage.get_private_cas_storage, upload_to='partners/documents/', verbose_name='Copie de la pièce'),
+        ),
+    ]
@@ -3,6 +3,8 @@ from django.contrib.auth import get_user_model
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.utils import timezone
 
+from apps.core.storage import get_private_cas_storage, get_private_storage
+
 User = get_user_model()
 
 
@@ -58,6 +60,7 @@ class PartnerApplication(models.Model):
     id_document = models.FileField(
         "Copie de la pièce",
         upload_to='partners/documents/',
+        storage=get_private_cas_storage,
         blank=True
     )
     
@@ -301,6 +304,7 @@ class Contract(models.Model):
     contract_file = models.FileField(
         "Contrat signé",
         upload_to='partners/contracts/',
+        storage=get_private_cas_storage,
         blank=True
     )
     
@@ -385,6 +389,7 @@ class CommissionPayment(models.Model):
     receipt = models.FileField(
         "Reçu/Preuve",
         upload_to='partners/payments/',
+        storage=get_private_storage,
         blank=True
     )
     
@@ -1,8 +1,11 @@
 from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.crypto import get_random_string
 from django.utils.text import slugify
 from .models import BusinessPartner, PartnerApplication, Region
 import random
-import string
 
 User = get_user_model()
 
@@ -19,6 +22,7 @@ def generate_partner_code(city_name):
     return f"BF-{city_code}-{count:03d}"
 
 
+@transaction.atomic
 def activate_partner(application, admin_user):
     """
     Active un partenaire après approbation de sa candidature
@@ -33,12 +37,12 @@ def activate_partner(application, admin_user):
     if User.objects.filter(username=username).exists():
         username = f"{username}_{random.randint(1000, 9999)}"
     
-    # Créer l'utilisateur
-    password = ''.join(random.choices(string.ascii_letters + string.digits, k=12))
+    # Créer l'utilisateur : mot de passe aléatoire jamais communiqué, le partenaire
+    # choisit le sien via le lien envoyé (ou « Mot de passe oublié » s'il a expiré)
     user = User.objects.create_user(
         username=username,
         email=application.email,
-        password=password,
+        password=get_random_string(32),
         first_name=application.full_name.split()[0],
         last_name=' '.join(application.full_name.split()[1:]) if len(application.full_name.split()) > 1 else '',
     )
@@ -60,9 +64,9 @@ def activate_partner(application, admin_user):
     application.reviewed_at = timezone.now()
     application.save()
     
-    # Envoyer les identifiants par email
+    # Envoyer le lien de création du mot de passe (mis en file dans la même transaction)
     from apps.notifications.emailing import send_partner_activation_email
-    send_partner_activation_email(partner, password)
+    send_partner_activation_email(partner)
     
     return partner
 
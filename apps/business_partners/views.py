@@ -2,6 +2,7 @@ from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
 from django.core.paginator import Paginator
+from django.db import transaction
 from django.db.models import Sum, Q
 from django.utils import timezone
 from .models import (
@@ -363,22 +364,23 @@ def admin_validate_contract(request, pk):
         action = request.POST.get('action')
         
         if action == 'validate':
-            contract.status = 'validated'
-            contract.validated_by = request.user
-            contract.validated_at = timezone.now()
-            contract.save()
-            
-            # Mettre à jour les stats du partenaire
-            partner = contract.partner
-            partner.total_contracts += 1
-            partner.total_revenue += contract.contract_amount
-            partner.total_commission_earned += contract.commission_amount
-            partner.last_contract_at = timezone.now()
-            partner.save()
-            
-            # Notification au partenaire
-            from apps.notifications.services import notify_contract_validated
-            notify_contract_validated(contract)
+            with transaction.atomic():
+                contract.status = 'validated'
+                contract.validated_by = request.user
+                contract.validated_at = timezone.now()
+                contract.save()
+
+                # Mettre à jour les stats du partenaire
+                partner = contract.partner
+                partner.total_contracts += 1
+                partner.total_revenue += contract.contract_amount
+                partner.total_commission_earned += contract.commission_amount
+                partner.last_contract_at = timezone.now()
+                partner.save()
+
+                # Notification au partenaire (email mis en file dans la même transaction)
+                from apps.notifications.emailing import notify_contract_validated
+                notify_contract_validated(contract)
             
             messages.success(request, f"✅ Contrat validé ! Commission : {contract.commission_amount:,.0f} FCFA")
         
@@ -1,3 +1,19 @@
 from django.contrib import admin
 
-# Register your models here.
+from .models import ImageDerivatives, StoredBlob
+
+
+@admin.register(StoredBlob)
+class StoredBlobAdmin(admin.ModelAdmin):
+    list_display = ("name", "storage", "size", "ref_count", "created_at")
+    list_filter = ("storage",)
+    search_fields = ("name",)
+    readonly_fields = ("storage", "name", "size", "ref_count", "created_at")
+
+
+@admin.register(ImageDerivatives)
+class ImageDerivativesAdmin(admin.ModelAdmin):
+    list_display = ("name", "status", "attempts", "next_attempt_at", "updated_at")
+    list_filter = ("status",)
+    search_fields = ("name",)
+    readonly_fields = ("name", "derivatives", "attempts", "last_error", "updated_at")
@@ -5,3 +5,9 @@ class CoreConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.core'
     label = 'core'
+
+    def ready(self):
+        from apps.core.images import connect_signals
+        from apps.core.storage import connect_reference_signals
+        connect_signals()  # Déclinaisons responsive des images uploadées
+        connect_reference_signals()  # Références des fichiers en stockage par contenu
@@ -0,0 +1,389 @@
+# apps/core/channel_layers.py
+"""
+Couche de canaux (Channels) partagée entre plusieurs processus ASGI d'une même
+machine, sans Redis.
+
+Un petit serveur, le hub (commande run_channel_hub), écoute sur une socket Unix
+et détient les files de messages et les groupes. Chaque processus worker s'y
+connecte via HubChannelLayer : un message envoyé depuis un worker est remis à
+un consommateur d'un autre worker. Comme pour les autres couches, les messages
+expirent (`expiry`), les files sont bornées (`capacity`, `channel_capacity` ->
+ChannelFull) et les appartenances aux groupes expirent (`group_expiry`).
+
+Les messages doivent être sérialisables en JSON.
+
+Protocole : trames [longueur sur 4 octets][JSON].
+- requête  : {"id": n, "op": "send" | "receive" | "group_add" | ..., ...}
+- réponse  : {"id": n, "result": ...} ou {"id": n, "error": "full"}
+Un message remis à un `receive` annulé entre-temps (consommateur déconnecté)
+est perdu, comme avec la couche en mémoire.
+"""
+import asyncio
+import json
+import os
+import re
+import struct
+import time
+import uuid
+import weakref
+from collections import deque
+
+from channels.exceptions import ChannelFull
+from channels.layers import BaseChannelLayer
+
+DEFAULT_HUB_SOCKET = "/tmp/oloustream-channels.sock"
+HUB_CLEANUP_INTERVAL = 1.0  # secondes
+MAX_FRAME_SIZE = 4 * 1024 * 1024
+
+_HEADER = struct.Struct("!I")
+
+
+async def _read_frame(reader):
+    (size,) = _HEADER.unpack(await reader.readexactly(_HEADER.size))
+    if size > MAX_FRAME_SIZE:
+        raise ValueError(f"Trame trop grande ({size} octets)")
+    return json.loads(await reader.readexactly(size))
+
+
+def _write_frame(writer, payload):
+    data = json.dumps(payload, separators=(",", ":")).encode()
+    writer.write(_HEADER.pack(len(data)) + data)
+
+
+# ---------- HUB (processus serveur) ----------
+
+class _HubClient:
+    """Une connexion de worker : sa configuration et ses `receive` en attente."""
+
+    def __init__(self, writer):
+        self.writer = writer
+        self.expiry = 60
+        self.group_expiry = 86400
+        self.capacity = 100
+        self.channel_capacity = []
+        self.waiting = {}  # id de requête -> canal
+
+    def configure(self, expiry, group_expiry, capacity, channel_capacity):
+        self.expiry = expiry
+        self.group_expiry = group_expiry
+        self.capacity = capacity
+        self.channel_capacity = [(re.compile(pattern), value) for pattern, value in channel_capacity]
+
+    def get_capacity(self, channel):
+        for pattern, value in self.channel_capacity:
+            if pattern.match(channel):
+                return value
+        return self.capacity
+
+
+class ChannelHub:
+    """Files de messages, consommateurs en attente et groupes, en mémoire du hub."""
+
+    def __init__(self):
+        self.queues = {}   # canal -> deque[(expire_à, message)]
+        self.waiters = {}  # canal -> deque[(client, id de requête)]
+        self.groups = {}   # groupe -> {canal: expire_à}
+
+    def _pop_waiter(self, channel):
+        waiters = self.waiters.get(channel)
+        while waiters:
+            client, request_id = waiters.popleft()
+            if client.waiting.pop(request_id, None) is not None and not client.writer.is_closing():
+                if not waiters:
+                    del self.waiters[channel]
+                return client, request_id
+        self.waiters.pop(channel, None)
+        return None
+
+    def _pop_message(self, channel, now):
+        queue = self.queues.get(channel)
+        message = None
+        while queue:
+            expires_at, candidate = queue.popleft()
+            if expires_at > now:
+                message = candidate
+                break
+        if not queue:
+            self.queues.pop(channel, None)
+        return message
+
+    def deliver(self, channel, message, expiry, capacity, now):
+        """Remet le message à un consommateur en attente, sinon le met en file. False si file pleine."""
+        waiter = self._pop_waiter(channel)
+        if waiter is not None:
+            client, request_id = waiter
+            _write_frame(client.writer, {"id": request_id, "result": message})
+            return True
+        queue = self.queues.setdefault(channel, deque())
+        while queue and queue[0][0] <= now:
+            queue.popleft()
+        if len(queue) >= capacity:
+            return False
+        queue.append((now + expiry, message))
+        return True
+
+    def handle_request(self, client, request):
+        """Traite une requête ; retourne la réponse, ou None (réponse différée ou inutile)."""
+        op = request["op"]
+        request_id = request.get("id")
+        now = time.monotonic()
+
+        if op == "hello":
+            client.configure(request["expiry"], request["group_expiry"], request["capacity"], request["channel_capacity"])
+            return None
+
+        if op == "send":
+            channel = request["channel"]
+            if not self.deliver(channel, request["message"], client.expiry, client.get_capacity(channel), now):
+                return {"id": request_id, "error": "full"}
+            return {"id": request_id, "result": None}
+
+        if op == "receive":
+            channel = request["channel"]
+            message = self._pop_message(channel, now)
+            if message is not None:
+                return {"id": request_id, "result": message}
+            self.waiters.setdefault(channel, deque()).append((client, request_id))
+            client.waiting[request_id] = channel
+            return None
+
+        if op == "cancel":
+            # Le waiter reste dans la deque du canal ; il est ignoré à la remise (_pop_waiter)
+            client.waiting.pop(request["target"], None)
+            return None
+
+        if op == "group_add":
+            self.groups.setdefault(request["group"], {})[request["channel"]] = now + client.group_expiry
+            return {"id": request_id, "result": None}
+
+        if op == "group_discard":
+            members = self.groups.get(request["group"])
+            if members is not None:
+                members.pop(request["channel"], None)
+                if not members:
+                    del self.groups[request["group"]]
+            return {"id": request_id, "result": None}
+
+        if op == "group_send":
+            # Comme les autres couches : un membre dont la file est pleine est ignoré
+            for channel, expires_at in list(self.groups.get(request["group"], {}).items()):
+                if expires_at > now:
+                    self.deliver(channel, request["message"], client.expiry, client.get_capacity(channel), now)
+            return {"id": request_id, "result": None}
+
+        if op == "flush":
+            self.queues.clear()
+            self.groups.clear()
+            return {"id": request_id, "result": None}
+
+        return {"id": request_id, "error": f"opération inconnue : {op}"}
+
+    def drop_client(self, client):
+        client.waiting.clear()
+
+    def cleanup(self, now=None):
+        """Retire les messages et appartenances de groupe expirés."""
+        now = now if now is not None else time.monotonic()
+        for channel in list(self.queues):
+            queue = self.queues[channel]
+            while queue and queue[0][0] <= now:
+                queue.popleft()
+            if not queue:
+                del self.queues[channel]
+        for channel in list(self.waiters):
+            waiters = self.waiters[channel]
+            if not any(request_id in client.waiting for client, request_id in waiters):
+                del self.waiters[channel]
+        for group in list(self.groups):
+            members = self.groups[group]
+            for channel in [c for c, expires_at in members.items() if expires_at <= now]:
+                del members[channel]
+            if not members:
+                del self.groups[group]
+
+    async def handle_connection(self, reader, writer):
+        client = _HubClient(writer)
+        try:
+            while True:
+                request = await _read_frame(reader)
+                response = self.handle_request(client, request)
+                if response is not None:
+                    _write_frame(writer, response)
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError, KeyError, ValueError):
+            pass
+        finally:
+            self.drop_client(client)
+            writer.close()
+
+    async def serve(self, path=DEFAULT_HUB_SOCKET, *, started=None):
+        """Écoute sur la socket Unix `path` jusqu'à annulation."""
+        if os.path.exists(path):
+            os.unlink(path)  # socket d'un hub précédent
+        server = await asyncio.start_unix_server(self.handle_connection, path)
+        os.chmod(path, 0o660)
+        if started is not None:
+            started()
+        try:
+            async with server:
+                while True:
+                    await asyncio.sleep(HUB_CLEANUP_INTERVAL)
+                    self.cleanup()
+        finally:
+            if os.path.exists(path):
+                os.unlink(path)
+
+
+# ---------- COUCHE CÔTÉ WORKER ----------
+
+class _HubConnection:
+    """Connexion d'un worker au hub, propre à une boucle asyncio."""
+
+    def __init__(self, path, hello):
+        self.path = path
+        self.hello = hello
+        self.writer = None
+        self.closed = False
+        self.pending = {}
+        self.next_id = 0
+        self._lock = asyncio.Lock()
+
+    async def open(self):
+        if self.writer is not None:
+            return
+        async with self._lock:
+            if self.writer is not None:
+                return
+            reader, writer = await asyncio.open_unix_connection(self.path)
+            _write_frame(writer, {"op": "hello", **self.hello})
+            self.writer = writer
+            self._reader_task = asyncio.create_task(self._read_responses(reader))
+
+    async def _read_responses(self, reader):
+        try:
+            while True:
+                response = await _read_frame(reader)
+                future = self.pending.pop(response["id"], None)
+                if future is None or future.done():
+                    continue
+                if response.get("error") == "full":
+                    future.set_exception(ChannelFull())
+                elif "error" in response:
+                    future.set_exception(RuntimeError(response["error"]))
+                else:
+                    future.set_result(response.get("result"))
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass
+        finally:
+            self.closed = True
+            for future in self.pending.values():
+                if not future.done():
+                    future.set_exception(ConnectionError("Connexion au hub de canaux perdue"))
+            self.pending.clear()
+            self.writer.close()
+
+    async def request(self, op, **params):
+        self.next_id += 1
+        request_id = self.next_id
+        future = asyncio.get_running_loop().create_future()
+        self.pending[request_id] = future
+        _write_frame(self.writer, {"id": request_id, "op": op, **params})
+        try:
+            await self.writer.drain()
+            return await future
+        except asyncio.CancelledError:
+            if self.pending.pop(request_id, None) is not None and not self.closed:
+                _write_frame(self.writer, {"op": "cancel", "target": request_id})
+            raise
+
+    async def close(self):
+        if self.writer is not None and not self.closed:
+            self.writer.close()
+            await self._reader_task
+
+
+class HubChannelLayer(BaseChannelLayer):
+    """
+    Couche de canaux multi-processus adossée au hub (socket Unix).
+
+    CHANNEL_LAYERS = {"default": {
+        "BACKEND": "apps.core.channel_layers.HubChannelLayer",
+        "CONFIG": {"path": "/run/oloustream/channels.sock"},
+    }}
+    """
+
+    extensions = ["groups", "flush"]
+
+    def __init__(
+        self,
+        path=DEFAULT_HUB_SOCKET,
+        expiry=60,
+        group_expiry=86400,
+        capacity=100,
+        channel_capacity=None,
+        **kwargs,
+    ):
+        super().__init__(expiry=expiry, capacity=capacity, channel_capacity=channel_capacity, **kwargs)
+        self.path = path
+        self.group_expiry = group_expiry
+        self.client_prefix = uuid.uuid4().hex[:12]
+        self._hello = {
+            "expiry": expiry,
+            "group_expiry": group_expiry,
+            "capacity": capacity,
+            "channel_capacity": [(pattern.pattern, value) for pattern, value in self.channel_capacity],
+        }
+        # Une connexion par boucle (async_to_sync peut en créer plusieurs)
+        self._connections = weakref.WeakKeyDictionary()
+
+    async def _connection(self):
+        loop = asyncio.get_running_loop()
+        # Boucles terminées (async_to_sync) : leur connexion a été fermée avec elles
+        for stale in [other for other, connection in self._connections.items() if connection.closed]:
+            del self._connections[stale]
+        connection = self._connections.get(loop)
+        if connection is None:
+            connection = _HubConnection(self.path, self._hello)
+            self._connections[loop] = connection
+        await connection.open()
+        return connection
+
+    async def _request(self, op, **params):
+        connection = await self._connection()
+        return await connection.request(op, **params)
+
+    async def send(self, channel, message):
+        assert isinstance(message, dict), "message is not a dict"
+        assert self.valid_channel_name(channel), "Channel name not valid"
+        assert "__asgi_channel__" not in message
+        await self._request("send", channel=channel, message=message)
+
+    async def receive(self, channel):
+        assert self.valid_channel_name(channel)
+        return await self._request("receive", channel=channel)
+
+    async def new_channel(self, prefix="specific"):
+        return f"{prefix}.{self.client_prefix}!{uuid.uuid4().hex}"
+
+    async def group_add(self, group, channel):
+        assert self.valid_group_name(group), "Group name not valid"
+        assert self.valid_channel_name(channel), "Channel name not valid"
+        await self._request("group_add", group=group, channel=channel)
+
+    async def group_discard(self, group, channel):
+        assert self.valid_group_name(group), "Group name not valid"
+        assert self.valid_channel_name(channel), "Channel name not valid"
+        await self._request("group_discard", group=group, channel=channel)
+
+    async def group_send(self, group, message):
+        assert isinstance(message, dict), "Message is not a dict"
+        assert self.valid_group_name(group), "Group name not valid"
+        await self._request("group_send", group=group, message=message)
+
+    async def flush(self):
+        await self._request("flush")
+
+    async def close(self):
+        connection = self._connections.pop(asyncio.get_running_loop(), None)
+        if connection is not None:
+            await connection.close()
@@ -0,0 +1,62 @@
+# apps/core/documents.py
+"""
+Documents privés téléchargeables (contrats, pièces d'identité, CV, reçus).
+
+Chaque type est déclaré dans PROTECTED_DOCUMENTS avec le champ fichier et la
+règle d'accès ; le staff a accès à tout, les propriétaires à leurs documents.
+"""
+from django.apps import apps
+
+
+def _is_owner(*path):
+    """Règle d'accès : request.user == objet.<path> (attributs chaînés)."""
+    def check(user, obj):
+        value = obj
+        for attr in path:
+            value = getattr(value, attr, None)
+            if value is None:
+                return False
+        return value == user
+    return check
+
+
+# type -> (modèle, champ fichier, règle propriétaire, select_related)
+PROTECTED_DOCUMENTS = {
+    "contrat-partenaire": (
+        "business_partners.Contract", "contract_file", _is_owner("partner", "user"), ("partner__user",),
+    ),
+    "contrat-employe": (
+        "accounts.EmployeeProfile", "contract_document", _is_owner("user"), ("user",),
+    ),
+    "piece-identite": (
+        "business_partners.PartnerApplication", "id_document", _is_owner("partner_profile", "user"), (),
+    ),
+    "cv": (
+        "services_app.JobApplication", "cv", _is_owner("user"), ("user",),
+    ),
+    "recu-commission": (
+        "business_partners.CommissionPayment", "receipt", _is_owner("partner", "user"), ("partner__user",),
+    ),
+}
+
+
+def get_protected_document(kind, pk):
+    """
+    Retourne (objet, FieldFile) ou None si le type / l'objet / le fichier n'existe pas.
+    """
+    if kind not in PROTECTED_DOCUMENTS:
+        return None
+    model_label, field_name, _, related = PROTECTED_DOCUMENTS[kind]
+    model = apps.get_model(model_label)
+    obj = model.objects.select_related(*related).filter(pk=pk).first()
+    if obj is None or not getattr(obj, field_name):
+        return None
+    return obj, getattr(obj, field_name)
+
+
+def can_access_document(user, kind, obj):
+    if not user.is_authenticated or not user.is_active:
+        return False
+    if user.is_staff:
+        return True
+    return PROTECTED_DOCUMENTS[kind][2](user, obj)
@@ -0,0 +1,204 @@
+# apps/core/images.py
+"""
+Déclinaisons responsive des images uploadées (WebP + JPEG à largeurs fixes).
+
+Les fichiers sont écrits à côté de l'original, nommés d'après le contenu :
+    studios/plateau.jpg -> studios/plateau.<hash>.640w.webp
+Un même contenu produit donc toujours les mêmes noms (génération idempotente,
+cache navigateur/CDN long possible). Génération à l'enregistrement du modèle
+(signal post_save) ou à la première demande du template tag.
+
+La liste des déclinaisons est enregistrée en base (ImageDerivatives), partagée
+par tous les workers ; la même ligne sert de verrou (bail) pendant la génération.
+Un échec est retenté avec un délai croissant, plafonné à DERIVATIVES_RETRY_MAX_DELAY.
+"""
+import hashlib
+import io
+import posixpath
+from datetime import timedelta
+
+from django.apps import apps
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from PIL import Image, ImageOps
+
+from .models import ImageDerivatives, ImageDerivativesStatus
+
+IMAGE_DERIVATIVE_WIDTHS = (320, 640, 1024, 1600)
+IMAGE_DERIVATIVE_FORMATS = ("webp", "jpeg")
+
+WEBP_QUALITY = 80
+JPEG_QUALITY = 82
+
+# Champs image concernés : (app_label.Model, champ)
+RESPONSIVE_IMAGE_FIELDS = (
+    ("studio.Studio", "image"),
+    ("studio.Equipment", "photo"),
+    ("services_app.Partner", "logo"),
+    ("services_app.Service", "image"),
+    ("services_app.Training", "image"),
+    ("services_app.JobOffer", "poster"),
+    ("accounts.User", "avatar"),
+)
+
+# Copie locale (par processus) des déclinaisons prêtes : évite une requête par rendu
+DERIVATIVES_CACHE_TIMEOUT = 5 * 60
+DERIVATIVES_LOCK_TIMEOUT = 120
+DERIVATIVES_RETRY_BASE_DELAY = 5 * 60  # secondes, doublé à chaque échec
+DERIVATIVES_RETRY_MAX_DELAY = 24 * 3600
+
+_EXTENSIONS = {"webp": "webp", "jpeg": "jpg"}
+
+
+def derivatives_cache_key(name):
+    return "img_derivatives:" + hashlib.md5(name.encode()).hexdigest()
+
+
+def derivative_name(name, digest, width, fmt):
+    stem, _ = posixpath.splitext(name)
+    return f"{stem}.{digest}.{width}w.{_EXTENSIONS[fmt]}"
+
+
+def _render(image, width, fmt):
+    resized = image
+    if image.width > width:
+        height = max(round(image.height * width / image.width), 1)
+        resized = image.resize((width, height), Image.Resampling.LANCZOS)
+
+    buffer = io.BytesIO()
+    if fmt == "webp":
+        if resized.mode not in ("RGB", "RGBA"):
+            resized = resized.convert("RGBA" if "A" in resized.getbands() else "RGB")
+        resized.save(buffer, "WEBP", quality=WEBP_QUALITY, method=4)
+    else:
+        if resized.mode != "RGB":
+            rgba = resized.convert("RGBA")
+            resized = Image.new("RGB", rgba.size, (255, 255, 255))
+            resized.paste(rgba, mask=rgba.getchannel("A"))
+        resized.save(buffer, "JPEG", quality=JPEG_QUALITY, optimize=True, progressive=True)
+    return buffer.getvalue()
+
+
+def generate_derivatives(name, storage=None):
+    """
+    Génère (si absentes) les déclinaisons d'une image du storage.
+    Retourne {"webp": [(largeur, nom), ...], "jpeg": [...]} trié par largeur.
+    """
+    storage = storage or default_storage
+    with storage.open(name, "rb") as f:
+        data = f.read()
+    digest = hashlib.sha256(data).hexdigest()[:12]
+
+    with Image.open(io.BytesIO(data)) as source:
+        image = ImageOps.exif_transpose(source)
+        image.load()
+
+    widths = sorted({min(w, image.width) for w in IMAGE_DERIVATIVE_WIDTHS})
+    result = {fmt: [] for fmt in IMAGE_DERIVATIVE_FORMATS}
+    for width in widths:
+        for fmt in IMAGE_DERIVATIVE_FORMATS:
+            target = derivative_name(name, digest, width, fmt)
+            if not storage.exists(target):
+                saved = storage.save(target, ContentFile(_render(image, width, fmt)))
+                if saved != target:
+                    # Écrit en parallèle par un autre processus : on garde le nom stable
+                    storage.delete(saved)
+            result[fmt].append((width, target))
+    return result
+
+
+def retry_delay(attempts):
+    """Délai avant une nouvelle génération après `attempts` échecs (plafonné)."""
+    return timedelta(seconds=min(DERIVATIVES_RETRY_BASE_DELAY * 2 ** max(attempts - 1, 0), DERIVATIVES_RETRY_MAX_DELAY))
+
+
+def record_derivatives(name, derivatives=None, *, error=None):
+    """Enregistre le résultat d'une génération (déclinaisons, ou erreur à retenter plus tard)."""
+    if error is None:
+        ImageDerivatives.objects.update_or_create(name=name, defaults={
+            "status": ImageDerivativesStatus.READY,
+            "derivatives": derivatives,
+            "last_error": "",
+        })
+        cache.set(derivatives_cache_key(name), derivatives, DERIVATIVES_CACHE_TIMEOUT)
+        return
+    row, _ = ImageDerivatives.objects.get_or_create(name=name)
+    row.status = ImageDerivativesStatus.FAILED
+    row.attempts += 1
+    row.last_error = str(error)[:2000]
+    row.next_attempt_at = timezone.now() + retry_delay(row.attempts)
+    row.save(update_fields=["status", "attempts", "last_error", "next_attempt_at", "updated_at"])
+
+
+def _claim(name):
+    """Prend le verrou de génération (ligne ImageDerivatives) ; False s'il est pris ou pas dû."""
+    now = timezone.now()
+    lease = now + timedelta(seconds=DERIVATIVES_LOCK_TIMEOUT)
+    try:
+        with transaction.atomic():
+            ImageDerivatives.objects.create(name=name, next_attempt_at=lease)
+        return True
+    except IntegrityError:
+        pass
+    # Échec à retenter ou génération abandonnée (bail expiré) : un seul worker gagne
+    return bool(
+        ImageDerivatives.objects.filter(name=name, next_attempt_at__lte=now)
+        .exclude(status=ImageDerivativesStatus.READY)
+        .update(status=ImageDerivativesStatus.PROCESSING, next_attempt_at=lease)
+    )
+
+
+def get_derivatives(name, *, generate=True):
+    """
+    Déclinaisons connues d'une image, générées à la demande par un seul worker.
+    Retourne None si elles ne sont pas (encore) disponibles.
+    """
+    if not name:
+        return None
+    key = derivatives_cache_key(name)
+    derivatives = cache.get(key)
+    if derivatives is not None:
+        return derivatives
+
+    row = ImageDerivatives.objects.filter(name=name).only("status", "derivatives").first()
+    if row is not None and row.status == ImageDerivativesStatus.READY:
+        cache.set(key, row.derivatives, DERIVATIVES_CACHE_TIMEOUT)
+        return row.derivatives
+    if not generate or not _claim(name):
+        return None  # en cours ailleurs ou échec récent : l'original est servi en attendant
+
+    try:
+        derivatives = generate_derivatives(name)
+    except (OSError, ValueError, Image.DecompressionBombError) as e:
+        record_derivatives(name, error=e)  # fichier absent ou illisible
+        return None
+    record_derivatives(name, derivatives)
+    return derivatives
+
+
+def build_srcset(derivatives, fmt, storage=None):
+    storage = storage or default_storage
+    return ", ".join(f"{storage.url(name)} {width}w" for width, name in derivatives.get(fmt, ()))
+
+
+def _generate_on_commit(sender, instance, **kwargs):
+    for model_label, field_name in RESPONSIVE_IMAGE_FIELDS:
+        if sender._meta.label != model_label:
+            continue
+        name = getattr(instance, field_name).name
+        if name and cache.get(derivatives_cache_key(name)) is None:
+            transaction.on_commit(lambda name=name: get_derivatives(name))
+
+
+def connect_signals():
+    from django.db.models.signals import post_save
+
+    for model_label, _ in RESPONSIVE_IMAGE_FIELDS:
+        post_save.connect(
+            _generate_on_commit,
+            sender=apps.get_model(model_label),
+            dispatch_uid=f"responsive_images_{model_label}",
+        )
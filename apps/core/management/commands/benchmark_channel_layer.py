@@ -0,0 +1,119 @@
+import asyncio
+import multiprocessing
+import os
+import tempfile
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.core.channel_layers import ChannelHub, HubChannelLayer
+
+
+def _run_hub(path):
+    asyncio.run(ChannelHub().serve(path))
+
+
+async def _ring_worker(path, index, workers, messages, concurrency, barrier):
+    """
+    Envoie `messages` messages au worker suivant et reçoit ceux du précédent,
+    depuis `concurrency` coroutines (comme autant de connexions WebSocket).
+    """
+    layer = HubChannelLayer(path=path, capacity=messages + 1)
+    inbox = f"bench.worker{index}"
+    target = f"bench.worker{(index + 1) % workers}"
+    await layer.group_add("bench", inbox)
+    await asyncio.get_running_loop().run_in_executor(None, barrier.wait)
+
+    shares = [len(range(i, messages, concurrency)) for i in range(concurrency)]
+
+    async def produce(count):
+        for n in range(count):
+            await layer.send(target, {"type": "bench.message", "n": n})
+
+    async def consume(count):
+        for _ in range(count):
+            await layer.receive(inbox)
+
+    start = time.time()
+    await asyncio.gather(*[produce(count) for count in shares], *[consume(count) for count in shares])
+    ring = (start, time.time())
+
+    # Diffusion : le worker 0 envoie au groupe, chaque worker reçoit tout
+    await asyncio.get_running_loop().run_in_executor(None, barrier.wait)
+    start = time.time()
+
+    async def broadcast(count):
+        for n in range(count):
+            await layer.group_send("bench", {"type": "bench.message", "n": n})
+
+    producers = [broadcast(count) for count in shares] if index == 0 else []
+    await asyncio.gather(*producers, *[consume(count) for count in shares])
+    fan_out = (start, time.time())
+    await layer.close()
+    return ring, fan_out
+
+
+def _worker(path, index, workers, messages, concurrency, barrier, results):
+    results.put((index, asyncio.run(_ring_worker(path, index, workers, messages, concurrency, barrier))))
+
+
+def _rate(count, spans):
+    elapsed = max(end for _, end in spans) - min(start for start, _ in spans)
+    return count / elapsed, elapsed
+
+
+class Command(BaseCommand):
+    help = "Mesure le débit (messages/s) du hub de canaux entre plusieurs processus workers"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=4, help="Nombre de processus workers (défaut : %(default)s)")
+        parser.add_argument('--messages', type=int, default=5000, help="Messages envoyés par worker (défaut : %(default)s)")
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            default=10,
+            help="Coroutines émettrices / réceptrices par worker (défaut : %(default)s)",
+        )
+        parser.add_argument('--socket', help="Hub déjà lancé à utiliser (sinon un hub temporaire est démarré)")
+
+    def handle(self, *args, **options):
+        workers, messages, concurrency = options['workers'], options['messages'], options['concurrency']
+        if workers < 2:
+            raise CommandError("Il faut au moins 2 workers.")
+
+        context = multiprocessing.get_context("spawn")
+        hub = None
+        path = options['socket']
+        if not path:
+            path = os.path.join(tempfile.mkdtemp(), "hub.sock")
+            hub = context.Process(target=_run_hub, args=(path,), daemon=True)
+            hub.start()
+            deadline = time.monotonic() + 10
+            while not os.path.exists(path):
+                if time.monotonic() > deadline:
+                    raise CommandError("Le hub n'a pas démarré.")
+                time.sleep(0.05)
+
+        barrier = context.Barrier(workers)
+        results = context.Queue()
+        processes = [
+            context.Process(target=_worker, args=(path, i, workers, messages, concurrency, barrier, results))
+            for i in range(workers)
+        ]
+        try:
+            for process in processes:
+                process.start()
+            spans = [results.get(timeout=300)[1] for _ in processes]
+            for process in processes:
+                process.join()
+        finally:
+            if hub is not None:
+                hub.terminate()
+                hub.join()
+
+        ring_rate, ring_elapsed = _rate(workers * messages, [ring for ring, _ in spans])
+        fan_rate, fan_elapsed = _rate(workers * messages, [fan_out for _, fan_out in spans])
+        self.stdout.write(f"{workers} workers, {messages} messages par worker, {concurrency} coroutines par worker")
+        self.stdout.write(f"  send/receive (anneau) : {ring_rate:,.0f} messages/s ({ring_elapsed:.2f} s)")
+        self.stdout.write(f"  group_send (diffusion) : {fan_rate:,.0f} messages remis/s ({fan_elapsed:.2f} s)")
+        self.stdout.write(self.style.SUCCESS("✅ Mesure terminée."))
@@ -0,0 +1,67 @@
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from django.apps import apps
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from apps.core.images import RESPONSIVE_IMAGE_FIELDS, generate_derivatives, record_derivatives
+
+
+def _init_worker():
+    import django
+    if not apps.ready:  # processus lancés en "spawn" / "forkserver"
+        django.setup()
+
+
+def _build(name):
+    try:
+        return name, generate_derivatives(name), None
+    except Exception as e:  # un fichier corrompu ne doit pas arrêter le lot
+        return name, None, str(e)
+
+
+class Command(BaseCommand):
+    help = "Génère les déclinaisons responsive (WebP/JPEG) des images existantes"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=os.cpu_count() or 1,
+            help="Nombre de processus (défaut : nombre de CPU)",
+        )
+
+    def handle(self, *args, **options):
+        names = set()
+        for model_label, field_name in RESPONSIVE_IMAGE_FIELDS:
+            model = apps.get_model(model_label)
+            names.update(
+                model.objects.exclude(**{f"{field_name}__isnull": True})
+                .exclude(**{field_name: ""})
+                .values_list(field_name, flat=True)
+            )
+
+        if not names:
+            self.stdout.write("Aucune image à traiter.")
+            return
+
+        # Les processus n'utilisent que le storage : pas de connexion DB partagée
+        connections.close_all()
+
+        done = failed = 0
+        with ProcessPoolExecutor(max_workers=max(options['workers'], 1), initializer=_init_worker) as pool:
+            futures = [pool.submit(_build, name) for name in sorted(names)]
+            for future in as_completed(futures):
+                name, derivatives, error = future.result()
+                # Enregistré en base : visible de tous les workers web
+                record_derivatives(name, derivatives, error=error)
+                if error:
+                    failed += 1
+                    self.stderr.write(f"❌ {name} : {error}")
+                    continue
+                done += 1
+
+        self.stdout.write(
+            self.style.SUCCESS(f"✅ {done} image(s) traitée(s), {failed} en erreur.")
+        )
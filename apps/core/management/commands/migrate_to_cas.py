@@ -0,0 +1,122 @@
+from collections import Counter
+from datetime import timedelta
+
+from django.core.files.storage import FileSystemStorage
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from apps.core.models import StoredBlob
+from apps.core.storage import CAS_PREFIX, content_addressed_fields
+
+# Un fichier plus récent peut appartenir à une ligne pas encore validée (upload en cours)
+ORPHAN_GRACE_HOURS = 24
+
+
+class Command(BaseCommand):
+    help = (
+        "Migre les fichiers existants vers le stockage par contenu (déduplication) "
+        "puis recalcule les compteurs de références et supprime les fichiers orphelins"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help="Affiche sans rien modifier")
+        parser.add_argument(
+            '--grace-hours',
+            type=int,
+            default=ORPHAN_GRACE_HOURS,
+            help="Fichiers plus récents jamais supprimés ni décomptés (défaut : %(default)s)",
+        )
+
+    def handle(self, *args, **options):
+        dry_run = options['dry_run']
+        fields = content_addressed_fields()
+        storages = {storage.storage_label: storage for _, _, storage in fields}
+        migrated = missing = 0
+
+        # 1. Anciens fichiers -> cas/<empreinte>. Un fichier partagé par plusieurs lignes
+        # n'est copié qu'une fois ; les anciens fichiers ne sont supprimés qu'une fois
+        # toutes les lignes migrées.
+        moved = {}  # (stockage, ancien nom) -> nouveau nom
+        for model, field_name, storage in fields:
+            rows = (
+                model.objects
+                .exclude(**{f"{field_name}__isnull": True})
+                .exclude(**{field_name: ""})
+                .exclude(**{f"{field_name}__startswith": CAS_PREFIX})
+                .values_list("pk", field_name)
+            )
+            for pk, old_name in rows.iterator():
+                key = (storage.storage_label, old_name)
+                if key not in moved:
+                    if not storage.exists(old_name):
+                        missing += 1
+                        self.stderr.write(f"⚠️  Introuvable : {old_name}")
+                        continue
+                    migrated += 1
+                    if dry_run:
+                        moved[key] = old_name
+                        self.stdout.write(f"→ {old_name}")
+                        continue
+                    with storage.open(old_name, 'rb') as f:
+                        moved[key] = storage.save(old_name, f)
+                    self.stdout.write(f"→ {old_name} => {moved[key]}")
+                if not dry_run:
+                    model.objects.filter(pk=pk).update(**{field_name: moved[key]})
+
+        if not dry_run:
+            for label, old_name in moved:
+                # Suppression directe de l'ancien fichier (hors comptage)
+                FileSystemStorage.delete(storages[label], old_name)
+
+        # 2. Compteurs recalculés depuis la base (source de vérité)
+        references = Counter()
+        for model, field_name, storage in fields:
+            names = (
+                model.objects
+                .filter(**{f"{field_name}__startswith": CAS_PREFIX})
+                .values_list(field_name, flat=True)
+            )
+            for name in names.iterator():
+                references[(storage.storage_label, name)] += 1
+
+        orphans = 0
+        recent_since = timezone.now() - timedelta(hours=options['grace_hours'])
+        if not dry_run:
+            with transaction.atomic():
+                for blob in StoredBlob.objects.select_for_update():
+                    count = references.pop((blob.storage, blob.name), 0)
+                    if blob.created_at > recent_since:
+                        # Récent : références pas encore validées possibles, on ne fait qu'augmenter
+                        if count > blob.ref_count:
+                            blob.ref_count = count
+                            blob.save(update_fields=["ref_count"])
+                        continue
+                    if count:
+                        if blob.ref_count != count:
+                            blob.ref_count = count
+                            blob.save(update_fields=["ref_count"])
+                        continue
+                    orphans += 1
+                    blob.delete()
+                    storage = storages.get(blob.storage)
+                    if storage is not None:
+                        FileSystemStorage.delete(storage, blob.name)
+
+                # Fichiers référencés sans ligne de suivi
+                StoredBlob.objects.bulk_create([
+                    StoredBlob(
+                        storage=label,
+                        name=name,
+                        size=storages[label].size(name) if storages[label].exists(name) else 0,
+                        ref_count=count,
+                    )
+                    for (label, name), count in references.items()
+                ])
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"✅ {migrated} fichier(s) migré(s), {missing} introuvable(s), "
+                f"{orphans} fichier(s) orphelin(s) supprimé(s)."
+            )
+        )
@@ -0,0 +1,46 @@
+from django.apps import apps
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+
+from apps.core.documents import PROTECTED_DOCUMENTS
+from apps.core.storage import private_storage
+
+
+class Command(BaseCommand):
+    help = "Déplace les documents privés existants de MEDIA_ROOT vers PRIVATE_MEDIA_ROOT"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help="Affiche sans déplacer")
+
+    def handle(self, *args, **options):
+        moved = missing = 0
+        for model_label, field_name, _, _ in PROTECTED_DOCUMENTS.values():
+            names = (
+                apps.get_model(model_label).objects
+                .exclude(**{f"{field_name}__isnull": True})
+                .exclude(**{field_name: ""})
+                .values_list(field_name, flat=True)
+                .iterator()
+            )
+            for name in names:
+                if private_storage.exists(name):
+                    continue
+                if not default_storage.exists(name):
+                    missing += 1
+                    self.stderr.write(f"⚠️  Introuvable : {name}")
+                    continue
+
+                if not options['dry_run']:
+                    with default_storage.open(name, 'rb') as f:
+                        saved = private_storage.save(name, f)
+                    if saved != name:
+                        private_storage.delete(saved)
+                        self.stderr.write(f"❌ Nom en conflit, ignoré : {name}")
+                        continue
+                    default_storage.delete(name)
+                moved += 1
+                self.stdout.write(f"→ {name}")
+
+        self.stdout.write(
+            self.style.SUCCESS(f"✅ {moved} document(s) déplacé(s), {missing} introuvable(s).")
+        )
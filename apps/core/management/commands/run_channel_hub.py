@@ -0,0 +1,28 @@
+import asyncio
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from apps.core.channel_layers import DEFAULT_HUB_SOCKET, ChannelHub
+
+
+class Command(BaseCommand):
+    help = "Lance le hub de canaux (WebSocket) partagé par les workers ASGI de la machine"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--socket',
+            default=getattr(settings, "CHANNEL_HUB_SOCKET", None) or DEFAULT_HUB_SOCKET,
+            help="Chemin de la socket Unix (défaut : %(default)s)",
+        )
+
+    def handle(self, *args, **options):
+        path = options['socket']
+        hub = ChannelHub()
+        try:
+            asyncio.run(hub.serve(
+                path,
+                started=lambda: self.stdout.write(self.style.SUCCESS(f"✅ Hub de canaux à l'écoute sur {path}")),
+            ))
+        except KeyboardInterrupt:
+            self.stdout.write("Hub arrêté.")
@@ -0,0 +1,204 @@
+# apps/core/media.py
+"""
+Envoi de fichiers média avec :
+- requêtes partielles (Range -> 206 / 416, If-Range),
+- validation (ETag / If-None-Match, Last-Modified / If-Modified-Since -> 304),
+- en-têtes de cache,
+- délégation au serveur web (X-Accel-Redirect pour nginx, X-Sendfile pour Apache)
+  lorsque MEDIA_SENDFILE_BACKEND est configuré.
+"""
+import mimetypes
+import os
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseNotModified, StreamingHttpResponse
+from django.utils._os import safe_join
+from django.utils.http import http_date, parse_http_date_safe, quote_etag
+
+from apps.core.storage import CAS_PREFIX
+
+RANGE_CHUNK_SIZE = 64 * 1024
+
+_RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+def resolve_media_path(relative_path, root=None):
+    """
+    Chemin absolu d'un fichier sous `root` (MEDIA_ROOT par défaut).
+    Lève Http404 pour un chemin hors racine ou un fichier absent.
+    """
+    root = str(root or settings.MEDIA_ROOT)
+    try:
+        full_path = safe_join(root, relative_path)
+    except SuspiciousFileOperation:
+        raise Http404("Fichier introuvable.")
+    if not os.path.isfile(full_path):
+        raise Http404("Fichier introuvable.")
+    return full_path
+
+
+def file_etag(stat_result):
+    return quote_etag(f"{stat_result.st_mtime_ns:x}-{stat_result.st_size:x}")
+
+
+def parse_range_header(header, size):
+    """
+    Interprète un en-tête Range à une seule plage.
+    Retourne (début, fin incluse), None si l'en-tête est absent / non supporté
+    (plages multiples, autre unité), ou "unsatisfiable" si la plage est hors fichier.
+    """
+    if not header:
+        return None
+    match = _RANGE_RE.match(header.strip())
+    if not match:
+        return None
+    start, end = match.groups()
+    if not start and not end:
+        return None
+
+    if not start:
+        # Suffixe : les N derniers octets
+        length = int(end)
+        if length == 0:
+            return "unsatisfiable"
+        return max(size - length, 0), size - 1
+
+    start = int(start)
+    end = min(int(end), size - 1) if end else size - 1
+    if start >= size or start > end:
+        return "unsatisfiable"
+    return start, end
+
+
+def _not_modified(request, etag, mtime):
+    if_none_match = request.headers.get("If-None-Match")
+    if if_none_match is not None:
+        return if_none_match.strip() == "*" or etag in [t.strip() for t in if_none_match.split(",")]
+    if_modified_since = parse_http_date_safe(request.headers.get("If-Modified-Since", ""))
+    return if_modified_since is not None and int(mtime) <= if_modified_since
+
+
+def _if_range_matches(request, etag, mtime):
+    if_range = request.headers.get("If-Range")
+    if not if_range:
+        return True
+    if if_range.startswith(("\"", "W/")):
+        return if_range == etag
+    since = parse_http_date_safe(if_range)
+    return since is not None and int(mtime) <= since
+
+
+def _iter_range(f, start, length, chunk_size=RANGE_CHUNK_SIZE):
+    try:
+        f.seek(start)
+        remaining = length
+        while remaining > 0:
+            data = f.read(min(chunk_size, remaining))
+            if not data:
+                break
+            remaining -= len(data)
+            yield data
+    finally:
+        f.close()
+
+
+def _accel_url(relative_path, prefix):
+    return prefix.rstrip("/") + "/" + quote(relative_path.replace(os.sep, "/").lstrip("/"))
+
+
+def serve_file(
+    request,
+    relative_path,
+    *,
+    root=None,
+    accel_prefix=None,
+    cache_control=None,
+    as_attachment=False,
+    filename=None,
+):
+    """
+    Réponse HTTP pour un fichier situé sous `root` (MEDIA_ROOT par défaut).
+
+    Les en-têtes de validation et de cache sont toujours posés par Django ;
+    le corps est délégué au serveur web si MEDIA_SENDFILE_BACKEND l'indique,
+    sinon envoyé en flux (entier ou plage demandée).
+    """
+    if request.method not in ("GET", "HEAD"):
+        response = HttpResponse(status=405)
+        response["Allow"] = "GET, HEAD"
+        return response
+
+    full_path = resolve_media_path(relative_path, root)
+    stat_result = os.stat(full_path)
+    size = stat_result.st_size
+    etag = file_etag(stat_result)
+    content_type, encoding = mimetypes.guess_type(full_path)
+    content_type = content_type or "application/octet-stream"
+
+    if cache_control is None:
+        if relative_path.startswith(CAS_PREFIX):
+            # Nom = empreinte du contenu : le fichier ne change jamais
+            cache_control = "public, max-age=31536000, immutable"
+        else:
+            cache_control = f"public, max-age={getattr(settings, 'MEDIA_CACHE_MAX_AGE', 0)}"
+
+    def finalize(response):
+        response["ETag"] = etag
+        response["Last-Modified"] = http_date(stat_result.st_mtime)
+        response["Cache-Control"] = cache_control
+        response["Accept-Ranges"] = "bytes"
+        if as_attachment or filename:
+            disposition = "attachment" if as_attachment else "inline"
+            name = filename or os.path.basename(full_path)
+            response["Content-Disposition"] = f"{disposition}; filename*=UTF-8''{quote(name)}"
+        return response
+
+    if _not_modified(request, etag, stat_result.st_mtime):
+        return finalize(HttpResponseNotModified())
+
+    backend = getattr(settings, "MEDIA_SENDFILE_BACKEND", None)
+    if backend == "nginx":
+        prefix = accel_prefix or settings.MEDIA_ACCEL_REDIRECT_PREFIX
+        response = HttpResponse(content_type=content_type)
+        response["X-Accel-Redirect"] = _accel_url(relative_path, prefix)
+        return finalize(response)
+    if backend == "apache":
+        response = HttpResponse(content_type=content_type)
+        response["X-Sendfile"] = full_path
+        return finalize(response)
+
+    byte_range = None
+    if _if_range_matches(request, etag, stat_result.st_mtime):
+        byte_range = parse_range_header(request.headers.get("Range"), size)
+
+    if byte_range == "unsatisfiable":
+        response = HttpResponse(status=416)
+        response["Content-Range"] = f"bytes */{size}"
+        return finalize(response)
+
+    if byte_range is None:
+        if request.method == "HEAD":
+            response = HttpResponse(content_type=content_type)
+            response["Content-Length"] = str(size)
+        else:
+            response = FileResponse(open(full_path, "rb"), content_type=content_type)
+        if encoding:
+            response["Content-Encoding"] = encoding
+        return finalize(response)
+
+    start, end = byte_range
+    length = end - start + 1
+    if request.method == "HEAD":
+        response = HttpResponse(status=206, content_type=content_type)
+    else:
+        response = StreamingHttpResponse(
+            _iter_range(open(full_path, "rb"), start, length),
+            status=206,
+            content_type=content_type,
+        )
+    response["Content-Length"] = str(length)
+    response["Content-Range"] = f"bytes {start}-{end}/{size}"
+    return finalize(response)
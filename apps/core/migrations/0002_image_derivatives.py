@@ -0,0 +1,31 @@
+# Generated by Django 5.0.3 on 2026-10-19 17:25
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImageDerivatives',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255, unique=True, verbose_name="Image d'origine")),
+                ('status', models.CharField(choices=[('PROCESSING', 'En cours'), ('READY', 'Prêtes'), ('FAILED', 'Échec')], default='PROCESSING', max_length=10, verbose_name='Statut')),
+                ('derivatives', models.JSONField(blank=True, default=dict, verbose_name='Déclinaisons')),
+                ('attempts', models.PositiveSmallIntegerField(default=0, verbose_name='Tentatives')),
+                ('last_error', models.TextField(blank=True, verbose_name='Dernière erreur')),
+                ('next_attempt_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Prochaine tentative')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Mis à jour le')),
+            ],
+            options={
+                'verbose_name': "Déclinaisons d'image",
+                'verbose_name_plural': "Déclinaisons d'images",
+            },
+        ),
+    ]
@@ -1,3 +1,57 @@
 from django.db import models
+from django.utils import timezone
 
-# Create your models here.
+
+class StoredBlob(models.Model):
+    """
+    Fichier stocké une seule fois sous son empreinte SHA-256 (ContentAddressedStorage),
+    avec le nombre de champs qui le référencent.
+    """
+    storage = models.CharField("Stockage", max_length=30)
+    name = models.CharField("Nom du fichier", max_length=255)
+    size = models.PositiveBigIntegerField("Taille (octets)", default=0)
+    ref_count = models.PositiveIntegerField("Références", default=0)
+    created_at = models.DateTimeField("Créé le", auto_now_add=True)
+
+    class Meta:
+        verbose_name = "Fichier dédupliqué"
+        verbose_name_plural = "Fichiers dédupliqués"
+        constraints = [
+            models.UniqueConstraint(fields=['storage', 'name'], name='stored_blob_unique_name'),
+        ]
+
+    def __str__(self):
+        return f"{self.name} ({self.ref_count})"
+
+
+class ImageDerivativesStatus(models.TextChoices):
+    PROCESSING = 'PROCESSING', 'En cours'
+    READY = 'READY', 'Prêtes'
+    FAILED = 'FAILED', 'Échec'
+
+
+class ImageDerivatives(models.Model):
+    """
+    Déclinaisons responsive d'une image du storage (voir apps/core/images.py),
+    partagées par tous les workers. La ligne sert aussi de verrou de génération.
+    """
+    name = models.CharField("Image d'origine", max_length=255, unique=True)
+    status = models.CharField(
+        "Statut",
+        max_length=10,
+        choices=ImageDerivativesStatus.choices,
+        default=ImageDerivativesStatus.PROCESSING,
+    )
+    derivatives = models.JSONField("Déclinaisons", default=dict, blank=True)
+    attempts = models.PositiveSmallIntegerField("Tentatives", default=0)
+    last_error = models.TextField("Dernière erreur", blank=True)
+    # En cours : fin du verrou ; en échec : prochaine tentative
+    next_attempt_at = models.DateTimeField("Prochaine tentative", default=timezone.now)
+    updated_at = models.DateTimeField("Mis à jour le", auto_now=True)
+
+    class Meta:
+        verbose_name = "Déclinaisons d'image"
+        verbose_name_plural = "Déclinaisons d'images"
+
+    def __str__(self):
+        return f"{self.name} ({self.get_status_display()})"
@@ -0,0 +1,217 @@
+# apps/core/storage.py
+import hashlib
+import os
+import posixpath
+import tempfile
+
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage
+from django.db import IntegrityError, transaction
+from django.db.models import F
+
+CAS_PREFIX = "cas/"
+
+
+class PrivateMediaStorage(FileSystemStorage):
+    """
+    Stockage des documents privés, hors MEDIA_ROOT : aucune URL publique,
+    .url pointe vers la vue protégée (réservée au staff) de apps.core.
+    Les réglages sont relus à chaque accès (compatible override_settings).
+    """
+
+    @property
+    def base_location(self):
+        return self._value_or_setting(self._location, settings.PRIVATE_MEDIA_ROOT)
+
+    @property
+    def location(self):
+        return os.path.abspath(self.base_location)
+
+    @property
+    def base_url(self):
+        base_url = self._value_or_setting(self._base_url, settings.PRIVATE_MEDIA_URL)
+        if base_url and not base_url.endswith("/"):
+            base_url += "/"
+        return base_url
+
+
+class ContentAddressedMixin:
+    """
+    Stockage par contenu : chaque fichier est écrit une seule fois sous
+    cas/<2 premiers caractères>/<sha256><extension>, quel que soit upload_to.
+
+    - l'empreinte est calculée pendant l'écriture (lecture par blocs, sans tout charger),
+    - un contenu déjà présent n'est pas réécrit (déduplication),
+    - StoredBlob compte les références : delete() ne supprime le fichier qu'à la dernière.
+      Une référence est libérée à la suppression de la ligne ou au remplacement du
+      fichier (voir connect_reference_signals) ; migrate_to_cas recalcule les compteurs.
+    Les noms étant immuables, ces fichiers peuvent être mis en cache sans limite.
+    """
+    storage_label = "media"
+
+    def get_available_name(self, name, max_length=None):
+        # Le nom final dépend du contenu (voir _save) : pas de suffixe aléatoire
+        return name
+
+    def _save(self, name, content):
+        tmp_dir = self.path(CAS_PREFIX + "tmp")
+        os.makedirs(tmp_dir, exist_ok=True)
+
+        digest = hashlib.sha256()
+        size = 0
+        if hasattr(content, "seek"):
+            content.seek(0)
+        fd, tmp_path = tempfile.mkstemp(dir=tmp_dir)
+        try:
+            with os.fdopen(fd, "wb") as tmp:
+                for chunk in content.chunks():
+                    digest.update(chunk)
+                    size += len(chunk)
+                    tmp.write(chunk)
+
+            ext = posixpath.splitext(name)[1].lower()[:10]
+            hexdigest = digest.hexdigest()
+            blob_name = f"{CAS_PREFIX}{hexdigest[:2]}/{hexdigest}{ext}"
+            blob_path = self.path(blob_name)
+            os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+
+            if os.path.exists(blob_path):
+                os.unlink(tmp_path)
+            else:
+                if self.file_permissions_mode is not None:
+                    os.chmod(tmp_path, self.file_permissions_mode)
+                os.replace(tmp_path, blob_path)  # atomique : jamais de fichier partiel visible
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+
+        self._add_reference(blob_name, size)
+        return blob_name
+
+    def _add_reference(self, name, size):
+        from apps.core.models import StoredBlob
+
+        blobs = StoredBlob.objects.filter(storage=self.storage_label, name=name)
+        if blobs.update(ref_count=F("ref_count") + 1):
+            return
+        try:
+            with transaction.atomic():
+                StoredBlob.objects.create(storage=self.storage_label, name=name, size=size, ref_count=1)
+        except IntegrityError:
+            blobs.update(ref_count=F("ref_count") + 1)
+
+    def delete(self, name):
+        if not name or not name.startswith(CAS_PREFIX):
+            return super().delete(name)  # ancien fichier, hors stockage par contenu
+
+        from apps.core.models import StoredBlob
+
+        with transaction.atomic():
+            blob = (
+                StoredBlob.objects.select_for_update()
+                .filter(storage=self.storage_label, name=name)
+                .first()
+            )
+            if blob is None:
+                # Non suivi (ligne pas encore recomptée) : d'autres champs peuvent le
+                # référencer, le fichier est laissé à migrate_to_cas
+                return
+            if blob.ref_count > 1:
+                blob.ref_count -= 1
+                blob.save(update_fields=["ref_count"])
+                return
+            blob.delete()
+            super().delete(name)
+
+
+class ContentAddressedStorage(ContentAddressedMixin, FileSystemStorage):
+    storage_label = "media"
+
+
+class PrivateContentAddressedStorage(ContentAddressedMixin, PrivateMediaStorage):
+    storage_label = "private"
+
+
+private_storage = PrivateMediaStorage()
+cas_storage = ContentAddressedStorage()
+private_cas_storage = PrivateContentAddressedStorage()
+
+
+def get_private_storage():
+    """Callable utilisé par les FileField (évite de figer les chemins dans les migrations)."""
+    return private_storage
+
+
+def get_cas_storage():
+    return cas_storage
+
+
+def get_private_cas_storage():
+    return private_cas_storage
+
+
+# ---------- LIBÉRATION DES RÉFÉRENCES ----------
+
+def content_addressed_fields():
+    """[(modèle, nom du champ, storage)] pour tous les FileField en stockage par contenu."""
+    from django.apps import apps
+
+    fields = []
+    for model in apps.get_models():
+        for field in model._meta.get_fields():
+            storage = getattr(field, "storage", None)
+            if isinstance(storage, ContentAddressedMixin):
+                fields.append((model, field.name, storage))
+    return fields
+
+
+_reference_fields = {}  # modèle -> {nom du champ: storage}
+
+
+def _release_on_commit(storage, name):
+    # Après le commit : un rollback ne doit pas faire perdre une référence encore utilisée
+    transaction.on_commit(lambda: storage.delete(name))
+
+
+def _remember_previous_files(sender, instance, raw=False, update_fields=None, **kwargs):
+    fields = _reference_fields.get(sender)
+    if raw or not fields or instance._state.adding:
+        return
+    names = [f for f in fields if update_fields is None or f in update_fields]
+    if not names:
+        return
+    previous = sender._base_manager.filter(pk=instance.pk).values(*names).first() or {}
+    # Fichier envoyé pendant cet enregistrement : l'ancienne référence est libérée même
+    # si le contenu (donc le nom) est identique, _save en ayant ajouté une
+    uploading = {f for f in names if getattr(instance, f) and not getattr(instance, f)._committed}
+    instance._cas_previous_files = (previous, uploading)
+
+
+def _release_replaced_files(sender, instance, raw=False, **kwargs):
+    previous, uploading = instance.__dict__.pop("_cas_previous_files", ({}, set()))
+    for field_name, old_name in previous.items():
+        if not old_name or not old_name.startswith(CAS_PREFIX):
+            continue
+        if old_name != getattr(instance, field_name).name or field_name in uploading:
+            _release_on_commit(_reference_fields[sender][field_name], old_name)
+
+
+def _release_deleted_files(sender, instance, **kwargs):
+    for field_name, storage in _reference_fields.get(sender, {}).items():
+        name = getattr(instance, field_name).name
+        if name and name.startswith(CAS_PREFIX):
+            _release_on_commit(storage, name)
+
+
+def connect_reference_signals():
+    """Libère les références des fichiers remplacés ou des lignes supprimées (appelé dans ready())."""
+    from django.db.models.signals import post_delete, post_save, pre_save
+
+    for model, field_name, storage in content_addressed_fields():
+        _reference_fields.setdefault(model, {})[field_name] = storage
+    for model in _reference_fields:
+        uid = f"cas_references_{model._meta.label}"
+        pre_save.connect(_remember_previous_files, sender=model, dispatch_uid=uid)
+        post_save.connect(_release_replaced_files, sender=model, dispatch_uid=uid)
+        post_delete.connect(_release_deleted_files, sender=model, dispatch_uid=uid)
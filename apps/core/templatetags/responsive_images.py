@@ -0,0 +1,38 @@
+from django import template
+from django.utils.html import format_html, format_html_join
+
+from apps.core.images import build_srcset, get_derivatives
+
+register = template.Library()
+
+DEFAULT_SIZES = "(max-width: 768px) 100vw, 33vw"
+
+
+@register.simple_tag
+def responsive_image(image, alt="", sizes=DEFAULT_SIZES, **attrs):
+    """
+    <picture> WebP + JPEG avec srcset pour un champ image.
+    Ex. : {% responsive_image studio.image alt=studio.name loading="lazy" class="card-img-top" %}
+    Sans déclinaisons disponibles, seul l'original est servi.
+    """
+    if not image:
+        return ""
+
+    extra = format_html_join("", ' {}="{}"', attrs.items())
+    derivatives = get_derivatives(image.name)
+    if not derivatives:
+        return format_html('<img src="{}" alt="{}"{}>', image.url, alt, extra)
+
+    return format_html(
+        '<picture style="display: contents">'
+        '<source type="image/webp" srcset="{}" sizes="{}">'
+        '<img src="{}" srcset="{}" sizes="{}" alt="{}"{}>'
+        '</picture>',
+        build_srcset(derivatives, "webp"),
+        sizes,
+        image.url,
+        build_srcset(derivatives, "jpeg"),
+        sizes,
+        alt,
+        extra,
+    )
@@ -1,3 +1,397 @@
-from django.test import TestCase
+import asyncio
+import io
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from channels.exceptions import ChannelFull
+from django.core.management import call_command
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+from PIL import Image
+
+from apps.accounts.models import EmployeeProfile, User
+from apps.core import images
+from apps.core.channel_layers import ChannelHub, HubChannelLayer
+from apps.core.media import parse_range_header
+from apps.core.models import ImageDerivatives, ImageDerivativesStatus, StoredBlob
+from apps.core.storage import cas_storage
+from apps.studio.models import Equipment
+
+
+class ParseRangeHeaderTests(SimpleTestCase):
+    def test_ranges(self):
+        self.assertEqual(parse_range_header("bytes=0-99", 1000), (0, 99))
+        self.assertEqual(parse_range_header("bytes=900-", 1000), (900, 999))
+        self.assertEqual(parse_range_header("bytes=-100", 1000), (900, 999))
+        self.assertEqual(parse_range_header("bytes=990-5000", 1000), (990, 999))
+        self.assertEqual(parse_range_header("bytes=-5000", 1000), (0, 999))
+
+    def test_unsupported_or_invalid(self):
+        self.assertIsNone(parse_range_header("", 1000))
+        self.assertIsNone(parse_range_header("bytes=0-1,5-6", 1000))
+        self.assertIsNone(parse_range_header("items=0-1", 1000))
+        self.assertEqual(parse_range_header("bytes=1000-", 1000), "unsatisfiable")
+        self.assertEqual(parse_range_header("bytes=50-10", 1000), "unsatisfiable")
+        self.assertEqual(parse_range_header("bytes=-0", 1000), "unsatisfiable")
+
+
+class MediaViewTests(SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.media_root = tempfile.mkdtemp()
+        os.makedirs(os.path.join(cls.media_root, "hero"))
+        cls.content = bytes(range(256)) * 40  # 10 240 octets
+        with open(os.path.join(cls.media_root, "hero", "hero.mp4"), "wb") as f:
+            f.write(cls.content)
+        cls.settings_override = override_settings(MEDIA_ROOT=cls.media_root, MEDIA_SENDFILE_BACKEND=None)
+        cls.settings_override.enable()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.settings_override.disable()
+        shutil.rmtree(cls.media_root, ignore_errors=True)
+        super().tearDownClass()
+
+    url = "/media/hero/hero.mp4"
+
+    def test_full_response(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b"".join(response.streaming_content), self.content)
+        self.assertEqual(response["Content-Type"], "video/mp4")
+        self.assertEqual(response["Accept-Ranges"], "bytes")
+        self.assertIn("max-age=", response["Cache-Control"])
+        self.assertTrue(response["ETag"])
+
+    def test_byte_range(self):
+        response = self.client.get(self.url, HTTP_RANGE="bytes=100-199")
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response["Content-Range"], "bytes 100-199/10240")
+        self.assertEqual(response["Content-Length"], "100")
+        self.assertEqual(b"".join(response.streaming_content), self.content[100:200])
+
+    def test_open_ended_and_suffix_ranges(self):
+        response = self.client.get(self.url, HTTP_RANGE="bytes=10000-")
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(b"".join(response.streaming_content), self.content[10000:])
+
+        response = self.client.get(self.url, HTTP_RANGE="bytes=-16")
+        self.assertEqual(response["Content-Range"], "bytes 10224-10239/10240")
+        self.assertEqual(b"".join(response.streaming_content), self.content[-16:])
+
+    def test_unsatisfiable_range(self):
+        response = self.client.get(self.url, HTTP_RANGE="bytes=20000-")
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response["Content-Range"], "bytes */10240")
+
+    def test_if_none_match(self):
+        etag = self.client.get(self.url)["ETag"]
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_if_range_mismatch_returns_full_file(self):
+        response = self.client.get(self.url, HTTP_RANGE="bytes=0-9", HTTP_IF_RANGE='"stale"')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b"".join(response.streaming_content), self.content)
+
+    def test_head(self):
+        response = self.client.head(self.url, HTTP_RANGE="bytes=0-9")
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response["Content-Length"], "10")
+
+    def test_path_traversal_and_missing_file(self):
+        self.assertEqual(self.client.get("/media/../manage.py").status_code, 404)
+        self.assertEqual(self.client.get("/media/hero/absent.mp4").status_code, 404)
+
+    @override_settings(MEDIA_SENDFILE_BACKEND="nginx", MEDIA_ACCEL_REDIRECT_PREFIX="/internal-media/")
+    def test_x_accel_redirect(self):
+        response = self.client.get(self.url, HTTP_RANGE="bytes=0-9")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["X-Accel-Redirect"], "/internal-media/hero/hero.mp4")
+        self.assertEqual(response.content, b"")
+
+    @override_settings(MEDIA_SENDFILE_BACKEND="apache")
+    def test_x_sendfile(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response["X-Sendfile"], os.path.join(self.media_root, "hero", "hero.mp4"))
+
+
+class ProtectedDocumentTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.private_root = tempfile.mkdtemp()
+        cls.settings_override = override_settings(PRIVATE_MEDIA_ROOT=cls.private_root, MEDIA_SENDFILE_BACKEND=None)
+        cls.settings_override.enable()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.settings_override.disable()
+        shutil.rmtree(cls.private_root, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        self.owner = User.objects.create_user(username="employe", password="x")
+        self.profile = EmployeeProfile.objects.create(user=self.owner)
+        self.profile.contract_document.save("contrat.pdf", ContentFile(b"%PDF-1.4 contrat"))
+        self.url = f"/documents/contrat-employe/{self.profile.pk}/"
+
+    def test_file_is_not_under_media_root(self):
+        self.assertTrue(os.path.isfile(os.path.join(self.private_root, self.profile.contract_document.name)))
+        self.assertEqual(self.client.get("/media/" + self.profile.contract_document.name).status_code, 404)
+
+    def test_owner_and_staff_can_download(self):
+        self.client.force_login(self.owner)
+        response = self.client.get(self.url, HTTP_RANGE="bytes=0-7")
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(b"".join(response.streaming_content), b"%PDF-1.4")
+        self.assertEqual(response["Cache-Control"], "private, no-cache")
+
+        staff = User.objects.create_user(username="staff", password="x", is_staff=True)
+        self.client.force_login(staff)
+        self.assertEqual(self.client.get(self.url).status_code, 200)
+        self.assertEqual(self.client.get(self.profile.contract_document.url).status_code, 200)
+
+    def test_other_users_are_rejected(self):
+        self.assertEqual(self.client.get(self.url).status_code, 302)  # connexion requise
+        self.client.force_login(User.objects.create_user(username="autre", password="x"))
+        self.assertEqual(self.client.get(self.url).status_code, 403)
+        self.assertEqual(self.client.get(self.profile.contract_document.url).status_code, 302)
+
+    @override_settings(MEDIA_SENDFILE_BACKEND="nginx", PRIVATE_MEDIA_ACCEL_REDIRECT_PREFIX="/internal-private-media/")
+    def test_x_accel_redirect(self):
+        self.client.force_login(self.owner)
+        response = self.client.get(self.url)
+        self.assertEqual(
+            response["X-Accel-Redirect"], "/internal-private-media/" + self.profile.contract_document.name
+        )
+
+
+class ImageDerivativesTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        override = override_settings(MEDIA_ROOT=media_root)
+        override.enable()
+        self.addCleanup(override.disable)
+        cache.clear()
+
+        buffer = io.BytesIO()
+        Image.new("RGB", (800, 400), (200, 30, 30)).save(buffer, "JPEG")
+        self.name = default_storage.save("studios/plateau.jpg", ContentFile(buffer.getvalue()))
+
+    def test_generated_once_and_shared_through_the_database(self):
+        derivatives = images.get_derivatives(self.name)
+        self.assertEqual([width for width, _ in derivatives["webp"]], [320, 640, 800])
+        self.assertTrue(all(default_storage.exists(name) for _, name in derivatives["jpeg"]))
+        self.assertEqual(ImageDerivatives.objects.get(name=self.name).status, ImageDerivativesStatus.READY)
+
+        cache.clear()  # autre worker : rien en cache local
+        with mock.patch.object(images, "generate_derivatives") as generate:
+            self.assertEqual(images.get_derivatives(self.name), {k: [list(d) for d in v] for k, v in derivatives.items()})
+        generate.assert_not_called()
+
+    def test_generation_in_progress_elsewhere_serves_the_original(self):
+        ImageDerivatives.objects.create(name=self.name, next_attempt_at=timezone.now() + timedelta(minutes=1))
+        with mock.patch.object(images, "generate_derivatives") as generate:
+            self.assertIsNone(images.get_derivatives(self.name))
+        generate.assert_not_called()
+
+    def test_failures_are_retried_after_a_short_delay(self):
+        self.assertIsNone(images.get_derivatives("studios/absent.jpg"))
+        row = ImageDerivatives.objects.get(name="studios/absent.jpg")
+        self.assertEqual((row.status, row.attempts), (ImageDerivativesStatus.FAILED, 1))
+        self.assertLessEqual(row.next_attempt_at, timezone.now() + timedelta(seconds=images.DERIVATIVES_RETRY_BASE_DELAY))
+
+        with mock.patch.object(images, "generate_derivatives") as generate:
+            self.assertIsNone(images.get_derivatives("studios/absent.jpg"))
+        generate.assert_not_called()
+
+        ImageDerivatives.objects.filter(pk=row.pk).update(next_attempt_at=timezone.now())
+        with mock.patch.object(images, "generate_derivatives", return_value={"webp": [], "jpeg": []}) as generate:
+            images.get_derivatives("studios/absent.jpg")
+        generate.assert_called_once()
+        self.assertEqual(ImageDerivatives.objects.get(pk=row.pk).status, ImageDerivativesStatus.READY)
+
+
+class ContentAddressedStorageTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        override = override_settings(MEDIA_ROOT=media_root)
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def _equipment(self, content):
+        equipment = Equipment(name="Caméra")
+        with self.captureOnCommitCallbacks(execute=True):
+            equipment.manual.save("manuel.pdf", ContentFile(content))
+        return equipment
+
+    def _blob(self, name):
+        return StoredBlob.objects.filter(name=name).values_list("ref_count", flat=True).first()
+
+    def test_same_content_is_stored_once(self):
+        first, second = self._equipment(b"%PDF manuel"), self._equipment(b"%PDF manuel")
+        self.assertEqual(first.manual.name, second.manual.name)
+        self.assertTrue(first.manual.name.startswith("cas/"))
+        self.assertEqual(self._blob(first.manual.name), 2)
+
+    def test_deleting_rows_releases_references(self):
+        first, second = self._equipment(b"%PDF manuel"), self._equipment(b"%PDF manuel")
+        name = first.manual.name
+
+        with self.captureOnCommitCallbacks(execute=True):
+            first.delete()
+        self.assertEqual(self._blob(name), 1)
+        self.assertTrue(cas_storage.exists(name))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            second.delete()
+        self.assertIsNone(self._blob(name))
+        self.assertFalse(cas_storage.exists(name))
+
+    def test_replacing_the_file_releases_the_old_one(self):
+        equipment = self._equipment(b"%PDF v1")
+        old_name = equipment.manual.name
+
+        with self.captureOnCommitCallbacks(execute=True):
+            equipment.manual = ContentFile(b"%PDF v2", name="manuel.pdf")
+            equipment.save()
+        self.assertNotEqual(equipment.manual.name, old_name)
+        self.assertFalse(cas_storage.exists(old_name))
+
+        # Même contenu renvoyé : toujours une seule référence
+        with self.captureOnCommitCallbacks(execute=True):
+            equipment.manual = ContentFile(b"%PDF v2", name="manuel.pdf")
+            equipment.save()
+        self.assertEqual(self._blob(equipment.manual.name), 1)
+
+    def test_untracked_blob_is_not_deleted(self):
+        name = cas_storage.save("manuel.pdf", ContentFile(b"%PDF manuel"))
+        StoredBlob.objects.filter(name=name).delete()
+        cas_storage.delete(name)
+        self.assertTrue(cas_storage.exists(name))
+
+    def test_recount_keeps_recent_orphans(self):
+        kept = self._equipment(b"%PDF garde")
+        StoredBlob.objects.filter(name=kept.manual.name).update(ref_count=5)
+        recent = cas_storage.save("recent.pdf", ContentFile(b"%PDF upload en cours"))
+        old = cas_storage.save("ancien.pdf", ContentFile(b"%PDF orphelin"))
+        StoredBlob.objects.filter(name__in=[kept.manual.name, old]).update(
+            created_at=timezone.now() - timedelta(days=2)
+        )
+
+        call_command("migrate_to_cas", stdout=io.StringIO())
+
+        self.assertEqual(self._blob(kept.manual.name), 1)
+        self.assertEqual(self._blob(recent), 1)
+        self.assertTrue(cas_storage.exists(recent))
+        self.assertIsNone(self._blob(old))
+        self.assertFalse(cas_storage.exists(old))
+
+    def test_migrates_a_file_shared_by_several_rows(self):
+        storage = Equipment._meta.get_field("manual").storage
+        os.makedirs(os.path.dirname(storage.path("manuals/ancien.pdf")), exist_ok=True)
+        with open(storage.path("manuals/ancien.pdf"), "wb") as f:
+            f.write(b"%PDF ancien")
+        first = Equipment.objects.create(name="Caméra A", manual="manuals/ancien.pdf")
+        second = Equipment.objects.create(name="Caméra B", manual="manuals/ancien.pdf")
+
+        err = io.StringIO()
+        call_command("migrate_to_cas", stdout=io.StringIO(), stderr=err)
+
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertEqual(err.getvalue(), "")
+        self.assertTrue(first.manual.name.startswith("cas/"))
+        self.assertEqual(second.manual.name, first.manual.name)
+        self.assertEqual(self._blob(first.manual.name), 2)
+        self.assertFalse(storage.exists("manuals/ancien.pdf"))
+
+
+class HubChannelLayerTests(SimpleTestCase):
+    """Deux instances de HubChannelLayer simulent deux processus workers."""
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmpdir, ignore_errors=True)
+        self.path = os.path.join(self.tmpdir, "hub.sock")
+
+    async def start_hub(self):
+        self.hub = ChannelHub()
+        started = asyncio.Event()
+        task = asyncio.create_task(self.hub.serve(self.path, started=started.set))
+        await started.wait()
+        return task
+
+    async def stop_hub(self, task, *layers):
+        for layer in layers:
+            await layer.close()
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+
+    async def test_send_receive_and_groups_across_layers(self):
+        hub = await self.start_hub()
+        worker_a, worker_b = HubChannelLayer(path=self.path), HubChannelLayer(path=self.path)
+
+        channel = await worker_b.new_channel()
+        receiving = asyncio.create_task(worker_b.receive(channel))
+        await asyncio.sleep(0.01)
+        await worker_a.send(channel, {"type": "chat.message", "text": "bonjour"})
+        self.assertEqual(await receiving, {"type": "chat.message", "text": "bonjour"})
+
+        other = await worker_a.new_channel()
+        await worker_a.group_add("chat_1", other)
+        await worker_b.group_add("chat_1", channel)
+        await worker_a.group_send("chat_1", {"type": "chat.message", "n": 1})
+        self.assertEqual((await worker_a.receive(other))["n"], 1)
+        self.assertEqual((await worker_b.receive(channel))["n"], 1)
+
+        await worker_b.group_discard("chat_1", channel)
+        await worker_a.group_send("chat_1", {"type": "chat.message", "n": 2})
+        self.assertEqual((await worker_a.receive(other))["n"], 2)
+        self.assertNotIn(channel, self.hub.queues)
+
+        await self.stop_hub(hub, worker_a, worker_b)
+
+    async def test_capacity_expiry_and_flush(self):
+        hub = await self.start_hub()
+        layer = HubChannelLayer(path=self.path, capacity=2, expiry=0.05, group_expiry=0.05)
+
+        await layer.send("bench.a", {"type": "x"})
+        await layer.send("bench.a", {"type": "x"})
+        with self.assertRaises(ChannelFull):
+            await layer.send("bench.a", {"type": "x"})
+
+        await layer.group_add("g", "bench.b")
+        await asyncio.sleep(0.1)
+        self.hub.cleanup()
+        self.assertEqual(self.hub.queues, {})
+        self.assertEqual(self.hub.groups, {})
+
+        await layer.send("bench.a", {"type": "x"})
+        await layer.flush()
+        with self.assertRaises(asyncio.TimeoutError):
+            await asyncio.wait_for(layer.receive("bench.a"), 0.05)
+
+        await self.stop_hub(hub, layer)
+
+    async def test_cancelled_receive_does_not_swallow_messages(self):
+        hub = await self.start_hub()
+        layer = HubChannelLayer(path=self.path)
+
+        with self.assertRaises(asyncio.TimeoutError):
+            await asyncio.wait_for(layer.receive("bench.c"), 0.02)
+        await asyncio.sleep(0.01)  # annulation transmise au hub
+        await layer.send("bench.c", {"type": "x", "n": 1})
+        self.assertEqual((await layer.receive("bench.c"))["n"], 1)
+
+        await self.stop_hub(hub, layer)
@@ -7,4 +7,8 @@ urlpatterns = [
     path('', views.home_view, name='home'),
     path("a-propos/", views.AboutView.as_view(), name="about"),
     path("realisations/", views.RealisationsView.as_view(), name="realisations"),
+
+    # Documents privés (contrats, pièces d'identité, CV, reçus)
+    path("documents/<slug:kind>/<int:pk>/", views.protected_document_view, name="protected_document"),
+    path("documents/fichiers/<path:path>", views.private_media_view, name="private_media"),
 ]
\ No newline at end of file
@@ -1,9 +1,19 @@
 # apps/core/views.py
+import os
+
 from django.shortcuts import render
 from django.conf import settings
+from django.contrib.admin.views.decorators import staff_member_required
+from django.contrib.auth.decorators import login_required
+from django.core.exceptions import PermissionDenied
+from django.http import Http404
 from apps.services_app.models import Service, Partner, Training
 from apps.studio.models import Studio   # <--- AJOUT
 from django.views.generic import TemplateView
+from django.views.decorators.http import require_safe
+
+from apps.core.documents import can_access_document, get_protected_document
+from apps.core.media import serve_file
 
 def home_view(request):
     services = (
@@ -57,4 +67,49 @@ class AboutView(TemplateView):
     template_name = "user/about.html"
 
 class RealisationsView(TemplateView):
-    template_name = "user/realisations.html"
\ No newline at end of file
+    template_name = "user/realisations.html"
+
+
+@require_safe
+def media_view(request, path):
+    """
+    Sert les fichiers de MEDIA_ROOT (vidéos hero / portfolio, images…) avec
+    Range / 206, ETag et cache ; délégué au serveur web si configuré.
+    """
+    return serve_file(request, path)
+
+
+def _serve_private(request, name, **kwargs):
+    return serve_file(
+        request,
+        name,
+        root=settings.PRIVATE_MEDIA_ROOT,
+        accel_prefix=settings.PRIVATE_MEDIA_ACCEL_REDIRECT_PREFIX,
+        cache_control="private, no-cache",
+        **kwargs,
+    )
+
+
+@require_safe
+@login_required
+def protected_document_view(request, kind, pk):
+    """
+    Téléchargement d'un document privé après contrôle d'accès
+    (staff ou propriétaire) ; transfert délégué au serveur web si configuré.
+    """
+    found = get_protected_document(kind, pk)
+    if found is None:
+        raise Http404("Document introuvable.")
+    obj, document = found
+    if not can_access_document(request.user, kind, obj):
+        raise PermissionDenied
+    return _serve_private(request, document.name, filename=os.path.basename(document.name))
+
+
+@require_safe
+@staff_member_required
+def private_media_view(request, path):
+    """
+    Accès direct par chemin aux documents privés (liens .url du dashboard / de l'admin).
+    """
+    return _serve_private(request, path)
@@ -17,6 +17,14 @@ from .views import (
     equipment_delete_view,
     equipment_detail_view, 
     equipment_export_excel_view,
+    equipment_checkout_view,
+    equipment_checkin_view,
+    equipment_batch_checkout_view,
+    equipment_batch_checkin_view,
+    equipment_out_view,
+    equipment_scan_view,
+    equipment_import_view,
+    equipment_analytics_view,
     # Réservations
     reservation_list_view,
     reservation_detail_view,
@@ -57,6 +65,7 @@ from .views import (
     studio_detail_view,
     studio_update_view,
     studio_delete_view,
+    studio_analytics_view,
 
 )
 
@@ -81,6 +90,14 @@ urlpatterns = [
     path('equipments/<int:equipment_id>/edit/', equipment_update_view, name='equipments_edit'),
     path('equipments/<int:equipment_id>/delete/', equipment_delete_view, name='equipments_delete'),
     path('equipments/export/excel/', equipment_export_excel_view, name='equipments_export_excel'),
+    path('equipments/<int:equipment_id>/checkout/', equipment_checkout_view, name='equipments_checkout'),
+    path('equipments/<int:equipment_id>/checkin/', equipment_checkin_view, name='equipments_checkin'),
+    path('equipments/checkout/', equipment_batch_checkout_view, name='equipments_batch_checkout'),
+    path('equipments/checkin/', equipment_batch_checkin_view, name='equipments_batch_checkin'),
+    path('equipments/out/', equipment_out_view, name='equipments_out'),
+    path('equipments/scan/', equipment_scan_view, name='equipments_scan'),
+    path('equipments/import/', equipment_import_view, name='equipments_import'),
+    path('equipments/analytics/', equipment_analytics_view, name='equipments_analytics'),
 
     # Réservations
     path('reservations/', reservation_list_view, name='reservations_list'),
@@ -133,6 +150,7 @@ urlpatterns = [
     path('studios/<int:studio_id>/', studio_detail_view, name='studios_detail'),
     path('studios/<int:studio_id>/edit/', studio_update_view, name='studios_edit'),
     path('studios/<int:studio_id>/delete/', studio_delete_view, name='studios_delete'),
+    path('studios/analytics/', studio_analytics_view, name='studios_analytics'),
 
 
     # Candidatures
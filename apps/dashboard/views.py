@@ -1,8 +1,10 @@
+import json
 from datetime import timedelta
 
 from django.contrib import messages
 from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth.forms import AdminPasswordChangeForm
+from django.db import transaction
 from django.db.models import Sum
 from django.shortcuts import render, redirect, get_object_or_404
 from django.utils import timezone
@@ -15,28 +17,53 @@ from apps.payments.models import Payment, PaymentStatus
 from apps.services_app.models import Service, Training, Partner
 from apps.studio.choices import EquipmentStatus, ReservationStatus
 from apps.studio.models import Reservation, Equipment, Studio
-from apps.studio.forms import EquipmentForm, ReservationAdminForm
+from apps.studio.forms import (
+    EquipmentForm,
+    ReservationAdminForm,
+    EquipmentCheckoutForm,
+    EquipmentBatchCheckoutForm,
+    EquipmentCheckinForm,
+    EquipmentBatchCheckinForm,
+    EquipmentImportForm,
+)
+from apps.studio.importing import import_equipments, ImportFileError
 from apps.services_app.models import Service, Training, Partner, Offer
 from apps.services_app.forms import ServiceForm, OfferForm, TrainingForm, PartnerForm
 from apps.accounts.models import User, EmployeeProfile
 from django.core.paginator import Paginator
-from django.db.models import Q, Sum
+from django.db.models import F, Q, Sum
 from apps.accounts.models import User, EmployeeProfile, ContractTypeChoices
-from django.http import HttpResponse
+from django.http import HttpResponse, JsonResponse
+from django.utils.dateparse import parse_date
 from openpyxl import Workbook
 from apps.studio.models import Equipment, EquipmentCategory
 from apps.studio.choices import EquipmentStatus
 from openpyxl.styles import Font, Alignment, PatternFill
 from apps.studio.models import Reservation, Equipment, Studio, ReservationStatusHistory
-from apps.studio.services import log_reservation_status_change
+from apps.studio.services import (
+    log_reservation_status_change,
+    suggest_free_slots,
+    checkout_equipments,
+    checkin_equipments,
+    get_open_equipment_usages,
+    get_overdue_equipment_usages,
+    lookup_equipments_by_codes,
+    SCAN_MAX_CODES,
+)
+from django.core.exceptions import ValidationError
 from apps.studio.choices import ReservationStatus
 from apps.services_app.models import Service, ServiceCategory, ServiceTypeChoices
 from apps.services_app.models import Offer
 from apps.services_app.models import Training, TrainingCategory, TrainingLevelChoices, TrainingModeChoices
 from apps.services_app.forms import TrainingForm
-from apps.notifications.services import notify_user_reservation_status_change
+from apps.notifications.services import (
+    notify_user_reservation_status_change,
+    notify_users_new_offer,
+    notify_users_new_training_session,
+)
 from apps.notifications.models import Notification, NotificationTypeChoices
 from apps.studio.forms import StudioForm
+from apps.studio.analytics import get_studio_occupancy, get_equipment_utilization, UTILIZATION_WINDOWS_DAYS
 from django.views.decorators.http import require_POST
 from django.shortcuts import redirect
 from django.contrib import messages
@@ -725,12 +752,21 @@ def employee_change_password_view(request, user_id):
 
 # ---------- GESTION DES ÉQUIPEMENTS ----------
 
+# Tris proposés sur la liste des équipements : clé GET -> order_by
+EQUIPMENT_LIST_SORTS = {
+    'maintenance': ('-maintenance_due', F('next_maintenance_date').asc(nulls_last=True), 'id'),
+    'age_desc': (F('age_in_years').desc(nulls_last=True), 'id'),
+    'age_asc': (F('age_in_years').asc(nulls_last=True), 'id'),
+    'name': ('name', 'id'),
+}
+
+
 @staff_member_required
 def equipment_list_view(request):
     qs = (
         Equipment.objects
+        .with_maintenance_info()
         .select_related('category', 'current_user')
-        .order_by('id')
     )
 
     # --- Recherche libre ---
@@ -761,6 +797,16 @@ def equipment_list_view(request):
     elif selected_rental == 'no':
         qs = qs.filter(is_available_for_rent=False)
 
+    selected_maintenance = request.GET.get('maintenance', '')  # due / ok
+    if selected_maintenance == 'due':
+        qs = qs.filter(maintenance_due=True)
+    elif selected_maintenance == 'ok':
+        qs = qs.filter(maintenance_due=False)
+
+    # --- Tri (annotations calculées en base) ---
+    selected_sort = request.GET.get('sort', '')
+    qs = qs.order_by(*EQUIPMENT_LIST_SORTS.get(selected_sort, ('id',)))
+
     # --- Statistiques sur la liste filtrée ---
     stats_qs = qs  # la même requête filtrée
 
@@ -791,6 +837,8 @@ def equipment_list_view(request):
         "selected_category": selected_category,
         "selected_status": selected_status,
         "selected_rental": selected_rental,
+        "selected_maintenance": selected_maintenance,
+        "selected_sort": selected_sort,
         "categories": categories,
         "status_choices": EquipmentStatus.choices,
         "base_querystring": base_querystring,
@@ -821,6 +869,7 @@ def equipment_export_excel_view(request):
     """
     qs = (
         Equipment.objects
+        .with_maintenance_info()
         .select_related('category', 'current_user')
         .order_by('id')
     )
@@ -852,6 +901,12 @@ def equipment_export_excel_view(request):
     elif selected_rental == 'no':
         qs = qs.filter(is_available_for_rent=False)
 
+    selected_maintenance = request.GET.get('maintenance', '')
+    if selected_maintenance == 'due':
+        qs = qs.filter(maintenance_due=True)
+    elif selected_maintenance == 'ok':
+        qs = qs.filter(maintenance_due=False)
+
     # Création du classeur Excel
     wb = Workbook()
     ws = wb.active
@@ -937,8 +992,18 @@ def equipment_detail_view(request, equipment_id):
         pk=equipment_id
     )
 
+    open_usage = (
+        equipment.usage_history
+        .filter(end_datetime__isnull=True)
+        .select_related('used_by')
+        .first()
+    )
+
     context = {
         "equipment": equipment,
+        "open_usage": open_usage,
+        "checkout_form": EquipmentCheckoutForm(),
+        "checkin_form": EquipmentCheckinForm(),
         "unread_notifications_count": Notification.objects.filter(user=request.user, is_read=False).count(),
         "unread_messages_count": Notification.objects.filter(
             user=request.user,
@@ -973,6 +1038,72 @@ def equipment_create_view(request):
     return render(request, "admin/equipments/form.html", context)
 
 
+@staff_member_required
+def equipment_import_view(request):
+    """
+    Import en masse de l'inventaire (XLSX / CSV) avec rapport d'erreurs par ligne.
+    """
+    report = None
+
+    if request.method == "POST":
+        form = EquipmentImportForm(request.POST, request.FILES)
+        if form.is_valid():
+            try:
+                report = import_equipments(
+                    form.cleaned_data["file"],
+                    create_categories=form.cleaned_data["create_categories"],
+                )
+            except ImportFileError as e:
+                form.add_error("file", str(e))
+            else:
+                messages.success(
+                    request,
+                    f"Import terminé : {report['created']} créé(s), {report['updated']} mis à jour, "
+                    f"{len(report['errors'])} ligne(s) en erreur.",
+                )
+    else:
+        form = EquipmentImportForm()
+
+    context = {
+        "form": form,
+        "report": report,
+        "unread_notifications_count": Notification.objects.filter(user=request.user, is_read=False).count(),
+        "unread_messages_count": Notification.objects.filter(
+            user=request.user,
+            notification_type=NotificationTypeChoices.MESSAGE_RECEIVED,
+            is_read=False
+        ).count(),
+    }
+    return render(request, "admin/equipments/import.html", context)
+
+
+@staff_member_required
+def equipment_analytics_view(request):
+    """
+    Utilisation et rentabilité du matériel (par équipement et par catégorie),
+    lues depuis les statistiques précalculées (commande refresh_equipment_stats).
+    """
+    try:
+        window_days = int(request.GET.get('window', 30))
+    except ValueError:
+        window_days = 30
+    if window_days not in UTILIZATION_WINDOWS_DAYS:
+        window_days = 30
+
+    context = {
+        "utilization": get_equipment_utilization(window_days),
+        "windows": UTILIZATION_WINDOWS_DAYS,
+        "window_days": window_days,
+        "unread_notifications_count": Notification.objects.filter(user=request.user, is_read=False).count(),
+        "unread_messages_count": Notification.objects.filter(
+            user=request.user,
+            notification_type=NotificationTypeChoices.MESSAGE_RECEIVED,
+            is_read=False
+        ).count(),
+    }
+    return render(request, "admin/equipments/analytics.html", context)
+
+
 @staff_member_required
 def equipment_update_view(request, equipment_id):
     equipment = get_object_or_404(Equipment, pk=equipment_id)
@@ -1020,6 +1151,186 @@ def equipment_delete_view(request, equipment_id):
     return render(request, "admin/equipments/confirm_delete.html", context)
 
 
+# ---------- SORTIE / RETOUR DE MATÉRIEL ----------
+
+def _usage_to_dict(usage, now):
+    equipment = usage.equipment
+    user = usage.used_by
+    return {
+        "usage_id": usage.id,
+        "equipment_id": equipment.id,
+        "equipment": equipment.name,
+        "serial_number": equipment.serial_number,
+        "category": equipment.category.name if equipment.category else "",
+        "location": equipment.location,
+        "user_id": user.id if user else None,
+        "user": (user.get_full_name() or user.username) if user else "",
+        "start_datetime": usage.start_datetime.isoformat(),
+        "due_datetime": usage.due_datetime.isoformat() if usage.due_datetime else None,
+        "overdue": bool(usage.due_datetime and usage.due_datetime < now),
+    }
+
+
+@staff_member_required
+@require_POST
+def equipment_checkout_view(request, equipment_id):
+    equipment = get_object_or_404(Equipment, pk=equipment_id)
+    form = EquipmentCheckoutForm(request.POST)
+
+    if form.is_valid():
+        try:
+            checkout_equipments(
+                [equipment.pk],
+                form.cleaned_data["user"],
+                due_datetime=form.cleaned_data["due_datetime"],
+                notes=form.cleaned_data["notes"],
+            )
+        except ValidationError as e:
+            messages.error(request, " ".join(e.messages))
+        else:
+            messages.success(request, f"Sortie de {equipment.name} enregistrée.")
+    else:
+        messages.error(request, "Sortie impossible : vérifiez l'utilisateur et la date de retour.")
+
+    return redirect('dashboard:equipments_detail', equipment_id=equipment.pk)
+
+
+@staff_member_required
+@require_POST
+def equipment_checkin_view(request, equipment_id):
+    equipment = get_object_or_404(Equipment, pk=equipment_id)
+    form = EquipmentCheckinForm(request.POST)
+    if form.is_valid():
+        try:
+            checkin_equipments([equipment.pk], notes=form.cleaned_data["notes"])
+        except ValidationError as e:
+            messages.error(request, " ".join(e.messages))
+        else:
+            messages.success(request, f"Retour de {equipment.name} enregistré.")
+    else:
+        messages.error(request, "Retour impossible : vérifiez les notes saisies.")
+
+    return redirect('dashboard:equipments_detail', equipment_id=equipment.pk)
+
+
+@staff_member_required
+@require_POST
+def equipment_batch_checkout_view(request):
+    """
+    Sortie d'un kit (plusieurs équipements) en une transaction. Réponse JSON.
+    """
+    form = EquipmentBatchCheckoutForm(request.POST)
+    if not form.is_valid():
+        return JsonResponse({"errors": form.errors}, status=400)
+
+    try:
+        usages = checkout_equipments(
+            [e.pk for e in form.cleaned_data["equipments"]],
+            form.cleaned_data["user"],
+            due_datetime=form.cleaned_data["due_datetime"],
+            notes=form.cleaned_data["notes"],
+        )
+    except ValidationError as e:
+        return JsonResponse({"errors": {"__all__": e.messages}}, status=409)
+
+    return JsonResponse({
+        "checked_out": [u.equipment_id for u in usages],
+        "count": len(usages),
+    })
+
+
+@staff_member_required
+@require_POST
+def equipment_batch_checkin_view(request):
+    """
+    Retour d'un kit (plusieurs équipements) en une transaction. Réponse JSON.
+    """
+    form = EquipmentBatchCheckinForm(request.POST)
+    if not form.is_valid():
+        return JsonResponse({"errors": form.errors}, status=400)
+
+    ids = [e.pk for e in form.cleaned_data["equipments"]]
+    try:
+        checkin_equipments(ids, notes=form.cleaned_data["notes"])
+    except ValidationError as e:
+        return JsonResponse({"errors": {"__all__": e.messages}}, status=409)
+
+    return JsonResponse({"checked_in": ids, "count": len(ids)})
+
+
+def _equipment_scan_card(code, equipment, today):
+    if equipment is None:
+        return {"code": code, "found": False}
+    user = equipment.current_user
+    next_maintenance = equipment.next_maintenance_date
+    return {
+        "code": code,
+        "found": True,
+        "id": equipment.id,
+        "name": equipment.name,
+        "serial_number": equipment.serial_number,
+        "status": equipment.status,
+        "status_label": equipment.get_status_display(),
+        "location": equipment.location,
+        "current_user": (user.get_full_name() or user.username) if user else None,
+        "next_maintenance": next_maintenance.isoformat() if next_maintenance else None,
+        "maintenance_alert": bool(next_maintenance and next_maintenance <= today),
+    }
+
+
+@staff_member_required
+def equipment_scan_view(request):
+    """
+    Recherche exacte par n° de série / QR code pour le scan en entrepôt (JSON).
+    GET ?code=...&code=... ou POST (champ "code" répété, ou JSON {"codes": [...]})
+    pour vérifier un kit complet en une requête.
+    """
+    if request.method == "POST" and request.content_type == "application/json":
+        try:
+            payload = json.loads(request.body or b"{}")
+        except ValueError:
+            return JsonResponse({"error": "JSON invalide."}, status=400)
+        codes = payload.get("codes") if isinstance(payload, dict) else None
+        if not isinstance(codes, list):
+            return JsonResponse({"error": "Le champ 'codes' doit être une liste."}, status=400)
+    else:
+        params = request.POST if request.method == "POST" else request.GET
+        codes = params.getlist("code")
+
+    codes = [str(c).strip() for c in codes if str(c).strip()]
+    if not codes:
+        return JsonResponse({"error": "Aucun code fourni."}, status=400)
+    if len(codes) > SCAN_MAX_CODES:
+        return JsonResponse({"error": f"Maximum {SCAN_MAX_CODES} codes par requête."}, status=400)
+
+    today = timezone.localdate()
+    results = [_equipment_scan_card(code, e, today) for code, e in lookup_equipments_by_codes(codes)]
+    return JsonResponse({
+        "count": len(results),
+        "found": sum(1 for r in results if r["found"]),
+        "results": results,
+    })
+
+
+@staff_member_required
+def equipment_out_view(request):
+    """
+    Matériel actuellement sorti et avec qui (JSON). ?overdue=yes : seulement les retards.
+    """
+    now = timezone.now()
+    if request.GET.get("overdue") == "yes":
+        usages = get_overdue_equipment_usages(now)
+    else:
+        usages = get_open_equipment_usages()
+
+    items = [_usage_to_dict(u, now) for u in usages]
+    return JsonResponse({
+        "count": len(items),
+        "overdue_count": sum(1 for i in items if i["overdue"]),
+        "items": items,
+    })
+
+
 # ---------- GESTION DES RÉSERVATIONS ----------
 
 @staff_member_required
@@ -1341,6 +1652,11 @@ def reservation_detail_view(request, reservation_id):
             if not user_message:
                 user_message = None
 
+    # --- Créneaux libres proches des dates souhaitées par le client ---
+    slot_suggestions = []
+    if reservation.status in (ReservationStatus.PENDING, ReservationStatus.CONFIRMED):
+        slot_suggestions = suggest_free_slots(reservation)
+
     context = {
         "reservation": reservation,
         "form": form,
@@ -1348,6 +1664,7 @@ def reservation_detail_view(request, reservation_id):
         "event_type_label": event_type_label,
         "guests_count": guests_count,
         "user_message": user_message,
+        "slot_suggestions": slot_suggestions,
         "unread_notifications_count": Notification.objects.filter(user=request.user, is_read=False).count(),
         "unread_messages_count": Notification.objects.filter(
             user=request.user,
@@ -1854,7 +2171,11 @@ def offer_create_view(request):
     if request.method == "POST":
         form = OfferForm(request.POST)
         if form.is_valid():
-            offer = form.save()
+            with transaction.atomic():
+                offer = form.save()
+                if offer.is_active:
+                    # Notification + campagne email aux clients (envoyée par send_email_campaigns)
+                    notify_users_new_offer(offer, User.objects.filter(is_active=True, is_staff=False))
             messages.success(request, f"Offre {offer.title} créée avec succès.")
             return redirect('dashboard:offers_list')
     else:
@@ -2094,7 +2415,11 @@ def training_create_view(request):
     if request.method == "POST":
         form = TrainingForm(request.POST, request.FILES)
         if form.is_valid():
-            training = form.save()
+            with transaction.atomic():
+                training = form.save()
+                if training.is_active:
+                    # Notification + campagne email aux clients (envoyée par send_email_campaigns)
+                    notify_users_new_training_session(training, User.objects.filter(is_active=True, is_staff=False))
             messages.success(request, f"Formation {training.title} créée avec succès.")
             return redirect('dashboard:trainings_list')
     else:
@@ -2521,6 +2846,30 @@ def studio_delete_view(request, studio_id):
     return render(request, "admin/studios/confirm_delete.html", context)
 
 
+@staff_member_required
+def studio_analytics_view(request):
+    """
+    Statistiques d'occupation des studios (JSON) sur une période :
+    heatmap jour de semaine × heure et délais de réservation par studio.
+    Paramètres GET : date_from, date_to (AAAA-MM-JJ, 365 derniers jours par défaut), studio.
+    """
+    today = timezone.localdate()
+    date_from_raw = request.GET.get("date_from", "")
+    date_to_raw = request.GET.get("date_to", "")
+    date_to = parse_date(date_to_raw) if date_to_raw else today
+    date_from = parse_date(date_from_raw) if date_from_raw else (date_to or today) - timedelta(days=365)
+
+    if date_from is None or date_to is None or date_from > date_to:
+        return JsonResponse({"error": "Période invalide."}, status=400)
+
+    studio_id = request.GET.get("studio", "")
+    if studio_id and not studio_id.isdigit():
+        return JsonResponse({"error": "Studio invalide."}, status=400)
+
+    data = get_studio_occupancy(date_from, date_to, studio_id=int(studio_id) if studio_id else None)
+    return JsonResponse(data)
+
+
 
 #=====================================================================================================================================================================================
 # apps/dashboard/views.py (à ajouter)
@@ -2567,33 +2916,35 @@ def reservation_set_status_view(request, reservation_id):
         messages.error(request, "Impossible de confirmer : ce créneau est déjà passé.")
         return redirect(next_url)
 
-    reservation.status = new_status
-    reservation.save(update_fields=["status"])
+    # Statut, historique, notification et email (file d'attente) : tout ou rien
+    with transaction.atomic():
+        reservation.status = new_status
+        reservation.save(update_fields=["status"])
 
-    # Historique
-    log_reservation_status_change(
-        reservation=reservation,
-        old_status=old_status,
-        new_status=new_status,
-        changed_by=request.user,
-        note=f"Changement rapide de statut -> {new_status}",
-    )
+        # Historique
+        log_reservation_status_change(
+            reservation=reservation,
+            old_status=old_status,
+            new_status=new_status,
+            changed_by=request.user,
+            note=f"Changement rapide de statut -> {new_status}",
+        )
 
-    # Notification client
-    notify_user_reservation_status_change(
-        reservation=reservation,
-        old_status=_status_label(old_status),
-        new_status=_status_label(new_status),
-        actor=request.user,
-    )
+        # Notification client
+        notify_user_reservation_status_change(
+            reservation=reservation,
+            old_status=_status_label(old_status),
+            new_status=_status_label(new_status),
+            actor=request.user,
+        )
 
-    send_reservation_status_changed_email(
-    request=request,
-    reservation=reservation,
-    old_status_label=_status_label(old_status),
-    new_status_label=_status_label(new_status),
-    admin_note = reservation.admin_comment or ""
-    )
+        send_reservation_status_changed_email(
+            request=request,
+            reservation=reservation,
+            old_status_label=_status_label(old_status),
+            new_status_label=_status_label(new_status),
+            admin_note=reservation.admin_comment or "",
+        )
 
     messages.success(request, f"Statut mis à jour : {_status_label(new_status)}")
     return redirect(next_url)
@@ -3,15 +3,28 @@ from .models import Conversation, Message
 
 
 class MessageInline(admin.TabularInline):
+    # Lecture seule : les messages passent par messaging.services.post_message,
+    # qui tient à jour le résumé de la conversation
     model = Message
     extra = 0
-    readonly_fields = ('sender', 'content', 'sent_at')
+    can_delete = False
+    fields = readonly_fields = ('sender', 'content', 'sent_at', 'is_read')
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
 
 
 @admin.register(Conversation)
 class ConversationAdmin(admin.ModelAdmin):
-    list_display = ('id', 'user', 'admin', 'created_at')
+    list_display = ('id', 'user', 'admin', 'last_message_at', 'admin_unread_count', 'user_unread_count', 'created_at')
     list_filter = ('created_at',)
+    readonly_fields = ('last_message_at', 'last_message_preview', 'last_sender', 'admin_unread_count', 'user_unread_count')
     search_fields = ('user__username', 'user__email', 'admin__username', 'admin__email')
     inlines = [MessageInline]
 
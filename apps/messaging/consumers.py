@@ -1,22 +1,46 @@
 import json
 from channels.generic.websocket import AsyncWebsocketConsumer
 from channels.db import database_sync_to_async
+from django.conf import settings
 from django.contrib.auth import get_user_model
 
-from .models import Conversation, Message
+from .models import Conversation
+from .services import (
+    CHAT_HISTORY_MAX_PAGE_SIZE,
+    CHAT_HISTORY_PAGE_SIZE,
+    get_chat_history,
+    mark_conversation_read,
+    post_message,
+    serialize_chat_history,
+)
+from .write_behind import get_message_buffer
 from apps.notifications.services import notify_new_chat_message
 
 User = get_user_model()
 
 
 class ChatConsumer(AsyncWebsocketConsumer):
+    @database_sync_to_async
+    def load_conversation(self, user, conversation_id):
+        """Conversation (avec utilisateur et admin) si `user` y participe : son client ou l'équipe."""
+        conversation = Conversation.objects.select_related('user', 'admin').filter(id=conversation_id).first()
+        if conversation is None or not (user.is_staff or conversation.user_id == user.id):
+            return None
+        return conversation
+
     async def connect(self):
         user = self.scope["user"]
         if user.is_anonymous:
             await self.close()
             return
 
-        self.conversation_id = self.scope['url_route']['kwargs']['conversation_id']
+        self.conversation_id = int(self.scope['url_route']['kwargs']['conversation_id'])
+        # Chargée une fois pour toute la connexion : autorisation, messages, notifications
+        self.conversation = await self.load_conversation(user, self.conversation_id)
+        if self.conversation is None:
+            await self.close()
+            return
+
         self.room_group_name = f"chat_{self.conversation_id}"
 
         await self.channel_layer.group_add(
@@ -26,6 +50,8 @@ class ChatConsumer(AsyncWebsocketConsumer):
         await self.accept()
 
     async def disconnect(self, close_code):
+        if settings.CHAT_WRITE_BEHIND:
+            await get_message_buffer().flush()
         if hasattr(self, 'room_group_name'):
             await self.channel_layer.group_discard(
                 self.room_group_name,
@@ -33,24 +59,63 @@ class ChatConsumer(AsyncWebsocketConsumer):
             )
 
     @database_sync_to_async
-    def save_message_and_notify(self, user, conversation_id, content):
-        conversation = Conversation.objects.get(id=conversation_id)
-        msg = Message.objects.create(
-            conversation=conversation,
-            sender=user,
-            content=content
-        )
-        # ICI : création de la notif
+    def save_message_and_notify(self, user, content):
+        msg = post_message(self.conversation, user, content)
+        # Notification (destinataires déduits de la conversation en cache)
         notify_new_chat_message(msg)
-        print("DEBUG: notification chat créée potentiellement")
         return msg.id
 
+    @database_sync_to_async
+    def load_history(self, before_id, limit):
+        return serialize_chat_history(*get_chat_history(self.conversation, before_id=before_id, limit=limit))
+
+    async def send_history(self, data):
+        """Commande {"command": "history", "before_id": id, "limit": n} : messages plus anciens."""
+        try:
+            before_id = int(data['before_id']) if data.get('before_id') is not None else None
+            limit = min(int(data.get('limit') or CHAT_HISTORY_PAGE_SIZE), CHAT_HISTORY_MAX_PAGE_SIZE)
+        except (TypeError, ValueError):
+            return
+        history = await self.load_history(before_id, max(limit, 1))
+        await self.send(text_data=json.dumps(history, separators=(",", ":")))
+
+    @database_sync_to_async
+    def mark_read(self, user, up_to_id):
+        return mark_conversation_read(self.conversation, user, up_to_id=up_to_id)
+
+    async def send_read(self, data):
+        """
+        Commande {"command": "read", "up_to_id": id} : messages reçus lus jusqu'à
+        `up_to_id` (tous si absent). Un seul accusé de lecture est diffusé.
+        """
+        try:
+            up_to_id = int(data['up_to_id']) if data.get('up_to_id') is not None else None
+        except (TypeError, ValueError):
+            return
+        user = self.scope['user']
+        if await self.mark_read(user, up_to_id):
+            await self.channel_layer.group_send(
+                self.room_group_name,
+                {
+                    "type": "chat_read",
+                    "user_id": user.id,
+                    "up_to_id": up_to_id,
+                }
+            )
+
     async def receive(self, text_data=None, bytes_data=None):
         try:
             data = json.loads(text_data)
         except Exception:
             return
 
+        if data.get('command') == 'history':
+            await self.send_history(data)
+            return
+        if data.get('command') == 'read':
+            await self.send_read(data)
+            return
+
         message = data.get('message', '').strip()
         if not message:
             return
@@ -58,14 +123,21 @@ class ChatConsumer(AsyncWebsocketConsumer):
         user = self.scope['user']
         user_id = user.id
 
-        # Sauvegarder + notifier
-        await self.save_message_and_notify(user, int(self.conversation_id), message)
+        if settings.CHAT_WRITE_BEHIND:
+            # Écriture différée : enregistrement + notification au prochain vidage du tampon
+            # (l'id n'est pas encore connu au moment de la diffusion)
+            await get_message_buffer().add(self.conversation_id, user, message)
+            message_id = None
+        else:
+            # Sauvegarder + notifier
+            message_id = await self.save_message_and_notify(user, message)
 
         # Diffuser à tous les clients de la conversation
         await self.channel_layer.group_send(
             self.room_group_name,
             {
                 "type": "chat_message",
+                "id": message_id,
                 "message": message,
                 "user_id": user_id,
             }
@@ -73,6 +145,14 @@ class ChatConsumer(AsyncWebsocketConsumer):
 
     async def chat_message(self, event):
         await self.send(text_data=json.dumps({
+            "id": event.get("id"),
             "message": event["message"],
             "user_id": event["user_id"],
+        }))
+
+    async def chat_read(self, event):
+        await self.send(text_data=json.dumps({
+            "event": "read",
+            "user_id": event["user_id"],
+            "up_to_id": event["up_to_id"],
         }))
\ No newline at end of file
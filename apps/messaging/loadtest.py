@@ -0,0 +1,362 @@
+# apps/messaging/loadtest.py
+"""
+Test de charge du chat WebSocket (commande loadtest_chat).
+
+Ouvre de nombreuses connexions ws/chat/<id>/ réparties sur plusieurs
+conversations, fait envoyer des messages à un débit donné et mesure :
+latence de connexion, latence de diffusion (envoi -> réception par chaque
+participant), messages écrits en base par seconde et mémoire par connexion.
+
+Deux modes :
+- en processus (défaut) : l'application ASGI est appelée directement
+  (channels.testing.WebsocketCommunicator si daphne est installé, sinon
+  asgiref.testing.ApplicationCommunicator) ; la mémoire mesurée inclut les
+  consommateurs ;
+- socket réelle : connexions vers un serveur lancé (daphne / uvicorn), via le
+  paquet optionnel `websockets` ; authentification par cookie de session.
+"""
+import asyncio
+import json
+import os
+import time
+
+from asgiref.testing import ApplicationCommunicator
+from channels.routing import URLRouter
+from django.conf import settings
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY, get_user_model
+from django.contrib.sessions.backends.db import SessionStore
+
+from .models import Conversation, Message
+from .routing import websocket_urlpatterns
+
+try:
+    from channels.testing import WebsocketCommunicator
+except ImportError:  # channels.testing dépend de daphne
+    WebsocketCommunicator = None
+
+try:
+    import websockets
+except ImportError:
+    websockets = None
+
+User = get_user_model()
+
+LOADTEST_USER_PREFIX = "loadtest-"
+_MARKER = "lt"
+
+
+class ConnectionClosed(Exception):
+    pass
+
+
+def percentiles(values):
+    """p50 / p90 / p99 / max en millisecondes (rang le plus proche)."""
+    if not values:
+        return None
+    ordered = sorted(values)
+
+    def rank(p):
+        return ordered[max(int(len(ordered) * p + 0.5) - 1, 0)] * 1000
+
+    return {
+        "p50": round(rank(0.50), 3),
+        "p90": round(rank(0.90), 3),
+        "p99": round(rank(0.99), 3),
+        "max": round(ordered[-1] * 1000, 3),
+        "count": len(ordered),
+    }
+
+
+def rss_bytes(pid="self"):
+    """Mémoire résidente d'un processus (Linux), None si indisponible."""
+    try:
+        with open(f"/proc/{pid}/status") as status:
+            for line in status:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        return None
+    return None
+
+
+# ---------- CLIENTS ----------
+
+class InProcessClient:
+    """Connexion vers l'application ASGI appelée directement, sans serveur."""
+
+    def __init__(self, application, path, user):
+        if WebsocketCommunicator is not None:
+            self.communicator = WebsocketCommunicator(application, path)
+            self.communicator.scope["user"] = user
+        else:
+            self.communicator = ApplicationCommunicator(application, {
+                "type": "websocket",
+                "path": path,
+                "headers": [],
+                "subprotocols": [],
+                "user": user,
+            })
+
+    async def connect(self, timeout):
+        await self.communicator.send_input({"type": "websocket.connect"})
+        response = await self.communicator.receive_output(timeout)
+        return response["type"] == "websocket.accept"
+
+    async def send(self, text):
+        await self.communicator.send_input({"type": "websocket.receive", "text": text})
+
+    async def recv(self):
+        # output_queue directement : receive_output arrête l'application à l'expiration du délai
+        output = await self.communicator.output_queue.get()
+        if output["type"] == "websocket.close":
+            raise ConnectionClosed()
+        return output.get("text")
+
+    async def close(self, timeout):
+        await self.communicator.send_input({"type": "websocket.disconnect", "code": 1000})
+        try:
+            await self.communicator.wait(timeout)
+        except asyncio.TimeoutError:
+            pass
+
+
+class SocketClient:
+    """Connexion réelle vers un serveur ASGI lancé (daphne / uvicorn)."""
+
+    def __init__(self, url, session_key):
+        self.url = url
+        self.headers = {"Cookie": f"{settings.SESSION_COOKIE_NAME}={session_key}"}
+        self.socket = None
+
+    async def connect(self, timeout):
+        try:
+            try:
+                self.socket = await asyncio.wait_for(
+                    websockets.connect(self.url, additional_headers=self.headers), timeout
+                )
+            except TypeError:  # websockets < 14
+                self.socket = await asyncio.wait_for(
+                    websockets.connect(self.url, extra_headers=self.headers), timeout
+                )
+        except (OSError, asyncio.TimeoutError, websockets.exceptions.WebSocketException):
+            return False
+        return True
+
+    async def send(self, text):
+        await self.socket.send(text)
+
+    async def recv(self):
+        try:
+            return await self.socket.recv()
+        except websockets.exceptions.ConnectionClosed:
+            raise ConnectionClosed()
+
+    async def close(self, timeout):
+        await asyncio.wait_for(self.socket.close(), timeout)
+
+
+# ---------- DONNÉES ----------
+
+def create_loadtest_data(conversations):
+    """Un client par conversation et un membre de l'équipe assigné à toutes (notifications ciblées)."""
+    cleanup_loadtest_data()
+    staff = User.objects.create_user(username=f"{LOADTEST_USER_PREFIX}staff", password=None, is_staff=True)
+    pairs = []
+    for index in range(conversations):
+        user = User.objects.create_user(username=f"{LOADTEST_USER_PREFIX}{index}", password=None)
+        pairs.append((user, Conversation.objects.create(user=user, admin=staff)))
+    return staff, pairs
+
+
+def cleanup_loadtest_data():
+    User.objects.filter(username__startswith=LOADTEST_USER_PREFIX).delete()
+
+
+def session_key_for(user):
+    """Session authentifiée pour `user` (mode socket réelle, AuthMiddlewareStack)."""
+    session = SessionStore()
+    session[SESSION_KEY] = str(user.pk)
+    session[BACKEND_SESSION_KEY] = settings.AUTHENTICATION_BACKENDS[0]
+    session[HASH_SESSION_KEY] = user.get_session_auth_hash()
+    session.create()
+    return session.session_key
+
+
+def count_messages(conversation_ids):
+    return Message.objects.filter(conversation_id__in=conversation_ids).count()
+
+
+# ---------- SCÉNARIO ----------
+
+class LoadTest:
+    def __init__(
+        self,
+        *,
+        connections=1000,
+        conversations=100,
+        senders=1,
+        rate=1.0,
+        duration=10.0,
+        connect_concurrency=100,
+        timeout=10.0,
+        drain=2.0,
+        url=None,
+        server_pid=None,
+    ):
+        self.connections = connections
+        self.conversations = min(conversations, connections)
+        self.senders = senders
+        self.rate = rate
+        self.duration = duration
+        self.connect_concurrency = connect_concurrency
+        self.timeout = timeout
+        self.drain = drain
+        self.url = url.rstrip("/") if url else None
+        self.server_pid = server_pid
+        self.application = URLRouter(websocket_urlpatterns)
+
+        self.connect_latencies = []
+        self.connect_errors = 0
+        self.fanout_latencies = []
+        self.sent = 0
+        self.expected = 0
+
+    @property
+    def mode(self):
+        return "socket" if self.url else "in-process"
+
+    def _make_client(self, user, conversation, sessions):
+        path = f"/ws/chat/{conversation.pk}/"
+        if self.url:
+            return SocketClient(self.url + path, sessions[user.pk])
+        return InProcessClient(self.application, path, user)
+
+    async def _connect(self, client, semaphore):
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                connected = await client.connect(self.timeout)
+            except Exception:
+                connected = False
+            if connected:
+                self.connect_latencies.append(time.perf_counter() - started)
+            else:
+                self.connect_errors += 1
+            return connected
+
+    async def _reader(self, client):
+        """Enregistre la latence de diffusion de chaque message du test reçu."""
+        while True:
+            try:
+                text = await client.recv()
+            except ConnectionClosed:
+                return
+            received = time.perf_counter()
+            try:
+                data = json.loads(text)
+            except (TypeError, ValueError):
+                continue
+            parts = str(data.get("message", "")).split(":")
+            if len(parts) == 3 and parts[0] == _MARKER:
+                self.fanout_latencies.append(received - int(parts[2]) / 1e9)
+
+    async def _sender(self, client, index, listeners, stop_at):
+        interval = 1 / self.rate
+        start = time.perf_counter()
+        seq = 0
+        while True:
+            due = start + seq * interval
+            if due >= stop_at:
+                return
+            delay = due - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            await client.send(json.dumps({"message": f"{_MARKER}:{index}.{seq}:{time.perf_counter_ns()}"}))
+            self.sent += 1
+            self.expected += listeners
+            seq += 1
+
+    async def run(self, staff, pairs, sessions=None):
+        # Répartition : le client de chaque conversation, puis des connexions de l'équipe
+        plan = []
+        for n in range(self.connections):
+            user, conversation = pairs[n % self.conversations]
+            plan.append((staff if n >= self.conversations else user, conversation))
+        per_conversation = {}
+        for _, conversation in plan:
+            per_conversation[conversation.pk] = per_conversation.get(conversation.pk, 0) + 1
+
+        memory_pid = self.server_pid or ("self" if not self.url else None)
+        memory_before = rss_bytes(memory_pid) if memory_pid else None
+
+        clients = [self._make_client(user, conversation, sessions) for user, conversation in plan]
+        semaphore = asyncio.Semaphore(self.connect_concurrency)
+        connected = await asyncio.gather(*[self._connect(client, semaphore) for client in clients])
+        live = [(client, conv) for client, (_, conv), ok in zip(clients, plan, connected) if ok]
+
+        memory_after = rss_bytes(memory_pid) if memory_pid else None
+        memory_per_connection = None
+        if memory_before is not None and memory_after is not None and live:
+            memory_per_connection = (memory_after - memory_before) // len(live)
+
+        readers = [asyncio.ensure_future(self._reader(client)) for client, _ in live]
+        listeners = {}
+        for _, conversation in live:
+            listeners[conversation.pk] = listeners.get(conversation.pk, 0) + 1
+
+        # Émetteurs : les `senders` premières connexions de chaque conversation
+        senders, seen = [], {}
+        for client, conversation in live:
+            if seen.get(conversation.pk, 0) < self.senders:
+                seen[conversation.pk] = seen.get(conversation.pk, 0) + 1
+                senders.append((client, conversation))
+
+        started = time.perf_counter()
+        stop_at = started + self.duration
+        await asyncio.gather(*[
+            self._sender(client, index, listeners[conversation.pk], stop_at)
+            for index, (client, conversation) in enumerate(senders)
+        ])
+        # Diffusions en retard : on attend que plus rien n'arrive pendant `drain` secondes
+        received = -1
+        while received != len(self.fanout_latencies) and len(self.fanout_latencies) < self.expected:
+            received = len(self.fanout_latencies)
+            await asyncio.sleep(self.drain)
+
+        await asyncio.gather(*[client.close(self.timeout) for client, _ in live], return_exceptions=True)
+        for reader in readers:
+            reader.cancel()
+        await asyncio.gather(*readers, return_exceptions=True)
+        elapsed = time.perf_counter() - started
+
+        return {
+            "connections": {
+                "requested": self.connections,
+                "connected": len(live),
+                "errors": self.connect_errors,
+                "conversations": self.conversations,
+                "per_conversation_max": max(per_conversation.values()) if per_conversation else 0,
+            },
+            "connect_latency_ms": percentiles(self.connect_latencies),
+            "fanout_latency_ms": percentiles(self.fanout_latencies),
+            "messages_sent": self.sent,
+            "deliveries_expected": self.expected,
+            "deliveries_received": len(self.fanout_latencies),
+            "elapsed_seconds": round(elapsed, 3),
+            "memory_per_connection_bytes": memory_per_connection,
+        }
+
+
+def describe_environment(mode):
+    return {
+        "mode": mode,
+        "channel_layer": settings.CHANNEL_LAYERS.get("default", {}).get("BACKEND"),
+        "chat_write_behind": getattr(settings, "CHAT_WRITE_BEHIND", False),
+        "database": settings.DATABASES["default"]["ENGINE"],
+        "communicator": (
+            "websockets" if mode == "socket"
+            else "channels.testing.WebsocketCommunicator" if WebsocketCommunicator is not None
+            else "asgiref.testing.ApplicationCommunicator"
+        ),
+        "pid": os.getpid(),
+    }
@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+
+from apps.messaging.models import Conversation
+from apps.messaging.services import refresh_conversation_summaries
+
+BACKFILL_BATCH_SIZE = 500
+
+
+class Command(BaseCommand):
+    help = "Recalcule le résumé des conversations (dernier message, non lus) à partir des messages existants"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=BACKFILL_BATCH_SIZE,
+            help="Nombre de conversations recalculées par lot (défaut : %(default)s)",
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        last_id = 0
+        total = 0
+        while True:
+            ids = list(
+                Conversation.objects.filter(id__gt=last_id)
+                .order_by('id')
+                .values_list('id', flat=True)[:batch_size]
+            )
+            if not ids:
+                break
+            total += len(refresh_conversation_summaries(Conversation.objects.filter(id__in=ids)))
+            last_id = ids[-1]
+
+        self.stdout.write(self.style.SUCCESS(f"✅ {total} conversation(s) mise(s) à jour."))
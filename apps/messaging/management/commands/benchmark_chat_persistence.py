@@ -0,0 +1,89 @@
+import asyncio
+import json
+import statistics
+import time
+
+from asgiref.sync import async_to_sync
+from asgiref.testing import ApplicationCommunicator
+from channels.db import database_sync_to_async
+from channels.routing import URLRouter
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import override_settings
+
+from apps.messaging.models import Conversation, Message
+from apps.messaging.routing import websocket_urlpatterns
+from apps.messaging.write_behind import get_message_buffer
+
+User = get_user_model()
+
+
+async def _client(application, user, conversation, messages, latencies):
+    """Une connexion WebSocket : envoie ses messages un par un et attend leur diffusion."""
+    communicator = ApplicationCommunicator(application, {
+        "type": "websocket",
+        "path": f"/ws/chat/{conversation.pk}/",
+        "headers": [],
+        "subprotocols": [],
+        "user": user,
+    })
+    await communicator.send_input({"type": "websocket.connect"})
+    await communicator.receive_output(5)
+    for n in range(messages):
+        started = time.perf_counter()
+        await communicator.send_input({"type": "websocket.receive", "text": json.dumps({"message": f"Message {n}"})})
+        await communicator.receive_output(30)
+        latencies.append(time.perf_counter() - started)
+    await communicator.send_input({"type": "websocket.disconnect", "code": 1000})
+    await communicator.wait(30)
+
+
+async def _run(clients, messages):
+    @database_sync_to_async
+    def create_fixtures():
+        staff = User.objects.create_user(username="bench-staff", password="x", is_staff=True)
+        users = [User.objects.create_user(username=f"bench-{i}", password="x") for i in range(clients)]
+        return staff, [(user, Conversation.objects.create(user=user, admin=staff)) for user in users]
+
+    staff, pairs = await create_fixtures()
+    application = URLRouter(websocket_urlpatterns)
+    latencies = []
+    started = time.perf_counter()
+    await asyncio.gather(*[_client(application, user, conversation, messages, latencies) for user, conversation in pairs])
+    await get_message_buffer().flush()
+    elapsed = time.perf_counter() - started
+
+    stored = await database_sync_to_async(Message.objects.count)()
+    await database_sync_to_async(User.objects.filter(username__startswith="bench-").delete)()
+    return latencies, elapsed, stored
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare l'écriture directe et l'écriture différée (CHAT_WRITE_BEHIND) du chat WebSocket : "
+        "latence p50 / p99 et débit, dans une base de test temporaire"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clients', type=int, default=20, help="Connexions simultanées (défaut : %(default)s)")
+        parser.add_argument('--messages', type=int, default=50, help="Messages par connexion (défaut : %(default)s)")
+
+    def handle(self, *args, **options):
+        clients, messages = options['clients'], options['messages']
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            for label, write_behind in (("écriture directe", False), ("écriture différée", True)):
+                with override_settings(CHAT_WRITE_BEHIND=write_behind):
+                    latencies, elapsed, stored = async_to_sync(_run)(clients, messages)
+                latencies.sort()
+                total = clients * messages
+                self.stdout.write(
+                    f"{label:18} : {total / elapsed:8,.0f} messages/s, "
+                    f"p50 {statistics.median(latencies) * 1000:6.2f} ms, "
+                    f"p99 {latencies[int(len(latencies) * 0.99) - 1] * 1000:6.2f} ms, "
+                    f"{stored}/{total} en base"
+                )
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+        self.stdout.write(self.style.SUCCESS("✅ Mesure terminée."))
@@ -0,0 +1,124 @@
+import json
+import time
+
+from asgiref.sync import async_to_sync
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings
+from django.utils import timezone
+
+from apps.messaging import loadtest
+
+
+class Command(BaseCommand):
+    help = (
+        "Test de charge du chat WebSocket : latence de connexion et de diffusion, "
+        "écritures en base par seconde, mémoire par connexion (résultats en JSON)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--connections', type=int, default=1000, help="Connexions simultanées (défaut : %(default)s)")
+        parser.add_argument('--conversations', type=int, default=100, help="Conversations sur lesquelles répartir les connexions (défaut : %(default)s)")
+        parser.add_argument('--senders', type=int, default=1, help="Connexions émettrices par conversation (défaut : %(default)s)")
+        parser.add_argument('--rate', type=float, default=1.0, help="Messages par seconde et par émetteur (défaut : %(default)s)")
+        parser.add_argument('--duration', type=float, default=10.0, help="Durée de la phase d'envoi en secondes (défaut : %(default)s)")
+        parser.add_argument('--connect-concurrency', type=int, default=100, help="Connexions ouvertes en parallèle (défaut : %(default)s)")
+        parser.add_argument('--timeout', type=float, default=10.0, help="Délai maximal d'une connexion en secondes (défaut : %(default)s)")
+        parser.add_argument('--drain', type=float, default=2.0, help="Après les envois, fermeture dès qu'aucun message n'arrive pendant ce délai (défaut : %(default)s)")
+        parser.add_argument(
+            '--write-behind',
+            choices=['on', 'off'],
+            help="Mode en processus : force CHAT_WRITE_BEHIND (sinon valeur des settings)",
+        )
+        parser.add_argument('--url', help="Mode socket réelle : serveur lancé, ex. ws://127.0.0.1:8000 (paquet websockets requis)")
+        parser.add_argument('--server-pid', type=int, help="Mode socket réelle : PID du serveur, pour mesurer sa mémoire")
+        parser.add_argument('--keep-data', action='store_true', help="Mode socket réelle : conserver les comptes et conversations créés")
+        parser.add_argument('--output', help="Fichier JSON des résultats (défaut : loadtest-chat-<date>.json)")
+
+    def handle(self, *args, **options):
+        if options['url'] and loadtest.websockets is None:
+            raise CommandError("Le mode socket réelle nécessite le paquet 'websockets' (pip install websockets).")
+        if options['rate'] <= 0 or options['connections'] < 1:
+            raise CommandError("--rate et --connections doivent être positifs.")
+
+        test = loadtest.LoadTest(
+            connections=options['connections'],
+            conversations=options['conversations'],
+            senders=options['senders'],
+            rate=options['rate'],
+            duration=options['duration'],
+            connect_concurrency=options['connect_concurrency'],
+            timeout=options['timeout'],
+            drain=options['drain'],
+            url=options['url'],
+            server_pid=options['server_pid'],
+        )
+
+        if options['url']:
+            # Le serveur lit la même base : comptes de test créés puis supprimés
+            results = self._run(test, options, sessions=True)
+            if not options['keep_data']:
+                loadtest.cleanup_loadtest_data()
+        else:
+            overrides = {}
+            if options['write_behind']:
+                overrides['CHAT_WRITE_BEHIND'] = options['write_behind'] == 'on'
+            old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+            try:
+                with override_settings(**overrides):
+                    results = self._run(test, options, sessions=False)
+            finally:
+                connection.creation.destroy_test_db(old_name, verbosity=0)
+
+        output = options['output'] or f"loadtest-chat-{timezone.now():%Y%m%d-%H%M%S}.json"
+        with open(output, "w") as f:
+            json.dump(results, f, indent=2)
+
+        self._report(results)
+        self.stdout.write(self.style.SUCCESS(f"✅ Résultats enregistrés dans {output}"))
+
+    def _run(self, test, options, *, sessions):
+        staff, pairs = loadtest.create_loadtest_data(test.conversations)
+        session_keys = None
+        if sessions:
+            session_keys = {user.pk: loadtest.session_key_for(user) for user in [staff] + [u for u, _ in pairs]}
+        conversation_ids = [conversation.pk for _, conversation in pairs]
+
+        environment = loadtest.describe_environment(test.mode)
+        before = loadtest.count_messages(conversation_ids)
+        started = time.perf_counter()
+        metrics = async_to_sync(test.run)(staff, pairs, session_keys)
+        elapsed = time.perf_counter() - started
+        written = loadtest.count_messages(conversation_ids) - before
+
+        metrics["db_messages_written"] = written
+        metrics["db_writes_per_second"] = round(written / metrics["elapsed_seconds"], 1) if metrics["elapsed_seconds"] else None
+        return {
+            "started_at": timezone.now().isoformat(),
+            "environment": environment,
+            "config": {
+                key: options[key]
+                for key in ("connections", "conversations", "senders", "rate", "duration", "connect_concurrency", "timeout", "drain", "url")
+            },
+            "wall_seconds": round(elapsed, 3),
+            "metrics": metrics,
+        }
+
+    def _report(self, results):
+        env, m = results["environment"], results["metrics"]
+        self.stdout.write(
+            f"Mode {env['mode']} ({env['communicator']}), couche {env['channel_layer']}, "
+            f"écriture différée : {'oui' if env['chat_write_behind'] else 'non'}"
+        )
+        c = m["connections"]
+        self.stdout.write(f"  Connexions : {c['connected']}/{c['requested']} ({c['errors']} échec(s))")
+        for label, key in (("Connexion", "connect_latency_ms"), ("Diffusion", "fanout_latency_ms")):
+            p = m[key]
+            if p:
+                self.stdout.write(f"  {label:10} : p50 {p['p50']} ms, p90 {p['p90']} ms, p99 {p['p99']} ms, max {p['max']} ms")
+        self.stdout.write(
+            f"  Messages : {m['messages_sent']} envoyés, {m['deliveries_received']}/{m['deliveries_expected']} remis, "
+            f"{m['db_messages_written']} écrits ({m['db_writes_per_second']}/s)"
+        )
+        if m["memory_per_connection_bytes"] is not None:
+            self.stdout.write(f"  Mémoire : {m['memory_per_connection_bytes'] / 1024:.1f} Kio par connexion")
@@ -0,0 +1,40 @@
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+import django.utils.timezone
+
+
+def fill_activity_at(apps, schema_editor):
+    Conversation = apps.get_model('messaging', 'Conversation')
+    Conversation.objects.update(activity_at=Coalesce('last_message_at', 'created_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('messaging', '0004_message_history_index'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='conversation',
+            name='conversation_activity_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='conversation',
+            name='conversation_admin_unread_idx',
+        ),
+        migrations.AddField(
+            model_name='conversation',
+            name='activity_at',
+            field=models.DateTimeField(default=django.utils.timezone.now, verbose_name='Dernière activité'),
+        ),
+        migrations.RunPython(fill_activity_at, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='conversation',
+            index=models.Index(fields=['-activity_at', '-id'], name='conversation_activity_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='conversation',
+            index=models.Index(fields=['admin_unread_count'], name='conversation_admin_unread_idx'),
+        ),
+    ]
@@ -1,5 +1,6 @@
 from django.db import models
 from django.conf import settings
+from django.utils import timezone
 
 User = settings.AUTH_USER_MODEL
 
@@ -21,10 +22,32 @@ class Conversation(models.Model):
     )
     created_at = models.DateTimeField("Créée le", auto_now_add=True)
 
+    # Résumé dénormalisé, tenu à jour à chaque message (messaging.services.post_message)
+    last_message_at = models.DateTimeField("Dernier message le", null=True, blank=True)
+    last_message_preview = models.CharField("Aperçu du dernier message", max_length=255, blank=True, default="")
+    last_sender = models.ForeignKey(
+        User,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='+',
+        verbose_name="Auteur du dernier message",
+    )
+    user_unread_count = models.PositiveIntegerField("Non lus (utilisateur)", default=0)
+    admin_unread_count = models.PositiveIntegerField("Non lus (équipe)", default=0)
+    # Date du dernier échange, sinon de création : clé de tri de la boîte de réception
+    activity_at = models.DateTimeField("Dernière activité", default=timezone.now)
+
     class Meta:
         ordering = ['-created_at']
         verbose_name = "Conversation"
         verbose_name_plural = "Conversations"
+        indexes = [
+            # Boîte de réception : tri par activité et filtre des non lus. Index simples,
+            # MySQL ignorant les index partiels et, avant 8.0.13, les index sur expression
+            models.Index(fields=['-activity_at', '-id'], name='conversation_activity_idx'),
+            models.Index(fields=['admin_unread_count'], name='conversation_admin_unread_idx'),
+        ]
 
     def __str__(self):
         return f"Conversation {self.id} - {self.user}"
@@ -51,6 +74,13 @@ class Message(models.Model):
         ordering = ['sent_at']
         verbose_name = "Message"
         verbose_name_plural = "Messages"
+        indexes = [
+            # Dernier message / non lus d'une conversation (boîte de réception)
+            models.Index(fields=['conversation', '-sent_at'], name='message_conv_sent_idx'),
+            models.Index(fields=['conversation', 'is_read'], name='message_conv_read_idx'),
+            # Historique du chat paginé par id
+            models.Index(fields=['conversation', '-id'], name='message_conv_id_idx'),
+        ]
 
     def __str__(self):
         return f"Message {self.id} - {self.sender}"
\ No newline at end of file
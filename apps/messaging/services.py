@@ -0,0 +1,231 @@
+# apps/messaging/services.py
+from datetime import datetime, timezone as dt_timezone
+
+from django.db import transaction
+from django.db.models import Count, Exists, F, IntegerField, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce, Greatest, Left
+
+from apps.notifications.services import mark_conversation_notifications_as_read
+
+from .models import Conversation, Message
+
+INBOX_PAGE_SIZE = 30
+INBOX_PREVIEW_LENGTH = 120
+CHAT_HISTORY_PAGE_SIZE = 50
+CHAT_HISTORY_MAX_PAGE_SIZE = 200
+
+
+def encode_inbox_cursor(conversation):
+    """Curseur de pagination : date du dernier échange (µs) + id de la conversation."""
+    activity = conversation.activity_at
+    return f"{int(activity.timestamp() * 1_000_000)}-{conversation.pk}"
+
+
+def decode_inbox_cursor(value):
+    try:
+        micros, pk = value.split("-", 1)
+        activity = datetime.fromtimestamp(int(micros) / 1_000_000, tz=dt_timezone.utc)
+        return activity, int(pk)
+    except (AttributeError, ValueError, OverflowError, OSError):
+        return None
+
+
+def _preview(content):
+    return content[:INBOX_PREVIEW_LENGTH]
+
+
+def post_message(conversation, sender, content):
+    """
+    Crée un message et met à jour, dans la même transaction, le résumé de la
+    conversation (dernier message, compteur de non lus du destinataire).
+    """
+    unread_field = "admin_unread_count" if sender.pk == conversation.user_id else "user_unread_count"
+    with transaction.atomic():
+        msg = Message.objects.create(conversation=conversation, sender=sender, content=content)
+        Conversation.objects.filter(pk=conversation.pk).update(
+            last_message_at=msg.sent_at,
+            activity_at=msg.sent_at,
+            last_message_preview=_preview(content),
+            last_sender=sender,
+            **{unread_field: F(unread_field) + 1},
+        )
+    return msg
+
+
+def post_messages(entries):
+    """
+    Version groupée de post_message pour une liste de (conversation, expéditeur,
+    contenu), dans l'ordre d'arrivée : un bulk_create, puis une mise à jour du
+    résumé par conversation. Retourne les messages créés, dans le même ordre.
+    """
+    if not entries:
+        return []
+    with transaction.atomic():
+        messages = Message.objects.bulk_create(
+            [Message(conversation=conversation, sender=sender, content=content) for conversation, sender, content in entries]
+        )
+        summaries = {}
+        for msg in messages:
+            conversation = msg.conversation
+            summary = summaries.setdefault(conversation.pk, {"admin_unread_count": 0, "user_unread_count": 0})
+            side = "admin_unread_count" if msg.sender_id == conversation.user_id else "user_unread_count"
+            summary[side] += 1
+            summary["last"] = msg
+        for conversation_id, summary in summaries.items():
+            last = summary["last"]
+            Conversation.objects.filter(pk=conversation_id).update(
+                last_message_at=last.sent_at,
+                activity_at=last.sent_at,
+                last_message_preview=_preview(last.content),
+                last_sender_id=last.sender_id,
+                admin_unread_count=F("admin_unread_count") + summary["admin_unread_count"],
+                user_unread_count=F("user_unread_count") + summary["user_unread_count"],
+            )
+    return messages
+
+
+def mark_conversation_read(conversation, reader, *, up_to_id=None):
+    """
+    Marque comme lus, en un seul UPDATE, les messages reçus par `reader` (côté
+    utilisateur ou côté équipe), jusqu'à `up_to_id` inclus s'il est fourni.
+    Le compteur de non lus de la conversation est ajusté ; quand tout est lu, les
+    notifications de la conversation de `reader` le sont aussi.
+    Retourne le nombre de messages marqués.
+    """
+    unread = Message.objects.filter(conversation=conversation, is_read=False)
+    if reader.pk == conversation.user_id:
+        unread, unread_field = unread.exclude(sender_id=conversation.user_id), "user_unread_count"
+    else:
+        unread, unread_field = unread.filter(sender_id=conversation.user_id), "admin_unread_count"
+
+    with transaction.atomic():
+        if up_to_id is None:
+            updated = unread.update(is_read=True)
+            Conversation.objects.filter(pk=conversation.pk).update(**{unread_field: 0})
+            all_read = True
+        else:
+            updated = unread.filter(id__lte=up_to_id).update(is_read=True)
+            if updated:
+                Conversation.objects.filter(pk=conversation.pk).update(
+                    **{unread_field: Greatest(F(unread_field) - updated, Value(0))}
+                )
+            all_read = not unread.exists()
+        if all_read:
+            mark_conversation_notifications_as_read(reader.pk, conversation)
+    return updated
+
+
+def refresh_conversation_summaries(conversations):
+    """
+    Recalcule le résumé dénormalisé à partir des messages (reprise des données
+    existantes, ou correction après suppression de messages).
+    Retourne les conversations mises à jour.
+    """
+    last_message = Message.objects.filter(conversation=OuterRef("pk")).order_by("-sent_at", "-id")
+    unread = Message.objects.filter(conversation=OuterRef("pk"), is_read=False).order_by().values("conversation")
+
+    def count(queryset):
+        total = queryset.annotate(total=Count("id")).values("total")
+        return Coalesce(Subquery(total, output_field=IntegerField()), Value(0))
+
+    rows = list(
+        conversations.annotate(
+            _last_sent=Subquery(last_message.values("sent_at")[:1]),
+            _last_preview=Subquery(
+                last_message.annotate(preview=Left("content", INBOX_PREVIEW_LENGTH)).values("preview")[:1]
+            ),
+            _last_sender_id=Subquery(last_message.values("sender_id")[:1]),
+            _admin_unread=count(unread.filter(sender_id=OuterRef("user_id"))),
+            _user_unread=count(unread.exclude(sender_id=OuterRef("user_id"))),
+        )
+    )
+    for c in rows:
+        c.last_message_at = c._last_sent
+        c.activity_at = c._last_sent or c.created_at
+        c.last_message_preview = c._last_preview or ""
+        c.last_sender_id = c._last_sender_id
+        c.admin_unread_count = c._admin_unread
+        c.user_unread_count = c._user_unread
+    Conversation.objects.bulk_update(
+        rows,
+        ["last_message_at", "activity_at", "last_message_preview", "last_sender", "admin_unread_count", "user_unread_count"],
+    )
+    return rows
+
+
+def get_conversation_inbox(*, q="", only_unread=False, cursor=None, page_size=INBOX_PAGE_SIZE):
+    """
+    Page de la boîte de réception staff, triée par activité décroissante,
+    paginée par curseur (keyset) : le coût ne dépend pas du numéro de page.
+    Le tri et les badges lisent les colonnes de résumé de Conversation.
+    Retourne (conversations, curseur_suivant ou None).
+    """
+    conversations = Conversation.objects.select_related("user", "admin", "last_sender")
+
+    if q:
+        conversations = conversations.filter(
+            Q(user__username__icontains=q) |
+            Q(user__first_name__icontains=q) |
+            Q(user__last_name__icontains=q) |
+            Q(user__email__icontains=q) |
+            Exists(Message.objects.filter(conversation=OuterRef("pk"), content__icontains=q))
+        )
+
+    if only_unread:
+        conversations = conversations.filter(admin_unread_count__gt=0)
+
+    position = decode_inbox_cursor(cursor) if cursor else None
+    if position:
+        activity, pk = position
+        conversations = conversations.filter(
+            Q(activity_at__lt=activity) | Q(activity_at=activity, pk__lt=pk)
+        )
+
+    page = list(conversations.order_by("-activity_at", "-pk")[:page_size + 1])
+    next_cursor = encode_inbox_cursor(page[page_size - 1]) if len(page) > page_size else None
+    page = page[:page_size]
+
+    for c in page:
+        c.unread_count = c.admin_unread_count
+        c.has_unread = c.admin_unread_count > 0
+        c.last_message = None
+        if c.last_message_at:
+            c.last_message = Message(
+                conversation=c,
+                sender=c.last_sender,
+                content=c.last_message_preview,
+                sent_at=c.last_message_at,
+            )
+    return page, next_cursor
+
+
+def count_unread_conversations():
+    """Nombre de conversations contenant des messages de l'utilisateur non lus par l'équipe."""
+    return Conversation.objects.filter(admin_unread_count__gt=0).count()
+
+
+def get_chat_history(conversation, *, before_id=None, limit=CHAT_HISTORY_PAGE_SIZE):
+    """
+    Derniers messages d'une conversation (plus anciens que `before_id` si fourni),
+    pagination par id (keyset). Retourne (messages en ordre chronologique, il_en_reste).
+    """
+    messages = Message.objects.filter(conversation=conversation).select_related("sender")
+    if before_id is not None:
+        messages = messages.filter(id__lt=before_id)
+    page = list(messages.order_by("-id")[:limit + 1])
+    return page[:limit][::-1], len(page) > limit
+
+
+def serialize_chat_history(messages, has_more):
+    """
+    Format compact pour le WebSocket :
+    {"event": "history", "messages": [[id, id_expéditeur, contenu, envoyé_le_ms], ...],
+     "users": {id_expéditeur: nom}, "has_more": bool}
+    """
+    users = {}
+    rows = []
+    for msg in messages:
+        if msg.sender_id not in users:
+            users[msg.sender_id] = msg.sender.get_full_name() or msg.sender.username
+        rows.append([msg.id, msg.sender_id, msg.content, int(msg.sent_at.timestamp() * 1000)])
+    return {"event": "history", "messages": rows, "users": users, "has_more": has_more}
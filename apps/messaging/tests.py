@@ -1,3 +1,401 @@
-from django.test import TestCase
+import json
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from asgiref.testing import ApplicationCommunicator
+from channels.db import database_sync_to_async
+from channels.routing import URLRouter
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from apps.accounts.models import User
+from apps.notifications.models import Notification
+
+from .loadtest import LoadTest, count_messages, create_loadtest_data, percentiles
+from .models import Conversation, Message
+from .routing import websocket_urlpatterns
+from .services import (
+    get_chat_history,
+    get_conversation_inbox,
+    mark_conversation_read,
+    post_message,
+    refresh_conversation_summaries,
+)
+from .write_behind import MessageBuffer
+
+
+class ConversationInboxTests(TestCase):
+    def setUp(self):
+        self.staff = User.objects.create_user(username="admin", email="a@example.com", password="x", is_staff=True)
+        self.clients = [
+            User.objects.create_user(username=f"client{i}", email=f"c{i}@example.com", password="x")
+            for i in range(6)
+        ]
+        now = timezone.now()
+        self.conversations = []
+        for i, client in enumerate(self.clients):
+            conversation = Conversation.objects.create(user=client)
+            self.conversations.append(conversation)
+            for j in range(i % 3):
+                msg = Message.objects.create(conversation=conversation, sender=client, content=f"Message {i}.{j}")
+                Message.objects.filter(pk=msg.pk).update(sent_at=now - timedelta(hours=10 - i, minutes=-j))
+        # Réponse du staff (lue côté client) dans la conversation 5
+        Message.objects.create(conversation=self.conversations[5], sender=self.staff, content="Réponse", is_read=False)
+        refresh_conversation_summaries(Conversation.objects.all())
+
+    def test_annotations_and_ordering(self):
+        page, next_cursor = get_conversation_inbox()
+        self.assertIsNone(next_cursor)
+        self.assertEqual(page[0], self.conversations[5])
+
+        by_id = {c.pk: c for c in page}
+        c4 = by_id[self.conversations[4].pk]
+        self.assertEqual(c4.unread_count, 1)
+        self.assertTrue(c4.has_unread)
+        self.assertEqual(c4.last_message.content, "Message 4.0")
+        self.assertEqual(c4.last_message.sender, self.clients[4])
+
+        c5 = by_id[self.conversations[5].pk]
+        self.assertEqual(c5.unread_count, 2)  # le message du staff lui-même n'est pas compté
+        self.assertEqual(c5.last_message.sender, self.staff)
+
+        c3 = by_id[self.conversations[3].pk]
+        self.assertIsNone(c3.last_message)
+        self.assertEqual(c3.unread_count, 0)
+
+        unread, _ = get_conversation_inbox(only_unread=True)
+        self.assertEqual({c.pk for c in unread}, {self.conversations[i].pk for i in (1, 2, 4, 5)})
+
+        found, _ = get_conversation_inbox(q="Message 2.1")
+        self.assertEqual([c.pk for c in found], [self.conversations[2].pk])
+
+    def test_keyset_pagination_covers_every_conversation_once(self):
+        seen, cursor = [], None
+        while True:
+            page, cursor = get_conversation_inbox(cursor=cursor, page_size=2)
+            seen.extend(c.pk for c in page)
+            if cursor is None:
+                break
+        self.assertEqual(sorted(seen), sorted(c.pk for c in self.conversations))
+        self.assertEqual(len(seen), len(set(seen)))
+
+    def test_list_view_uses_a_constant_number_of_queries(self):
+        self.client.force_login(self.staff)
+        url = reverse("messaging:admin_conversations_list")
+        self.client.get(url)  # sessions, content types... en cache
+
+        with CaptureQueriesContext(connection) as first:
+            self.client.get(url)
+        for client in self.clients:
+            conversation = Conversation.objects.create(user=client)
+            post_message(conversation, client, "Encore")
+        with self.assertNumQueries(len(first.captured_queries)):
+            response = self.client.get(url)
+        self.assertEqual(len(response.context["conversations_data"]), 12)
+
+
+class ConversationSummaryTests(TestCase):
+    def setUp(self):
+        self.staff = User.objects.create_user(username="admin", email="a@example.com", password="x", is_staff=True)
+        self.customer = User.objects.create_user(username="client", email="c@example.com", password="x")
+        self.conversation = Conversation.objects.create(user=self.customer)
+
+    def test_post_message_updates_the_summary(self):
+        post_message(self.conversation, self.customer, "Bonjour")
+        post_message(self.conversation, self.customer, "x" * 500)
+        msg = post_message(self.conversation, self.staff, "Réponse")
+
+        self.conversation.refresh_from_db()
+        self.assertEqual(self.conversation.last_message_at, msg.sent_at)
+        self.assertEqual(self.conversation.activity_at, msg.sent_at)
+        self.assertEqual(self.conversation.last_message_preview, "Réponse")
+        self.assertEqual(self.conversation.last_sender, self.staff)
+        self.assertEqual(self.conversation.admin_unread_count, 2)
+        self.assertEqual(self.conversation.user_unread_count, 1)
+
+    def test_mark_read_resets_only_the_reader_side(self):
+        post_message(self.conversation, self.customer, "Bonjour")
+        post_message(self.conversation, self.staff, "Réponse")
+
+        self.assertEqual(mark_conversation_read(self.conversation, self.staff), 1)
+        self.conversation.refresh_from_db()
+        self.assertEqual(self.conversation.admin_unread_count, 0)
+        self.assertEqual(self.conversation.user_unread_count, 1)
+        self.assertTrue(Message.objects.get(sender=self.customer).is_read)
+        self.assertFalse(Message.objects.get(sender=self.staff).is_read)
+
+    def test_admin_chat_view_posts_and_marks_read(self):
+        post_message(self.conversation, self.customer, "Bonjour")
+        self.client.force_login(self.staff)
+        url = reverse("messaging:admin_conversation_chat", args=[self.conversation.pk])
+
+        self.client.get(url)
+        self.conversation.refresh_from_db()
+        self.assertEqual(self.conversation.admin_unread_count, 0)
+
+        self.client.post(url, {"message": "Réponse"})
+        self.conversation.refresh_from_db()
+        self.assertEqual(self.conversation.user_unread_count, 1)
+        self.assertEqual(self.conversation.last_sender, self.staff)
+
+    def test_backfill_command_matches_incremental_updates(self):
+        post_message(self.conversation, self.customer, "Bonjour")
+        post_message(self.conversation, self.staff, "Réponse")
+        expected = Conversation.objects.values().get(pk=self.conversation.pk)
+
+        Conversation.objects.update(
+            last_message_at=None, last_message_preview="", last_sender=None,
+            admin_unread_count=0, user_unread_count=0,
+        )
+        call_command("backfill_conversation_summaries", stdout=StringIO())
+        self.assertEqual(Conversation.objects.values().get(pk=self.conversation.pk), expected)
+
+
+    def test_admin_inline_is_read_only(self):
+        post_message(self.conversation, self.customer, "Bonjour")
+        superuser = User.objects.create_superuser(username="root", email="r@example.com", password="x")
+        self.client.force_login(superuser)
+        url = reverse("admin:messaging_conversation_change", args=[self.conversation.pk])
+
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotContains(response, 'name="messages-0-is_read"')
+        self.assertNotContains(response, 'name="messages-0-DELETE"')
+
+
+class ChatWriteBehindTests(TestCase):
+    def setUp(self):
+        self.staff = User.objects.create_user(username="admin", email="a@example.com", password="x", is_staff=True)
+        self.customer = User.objects.create_user(username="client", email="c@example.com", password="x")
+        self.conversation = Conversation.objects.create(user=self.customer, admin=self.staff)
+
+    def _socket(self):
+        return ApplicationCommunicator(URLRouter(websocket_urlpatterns), {
+            "type": "websocket",
+            "path": f"/ws/chat/{self.conversation.pk}/",
+            "headers": [],
+            "subprotocols": [],
+            "user": self.customer,
+        })
+
+    @override_settings(CHAT_WRITE_BEHIND=True)
+    async def test_broadcasts_first_and_persists_in_order_on_disconnect(self):
+        socket = self._socket()
+        await socket.send_input({"type": "websocket.connect"})
+        self.assertEqual((await socket.receive_output(1))["type"], "websocket.accept")
+
+        for n in range(3):
+            await socket.send_input({"type": "websocket.receive", "text": json.dumps({"message": f"Message {n}"})})
+            self.assertEqual(json.loads((await socket.receive_output(1))["text"])["message"], f"Message {n}")
+
+        await socket.send_input({"type": "websocket.disconnect", "code": 1000})
+        await socket.wait(1)
+
+        @database_sync_to_async
+        def stored():
+            self.conversation.refresh_from_db()
+            notification = Notification.objects.get(user=self.staff)
+            contents = list(self.conversation.messages.order_by("id").values_list("content", flat=True))
+            return contents, self.conversation.admin_unread_count, notification.occurrences
+
+        contents, unread, occurrences = await stored()
+        self.assertEqual(contents, ["Message 0", "Message 1", "Message 2"])
+        self.assertEqual(unread, 3)
+        self.assertEqual(occurrences, 3)
+
+    async def test_buffer_flushes_full_batches_and_skips_unknown_conversations(self):
+        buffer = MessageBuffer(interval=60, batch_size=2)
+        await buffer.add(self.conversation.pk, self.customer, "Un")
+        await buffer.add(0, self.customer, "Perdu")  # conversation inexistante
+        with self.assertLogs("apps.messaging.write_behind", "WARNING"):
+            await buffer.add(self.conversation.pk, self.customer, "Deux")
+            await buffer.flush()
+        self.assertEqual(buffer.pending, [])
+
+        count = await database_sync_to_async(Message.objects.filter(conversation=self.conversation).count)()
+        self.assertEqual(count, 2)
+
+    async def test_failed_notification_rolls_back_the_batch_without_duplicates(self):
+        buffer = MessageBuffer(interval=60)
+        await buffer.add(self.conversation.pk, self.customer, "Un")
+        await buffer.add(self.conversation.pk, self.customer, "Deux")
+
+        with mock.patch("apps.messaging.write_behind.notify_new_chat_message", side_effect=RuntimeError):
+            with self.assertLogs("apps.messaging.write_behind", "ERROR"):
+                await buffer.flush()
+        self.assertEqual(len(buffer.pending), 2)
+        count = await database_sync_to_async(Message.objects.filter(conversation=self.conversation).count)()
+        self.assertEqual(count, 0)
+
+        await buffer.flush()  # nouvel essai
+        self.assertEqual(buffer.pending, [])
+
+        @database_sync_to_async
+        def stored():
+            contents = list(self.conversation.messages.order_by("id").values_list("content", flat=True))
+            return contents, Notification.objects.get(user=self.staff).occurrences
+
+        self.assertEqual(await stored(), (["Un", "Deux"], 2))
+
+
+class ChatHistoryTests(TestCase):
+    def setUp(self):
+        self.customer = User.objects.create_user(username="client", email="c@example.com", password="x")
+        self.conversation = Conversation.objects.create(user=self.customer)
+        self.messages = Message.objects.bulk_create(
+            Message(conversation=self.conversation, sender=self.customer, content=f"Message {n}") for n in range(120)
+        )
+
+    def test_keyset_pages(self):
+        page, has_more = get_chat_history(self.conversation, limit=50)
+        self.assertEqual([m.content for m in page[:2]], ["Message 70", "Message 71"])
+        self.assertTrue(has_more)
+
+        page, has_more = get_chat_history(self.conversation, before_id=page[0].id, limit=50)
+        self.assertEqual((page[0].content, page[-1].content), ("Message 20", "Message 69"))
+        page, has_more = get_chat_history(self.conversation, before_id=page[0].id, limit=50)
+        self.assertEqual(len(page), 20)
+        self.assertFalse(has_more)
+
+    def test_chat_page_renders_only_recent_messages(self):
+        self.client.force_login(self.customer)
+        response = self.client.get(reverse("messaging:user_chat"))
+        self.assertEqual(len(response.context["messages"]), 50)
+        self.assertTrue(response.context["has_older_messages"])
+        self.assertContains(response, "Message 119")
+        self.assertNotContains(response, "Message 69")
+
+    def _socket(self, user):
+        return ApplicationCommunicator(URLRouter(websocket_urlpatterns), {
+            "type": "websocket",
+            "path": f"/ws/chat/{self.conversation.pk}/",
+            "headers": [],
+            "subprotocols": [],
+            "user": user,
+        })
+
+    async def test_history_command(self):
+        socket = self._socket(self.customer)
+        await socket.send_input({"type": "websocket.connect"})
+        await socket.receive_output(1)
+
+        before_id = self.messages[70].id
+        await socket.send_input({"type": "websocket.receive", "text": json.dumps({"command": "history", "before_id": before_id, "limit": 3})})
+        history = json.loads((await socket.receive_output(1))["text"])
+        self.assertEqual(history["event"], "history")
+        self.assertTrue(history["has_more"])
+        self.assertEqual([row[0] for row in history["messages"]], [m.id for m in self.messages[67:70]])
+        self.assertEqual(history["messages"][0][1:3], [self.customer.id, "Message 67"])
+        self.assertEqual(history["users"], {str(self.customer.id): "client"})
+
+        await socket.send_input({"type": "websocket.disconnect", "code": 1000})
+        await socket.wait(1)
+
+    async def test_only_participants_can_connect(self):
+        other = await database_sync_to_async(User.objects.create_user)(username="autre", password="x")
+        socket = self._socket(other)
+        await socket.send_input({"type": "websocket.connect"})
+        self.assertEqual((await socket.receive_output(1))["type"], "websocket.close")
+
+        staff = await database_sync_to_async(User.objects.create_user)(username="admin", password="x", is_staff=True)
+        socket = self._socket(staff)
+        await socket.send_input({"type": "websocket.connect"})
+        self.assertEqual((await socket.receive_output(1))["type"], "websocket.accept")
+        await socket.send_input({"type": "websocket.disconnect", "code": 1000})
+        await socket.wait(1)
+
+    async def test_unknown_conversation_is_rejected(self):
+        socket = ApplicationCommunicator(URLRouter(websocket_urlpatterns), {
+            "type": "websocket",
+            "path": "/ws/chat/999999/",
+            "headers": [],
+            "subprotocols": [],
+            "user": self.customer,
+        })
+        await socket.send_input({"type": "websocket.connect"})
+        self.assertEqual((await socket.receive_output(1))["type"], "websocket.close")
+
+
+class ChatReadReceiptTests(TestCase):
+    def setUp(self):
+        self.staff = User.objects.create_user(username="admin", email="a@example.com", password="x", is_staff=True)
+        self.customer = User.objects.create_user(username="client", email="c@example.com", password="x")
+        self.conversation = Conversation.objects.create(user=self.customer, admin=self.staff)
+        self.replies = [post_message(self.conversation, self.staff, f"Réponse {n}") for n in range(3)]
+        Notification.objects.create(
+            user=self.customer,
+            title="Nouvelle réponse",
+            notification_type="MESSAGE_RECEIVED",
+            target_object=self.conversation,
+        )
+
+    async def _socket(self, user):
+        socket = ApplicationCommunicator(URLRouter(websocket_urlpatterns), {
+            "type": "websocket",
+            "path": f"/ws/chat/{self.conversation.pk}/",
+            "headers": [],
+            "subprotocols": [],
+            "user": user,
+        })
+        await socket.send_input({"type": "websocket.connect"})
+        await socket.receive_output(1)
+        return socket
+
+    async def _read(self, socket, **payload):
+        await socket.send_input({"type": "websocket.receive", "text": json.dumps({"command": "read", **payload})})
+
+    @database_sync_to_async
+    def _state(self):
+        self.conversation.refresh_from_db()
+        return (
+            list(self.conversation.messages.order_by("id").values_list("is_read", flat=True)),
+            self.conversation.user_unread_count,
+            Notification.objects.get(user=self.customer).is_read,
+        )
+
+    async def test_read_up_to_id_sends_one_receipt_and_syncs_counters(self):
+        staff_socket = await self._socket(self.staff)
+        customer_socket = await self._socket(self.customer)
+
+        await self._read(customer_socket, up_to_id=self.replies[1].id)
+        receipt = json.loads((await staff_socket.receive_output(1))["text"])
+        self.assertEqual(receipt, {"event": "read", "user_id": self.customer.id, "up_to_id": self.replies[1].id})
+        self.assertTrue(await staff_socket.receive_nothing())  # un seul accusé pour deux messages
+        self.assertEqual(await self._state(), ([True, True, False], 1, False))
+
+        await self._read(customer_socket)
+        self.assertEqual(json.loads((await staff_socket.receive_output(1))["text"])["up_to_id"], None)
+        self.assertEqual(await self._state(), ([True, True, True], 0, True))
+
+        # Rien de nouveau à marquer : pas d'accusé
+        await self._read(customer_socket)
+        self.assertTrue(await staff_socket.receive_nothing())
+
+        for socket in (staff_socket, customer_socket):
+            await socket.send_input({"type": "websocket.disconnect", "code": 1000})
+            await socket.wait(1)
+
+
+class ChatLoadTestTests(TestCase):
+    def test_percentiles(self):
+        stats = percentiles([n / 1000 for n in range(1, 101)])
+        self.assertEqual((stats["p50"], stats["p90"], stats["p99"], stats["max"]), (50, 90, 99, 100))
+        self.assertIsNone(percentiles([]))
+
+    def test_small_in_process_run_delivers_and_persists_every_message(self):
+        staff, pairs = create_loadtest_data(2)
+        test = LoadTest(connections=6, conversations=2, rate=20, duration=0.2, drain=0.2, timeout=5)
+        results = async_to_sync(test.run)(staff, pairs)
+
+        self.assertEqual(results["connections"]["connected"], 6)
+        self.assertGreater(results["messages_sent"], 0)
+        # Chaque message est reçu par les 3 connexions de sa conversation, émetteur compris
+        self.assertEqual(results["deliveries_expected"], results["messages_sent"] * 3)
+        self.assertEqual(results["deliveries_received"], results["deliveries_expected"])
+        self.assertEqual(count_messages([c.pk for _, c in pairs]), results["messages_sent"])
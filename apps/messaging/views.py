@@ -1,9 +1,15 @@
 from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth.decorators import login_required
 from django.shortcuts import render, get_object_or_404, redirect
-from django.db.models import Q, Max
 
-from .models import Conversation, Message
+from .models import Conversation
+from .services import (
+    count_unread_conversations,
+    get_chat_history,
+    get_conversation_inbox,
+    mark_conversation_read,
+    post_message,
+)
 from apps.notifications.models import Notification, NotificationTypeChoices
 from apps.notifications.services import notify_new_chat_message
 
@@ -23,20 +29,18 @@ def user_chat_view(request):
     if request.method == "POST":
         content = request.POST.get('message', '').strip()
         if content:
-            msg = Message.objects.create(
-                conversation=conversation,
-                sender=request.user,
-                content=content
-            )
+            msg = post_message(conversation, request.user, content)
             # Notification de chat (vers admin)
             notify_new_chat_message(msg)
         return redirect('messaging:user_chat')
 
-    messages_qs = conversation.messages.select_related('sender').order_by('sent_at')
+    # Derniers messages seulement ; les plus anciens sont chargés via le WebSocket (commande "history")
+    messages, has_older_messages = get_chat_history(conversation)
 
     return render(request, "user/chat.html", {
         "conversation": conversation,
-        "messages": messages_qs,
+        "messages": messages,
+        "has_older_messages": has_older_messages,
     })
 
 
@@ -51,49 +55,33 @@ def admin_conversation_list_view(request):
     - recherche,
     - filtre "avec non lus".
     """
-    # Annoter la dernière date de message
-    conversations = (
-        Conversation.objects
-        .select_related('user', 'admin')
-        .annotate(last_sent=Max('messages__sent_at'))
-        .order_by('-last_sent', '-created_at')
-    )
-
-    # Recherche sur client / dernier message
     q = request.GET.get('q', '').strip()
-    if q:
-        conversations = conversations.filter(
-            Q(user__username__icontains=q) |
-            Q(user__first_name__icontains=q) |
-            Q(user__last_name__icontains=q) |
-            Q(user__email__icontains=q) |
-            Q(messages__content__icontains=q)
-        ).distinct()
-
-    # Filtre "non lus"
     only_unread = request.GET.get('only_unread', '') == 'yes'
-    if only_unread:
-        # au moins un message non lu pour l'admin
-        conversations = conversations.filter(
-            messages__is_read=False
-        ).exclude(messages__sender=request.user).distinct()
-
-    # Construire des infos dérivées pour l’affichage
-    conv_data = []
-    for c in conversations:
-        last_msg = c.messages.select_related('sender').order_by('-sent_at').first()
-        has_unread = c.messages.filter(is_read=False).exclude(sender=request.user).exists()
-
-        conv_data.append({
+
+    # Colonnes de résumé de Conversation (dernier message, non lus), pagination par curseur
+    conversations, next_cursor = get_conversation_inbox(
+        q=q,
+        only_unread=only_unread,
+        cursor=request.GET.get('after'),
+    )
+
+    conv_data = [
+        {
             "conversation": c,
-            "last_message": last_msg,
-            "has_unread": has_unread,
-        })
+            "last_message": c.last_message,
+            "has_unread": c.has_unread,
+            "unread_count": c.unread_count,
+        }
+        for c in conversations
+    ]
 
     context = {
         "conversations_data": conv_data,
         "q": q,
         "only_unread": only_unread,
+        "next_cursor": next_cursor,
+        "is_first_page": not request.GET.get('after'),
+        "total_unread": count_unread_conversations(),
         "unread_notifications_count": Notification.objects.filter(
             user=request.user,
             is_read=False
@@ -127,26 +115,20 @@ def admin_conversation_chat_view(request, conversation_id):
     if request.method == "POST":
         content = request.POST.get('message', '').strip()
         if content:
-            msg = Message.objects.create(
-                conversation=conversation,
-                sender=request.user,
-                content=content
-            )
+            msg = post_message(conversation, request.user, content)
             # Notification de chat (vers l'utilisateur)
             notify_new_chat_message(msg)
         return redirect('messaging:admin_conversation_chat', conversation_id=conversation.id)
 
     # Marquer comme lus les messages non lus envoyés par l’autre (l’utilisateur)
-    Message.objects.filter(
-        conversation=conversation,
-        is_read=False
-    ).exclude(sender=request.user).update(is_read=True)
+    mark_conversation_read(conversation, request.user)
 
-    messages_qs = conversation.messages.select_related('sender').order_by('sent_at')
+    messages, has_older_messages = get_chat_history(conversation)
 
     context = {
         "conversation": conversation,
-        "messages": messages_qs,
+        "messages": messages,
+        "has_older_messages": has_older_messages,
         "unread_notifications_count": Notification.objects.filter(
             user=request.user,
             is_read=False
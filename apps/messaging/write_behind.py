@@ -0,0 +1,121 @@
+# apps/messaging/write_behind.py
+"""
+Écriture différée des messages de chat (settings.CHAT_WRITE_BEHIND).
+
+Le consommateur diffuse le message immédiatement et le dépose dans un tampon
+propre au processus (un par boucle asyncio). Le tampon est vidé par
+`post_messages` (un bulk_create) toutes les CHAT_FLUSH_INTERVAL secondes ou
+dès CHAT_FLUSH_BATCH_SIZE messages ; les vidages sont sérialisés, l'ordre
+d'arrivée est donc conservé. Les notifications sont créées après l'écriture,
+une par conversation et par expéditeur pour tout le lot (voir `occurrences`).
+Messages et notifications d'un lot sont écrits dans une seule transaction : un
+lot en échec est réessayé en entier, sans doublon.
+
+Un message diffusé n'est en base qu'après le vidage suivant : un arrêt brutal du
+worker peut perdre les dernières millisecondes de messages.
+"""
+import asyncio
+import logging
+import weakref
+
+from channels.db import database_sync_to_async
+from django.db import transaction
+
+from apps.notifications.services import notify_new_chat_message
+
+from .models import Conversation
+from .services import post_messages
+
+logger = logging.getLogger(__name__)
+
+CHAT_FLUSH_INTERVAL = 0.005  # secondes
+CHAT_FLUSH_BATCH_SIZE = 100
+# Au-delà, `add` attend le vidage (base de données trop lente : on ralentit l'émetteur)
+CHAT_BUFFER_MAX_SIZE = 10 * CHAT_FLUSH_BATCH_SIZE
+CHAT_FLUSH_MAX_ATTEMPTS = 3
+
+
+@transaction.atomic
+def persist_pending_messages(batch):
+    """Écrit un lot de (id de conversation, expéditeur, contenu) puis crée les notifications."""
+    conversations = Conversation.objects.select_related("user", "admin").in_bulk(
+        {conversation_id for conversation_id, _, _ in batch}
+    )
+    entries = []
+    for conversation_id, sender, content in batch:
+        conversation = conversations.get(conversation_id)
+        if conversation is None:
+            logger.warning("Chat : conversation %s introuvable, message ignoré", conversation_id)
+            continue
+        entries.append((conversation, sender, content))
+
+    messages = post_messages(entries)
+    # Une notification par (conversation, expéditeur) pour le lot, avec le dernier message
+    latest = {}
+    for msg in messages:
+        key = (msg.conversation_id, msg.sender_id)
+        count = latest[key][1] + 1 if key in latest else 1
+        latest[key] = (msg, count)
+    for msg, count in latest.values():
+        notify_new_chat_message(msg, occurrences=count)
+    return messages
+
+
+class MessageBuffer:
+    """Tampon des messages à écrire, vidé par lots dans l'ordre d'arrivée."""
+
+    def __init__(self, *, interval=CHAT_FLUSH_INTERVAL, batch_size=CHAT_FLUSH_BATCH_SIZE, max_size=CHAT_BUFFER_MAX_SIZE):
+        self.interval = interval
+        self.batch_size = batch_size
+        self.max_size = max_size
+        self.pending = []
+        self.attempts = 0
+        self._lock = asyncio.Lock()
+        self._timer = None
+        self._tasks = set()
+
+    async def add(self, conversation_id, sender, content):
+        self.pending.append((conversation_id, sender, content))
+        if len(self.pending) >= self.max_size:
+            await self.flush()
+        elif len(self.pending) >= self.batch_size:
+            self._flush_soon()
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(self.interval, self._flush_soon)
+
+    def _flush_soon(self):
+        task = asyncio.ensure_future(self.flush())
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def flush(self):
+        """Écrit tout le contenu du tampon (appelé aussi à la déconnexion)."""
+        async with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            while self.pending:
+                batch = self.pending[:self.batch_size]
+                try:
+                    await database_sync_to_async(persist_pending_messages)(batch)
+                except Exception:
+                    self.attempts += 1
+                    if self.attempts < CHAT_FLUSH_MAX_ATTEMPTS:
+                        logger.exception("Chat : échec d'écriture de %s message(s), nouvel essai", len(batch))
+                        self._timer = asyncio.get_running_loop().call_later(self.interval, self._flush_soon)
+                        return
+                    logger.exception("Chat : %s message(s) abandonné(s) après %s essais", len(batch), self.attempts)
+                del self.pending[:len(batch)]
+                self.attempts = 0
+
+
+_buffers = weakref.WeakKeyDictionary()
+
+
+def get_message_buffer():
+    """Tampon du processus (un par boucle asyncio)."""
+    loop = asyncio.get_running_loop()
+    buffer = _buffers.get(loop)
+    if buffer is None:
+        buffer = _buffers[loop] = MessageBuffer()
+    return buffer
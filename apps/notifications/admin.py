@@ -1,9 +1,72 @@
 from django.contrib import admin
-from .models import Notification
+from django.utils import timezone
+
+from .models import (
+    EmailCampaign,
+    EmailCampaignStatus,
+    Notification,
+    NotificationArchive,
+    OutboxEmail,
+    OutboxEmailStatus,
+)
 
 
 @admin.register(Notification)
 class NotificationAdmin(admin.ModelAdmin):
     list_display = ('user', 'title', 'is_read', 'created_at')
     list_filter = ('is_read', 'created_at')
-    search_fields = ('user__username', 'user__email', 'title')
\ No newline at end of file
+    search_fields = ('user__username', 'user__email', 'title')
+
+
+@admin.register(NotificationArchive)
+class NotificationArchiveAdmin(admin.ModelAdmin):
+    list_display = ('user', 'notification_type', 'title', 'created_at', 'read_at', 'archived_at')
+    list_filter = ('notification_type', 'created_at')
+    search_fields = ('user__username', 'user__email', 'title')
+    raw_id_fields = ('user',)
+
+
+@admin.register(OutboxEmail)
+class OutboxEmailAdmin(admin.ModelAdmin):
+    list_display = ('subject', 'status', 'sensitive', 'attempts', 'next_attempt_at', 'created_at', 'sent_at')
+    list_filter = ('status', 'sensitive', 'created_at')
+    search_fields = ('subject', 'to')
+    readonly_fields = ('sensitive', 'attempts', 'last_error', 'created_at', 'sent_at')
+    actions = ['retry_now']
+
+    def get_exclude(self, request, obj=None):
+        # Lien d'activation à usage unique : jamais affiché, même avant l'envoi
+        if obj is not None and obj.sensitive:
+            return ('body', 'html_body')
+        return super().get_exclude(request, obj)
+
+    @admin.action(description="Renvoyer maintenant")
+    def retry_now(self, request, queryset):
+        updated = queryset.exclude(status=OutboxEmailStatus.SENT).update(
+            status=OutboxEmailStatus.PENDING,
+            next_attempt_at=timezone.now(),
+        )
+        self.message_user(request, f"{updated} email(s) remis en file d'attente.")
+
+
+@admin.register(EmailCampaign)
+class EmailCampaignAdmin(admin.ModelAdmin):
+    list_display = ('name', 'status', 'audience', 'total_recipients', 'sent_count', 'failed_count', 'progress', 'created_at')
+    list_filter = ('status', 'audience')
+    search_fields = ('name', 'subject')
+    readonly_fields = (
+        'total_recipients', 'sent_count', 'failed_count', 'last_user_id', 'lease_expires_at',
+        'created_at', 'started_at', 'finished_at',
+    )
+    actions = ['cancel']
+
+    @admin.display(description="Progression")
+    def progress(self, obj):
+        return f"{obj.progress_percent} %"
+
+    @admin.action(description="Annuler l'envoi")
+    def cancel(self, request, queryset):
+        updated = queryset.filter(
+            status__in=[EmailCampaignStatus.QUEUED, EmailCampaignStatus.SENDING],
+        ).update(status=EmailCampaignStatus.CANCELLED)
+        self.message_user(request, f"{updated} campagne(s) annulée(s).")
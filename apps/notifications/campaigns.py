@@ -0,0 +1,264 @@
+# apps/notifications/campaigns.py
+"""
+Envois de masse (annonces de formations, d'offres...).
+
+Le template n'est rendu qu'une fois par campagne : les champs propres au
+destinataire y sont remplacés par des marqueurs (@@full_name@@...), substitués
+ensuite par une simple expression régulière pour chaque email. Les destinataires
+sont parcourus par blocs (pagination par id), répartis sur quelques connexions
+SMTP ouvertes une seule fois, avec un débit plafonné. Une campagne est réservée
+par un seul worker à la fois (bail renouvelé à chaque bloc).
+"""
+import logging
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db import transaction
+from django.db.models import F, Q
+from django.template.loader import render_to_string
+from django.utils import timezone
+from django.utils.html import escape
+
+from .models import EmailCampaign, EmailCampaignAudience, EmailCampaignStatus
+
+logger = logging.getLogger(__name__)
+
+User = get_user_model()
+
+CAMPAIGN_CHUNK_SIZE = 500
+CAMPAIGN_CONNECTIONS = 4
+CAMPAIGN_RATE_PER_MINUTE = 3000
+# Un envoi réservé mais plus renouvelé (worker arrêté) peut être repris après ce délai
+CAMPAIGN_LEASE = 10 * 60
+
+# Champs substitués pour chaque destinataire : {{ recipient.<champ> }} dans les templates
+RECIPIENT_FIELDS = ("full_name", "first_name", "email")
+_PLACEHOLDER_RE = re.compile(r"@@(%s)@@" % "|".join(RECIPIENT_FIELDS))
+
+
+def _placeholder(field):
+    return f"@@{field}@@"
+
+
+def personalize(content, recipient, *, html=False):
+    """Remplace les marqueurs par les valeurs du destinataire (échappées en HTML)."""
+    if html:
+        return _PLACEHOLDER_RE.sub(lambda m: escape(recipient[m.group(1)]), content)
+    return _PLACEHOLDER_RE.sub(lambda m: recipient[m.group(1)], content)
+
+
+def create_campaign(
+    name,
+    subject,
+    *,
+    text_template,
+    html_template=None,
+    context=None,
+    audience=EmailCampaignAudience.ACTIVE_USERS,
+    from_email=None,
+):
+    """Rend les templates une seule fois (avec marqueurs) et met la campagne en file."""
+    context = dict(context or {})
+    context["recipient"] = {field: _placeholder(field) for field in RECIPIENT_FIELDS}
+    return EmailCampaign.objects.create(
+        name=name,
+        subject=subject,
+        body=render_to_string(text_template, context),
+        html_body=render_to_string(html_template, context) if html_template else "",
+        from_email=from_email or settings.DEFAULT_FROM_EMAIL,
+        audience=audience,
+    )
+
+
+def get_audience_queryset(campaign):
+    users = User.objects.filter(is_active=True).exclude(email="")
+    if campaign.audience == EmailCampaignAudience.CUSTOMERS:
+        users = users.filter(is_staff=False)
+    return users
+
+
+def _recipient(first_name, last_name, username, email):
+    full_name = f"{first_name} {last_name}".strip() or username
+    return {"full_name": full_name, "first_name": first_name or full_name, "email": email}
+
+
+def _build_messages(campaign, rows):
+    messages = []
+    for first_name, last_name, username, email in rows:
+        recipient = _recipient(first_name, last_name, username, email)
+        msg = EmailMultiAlternatives(
+            subject=personalize(campaign.subject, recipient),
+            body=personalize(campaign.body, recipient),
+            from_email=campaign.from_email,
+            to=[email],
+        )
+        if campaign.html_body:
+            msg.attach_alternative(personalize(campaign.html_body, recipient, html=True), "text/html")
+        messages.append(msg)
+    return messages
+
+
+def _send_slice(connection, messages):
+    """Envoie une part du bloc sur une connexion (un thread par connexion)."""
+    sent = failed = 0
+    for msg in messages:
+        try:
+            connection.send_messages([msg])
+            sent += 1
+        except Exception as exc:
+            failed += 1
+            logger.warning("Campagne : échec d'envoi à %s : %s", msg.to[0], exc)
+            connection.close()
+            try:
+                connection.open()
+            except Exception:
+                pass  # send_messages rouvrira la connexion au message suivant
+    return sent, failed
+
+
+def _claimable(now):
+    return Q(status=EmailCampaignStatus.QUEUED) | Q(
+        Q(lease_expires_at__isnull=True) | Q(lease_expires_at__lte=now),
+        status=EmailCampaignStatus.SENDING,
+    )
+
+
+def claim_campaign(campaigns):
+    """
+    Réserve la plus ancienne campagne disponible de `campaigns` : en attente, ou
+    en cours d'envoi avec un bail expiré. Retourne la campagne, ou None.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        campaign = (
+            campaigns.select_for_update(skip_locked=True)
+            .filter(_claimable(now))
+            .order_by("created_at", "id")
+            .first()
+        )
+        if campaign is None:
+            return None
+        if campaign.status == EmailCampaignStatus.QUEUED:
+            campaign.status = EmailCampaignStatus.SENDING
+            campaign.started_at = now
+            campaign.total_recipients = get_audience_queryset(campaign).count()
+        campaign.lease_expires_at = now + timedelta(seconds=CAMPAIGN_LEASE)
+        campaign.save(update_fields=["status", "started_at", "total_recipients", "lease_expires_at"])
+    return campaign
+
+
+def send_campaign(
+    campaign,
+    *,
+    chunk_size=CAMPAIGN_CHUNK_SIZE,
+    connections=CAMPAIGN_CONNECTIONS,
+    rate_per_minute=CAMPAIGN_RATE_PER_MINUTE,
+    connection_factory=get_connection,
+):
+    """
+    Envoie (ou reprend) une campagne. Les compteurs et le curseur sont enregistrés
+    après chaque bloc ; passer la campagne à CANCELLED l'arrête au bloc suivant.
+    Sans effet si la campagne est terminée ou réservée par un autre worker.
+    """
+    claimed = claim_campaign(EmailCampaign.objects.filter(pk=campaign.pk))
+    if claimed is None:
+        campaign.refresh_from_db()
+        return campaign
+    return _send_claimed(
+        claimed,
+        chunk_size=chunk_size,
+        connections=connections,
+        rate_per_minute=rate_per_minute,
+        connection_factory=connection_factory,
+    )
+
+
+def _send_claimed(campaign, *, chunk_size, connections, rate_per_minute, connection_factory):
+    audience = get_audience_queryset(campaign)
+
+    pool = [connection_factory() for _ in range(max(connections, 1))]
+    started = time.monotonic()
+    sent_this_run = 0
+    try:
+        for connection in pool:
+            connection.open()
+        with ThreadPoolExecutor(max_workers=len(pool)) as executor:
+            while True:
+                rows = list(
+                    audience.filter(id__gt=campaign.last_user_id)
+                    .order_by("id")
+                    .values_list("id", "first_name", "last_name", "username", "email")[:chunk_size]
+                )
+                if not rows:
+                    break
+
+                messages = _build_messages(campaign, [row[1:] for row in rows])
+                slices = [messages[i::len(pool)] for i in range(len(pool))]
+                results = list(executor.map(_send_slice, pool, slices))
+                sent = sum(r[0] for r in results)
+                failed = sum(r[1] for r in results)
+
+                # Enregistré seulement si le bail est toujours le nôtre, puis renouvelé
+                lease = timezone.now() + timedelta(seconds=CAMPAIGN_LEASE)
+                held = EmailCampaign.objects.filter(
+                    pk=campaign.pk, lease_expires_at=campaign.lease_expires_at,
+                ).update(
+                    sent_count=F("sent_count") + sent,
+                    failed_count=F("failed_count") + failed,
+                    last_user_id=rows[-1][0],
+                    lease_expires_at=lease,
+                )
+                campaign.refresh_from_db(
+                    fields=["status", "sent_count", "failed_count", "last_user_id", "lease_expires_at"]
+                )
+                if not held:
+                    logger.warning("Campagne #%s reprise par un autre worker : envoi interrompu.", campaign.pk)
+                    return campaign
+                if campaign.status == EmailCampaignStatus.CANCELLED:
+                    return campaign
+
+                # Débit plafonné : on attend si on est en avance sur le rythme autorisé
+                sent_this_run += sent + failed
+                if rate_per_minute:
+                    ahead = sent_this_run * 60 / rate_per_minute - (time.monotonic() - started)
+                    if ahead > 0:
+                        time.sleep(ahead)
+    finally:
+        for connection in pool:
+            connection.close()
+
+    campaign.status = EmailCampaignStatus.DONE
+    campaign.finished_at = timezone.now()
+    campaign.lease_expires_at = None
+    campaign.save(update_fields=["status", "finished_at", "lease_expires_at"])
+    return campaign
+
+
+def send_queued_campaigns(
+    *,
+    chunk_size=CAMPAIGN_CHUNK_SIZE,
+    connections=CAMPAIGN_CONNECTIONS,
+    rate_per_minute=CAMPAIGN_RATE_PER_MINUTE,
+    connection_factory=get_connection,
+):
+    """
+    Envoie les campagnes en attente (ou interrompues, bail expiré), les plus
+    anciennes d'abord, chacune réservée avant l'envoi.
+    """
+    done = []
+    while True:
+        campaign = claim_campaign(EmailCampaign.objects.exclude(pk__in=[c.pk for c in done]))
+        if campaign is None:
+            return done
+        done.append(_send_claimed(
+            campaign,
+            chunk_size=chunk_size,
+            connections=connections,
+            rate_per_minute=rate_per_minute,
+            connection_factory=connection_factory,
+        ))
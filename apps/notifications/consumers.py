@@ -0,0 +1,53 @@
+import json
+
+from channels.db import database_sync_to_async
+from channels.generic.websocket import AsyncWebsocketConsumer
+
+from .realtime import get_unread_counts, notification_group_name
+
+
+class NotificationConsumer(AsyncWebsocketConsumer):
+    """
+    Flux des notifications de l'utilisateur connecté : nouvelles notifications
+    et compteur de non lues, poussés par apps.notifications.realtime.
+    """
+
+    async def connect(self):
+        user = self.scope["user"]
+        if user.is_anonymous:
+            await self.close()
+            return
+
+        self.group_name = notification_group_name(user.id)
+        await self.channel_layer.group_add(self.group_name, self.channel_name)
+        await self.accept()
+
+        # Compteur initial : la page n'a plus besoin de le recalculer à chaque rechargement
+        await self.send_json({
+            "event": "unread_count",
+            "unread_count": await self.get_unread_count(user.id),
+        })
+
+    async def disconnect(self, close_code):
+        if hasattr(self, "group_name"):
+            await self.channel_layer.group_discard(self.group_name, self.channel_name)
+
+    @database_sync_to_async
+    def get_unread_count(self, user_id):
+        return get_unread_counts([user_id])[user_id]
+
+    async def send_json(self, content):
+        await self.send(text_data=json.dumps(content))
+
+    async def notification_created(self, event):
+        await self.send_json({
+            "event": "notification",
+            "notification": event["notification"],
+            "unread_count": event["unread_count"],
+        })
+
+    async def notification_unread(self, event):
+        await self.send_json({
+            "event": "unread_count",
+            "unread_count": event["unread_count"],
+        })
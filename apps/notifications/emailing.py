@@ -1,7 +1,15 @@
 from django.conf import settings
-from django.core.mail import EmailMultiAlternatives
+from django.contrib.auth.tokens import default_token_generator
 from django.template.loader import render_to_string
 from django.urls import reverse
+from django.utils.encoding import force_bytes
+from django.utils.http import urlsafe_base64_encode
+
+from .outbox import queue_email
+
+# Les emails ne sont plus envoyés pendant la requête : ils sont mis en file
+# d'attente (OutboxEmail, même transaction que l'appelant) puis envoyés par
+# la commande send_outbox_emails.
 
 
 def send_reservation_received_email(request, reservation):
@@ -19,14 +27,12 @@ def send_reservation_received_email(request, reservation):
         "status_label": reservation.get_status_display(),
     })
 
-    msg = EmailMultiAlternatives(
-        subject=subject,
-        body="Votre demande de réservation a bien été reçue.",
-        from_email=settings.DEFAULT_FROM_EMAIL,
-        to=[user.email],
+    queue_email(
+        subject,
+        "Votre demande de réservation a bien été reçue.",
+        [user.email],
+        html_body=html,
     )
-    msg.attach_alternative(html, "text/html")
-    msg.send(fail_silently=False)
 
 
 def send_reservation_status_changed_email(request, reservation, old_status_label, new_status_label, admin_note=""):
@@ -49,23 +55,18 @@ def send_reservation_status_changed_email(request, reservation, old_status_label
         "user_reservations_url": user_reservations_url,
     })
 
-    msg = EmailMultiAlternatives(
-        subject=subject,
-        body=f"Statut mis à jour : {old_status_label} -> {new_status_label}",
-        from_email=settings.DEFAULT_FROM_EMAIL,
-        to=[user.email],
+    queue_email(
+        subject,
+        f"Statut mis à jour : {old_status_label} -> {new_status_label}",
+        [user.email],
+        html_body=html,
     )
-    msg.attach_alternative(html, "text/html")
-    msg.send(fail_silently=False)
 
 
 
 
 # AJOUTER ces fonctions dans ton fichier emailing.py existant
 #==================================================== pour la partie business partners ====================================
-from django.core.mail import send_mail
-from django.template.loader import render_to_string
-from django.conf import settings
 
 
 def send_partner_application_notification(application):
@@ -83,34 +84,38 @@ def send_partner_application_notification(application):
     👉 Voir la candidature : {settings.SITE_URL}/admin/partners/applications/{application.id}/
     """
     
-    send_mail(
-        subject,
-        message,
-        settings.DEFAULT_FROM_EMAIL,
-        [settings.ADMIN_EMAIL],  # À définir dans settings.py
-        fail_silently=True,
-    )
+    queue_email(subject, message, [settings.ADMIN_EMAIL])  # À définir dans settings.py
 
 
-def send_partner_activation_email(partner, password):
-    """Envoie les identifiants au nouveau partenaire"""
+def send_partner_activation_email(partner):
+    """
+    Envoie au nouveau partenaire son code et un lien pour choisir son mot de passe.
+    Aucun mot de passe n'est mis en file : le lien (jeton de réinitialisation) ne sert
+    qu'une fois, expire après PASSWORD_RESET_TIMEOUT et est effacé après l'envoi.
+    """
+    user = partner.user
     subject = f"🎉 Bienvenue chez Oloustream - Votre code partenaire : {partner.partner_code}"
-    
+    set_password_url = settings.SITE_URL + reverse("password_reset_confirm", kwargs={
+        "uidb64": urlsafe_base64_encode(force_bytes(user.pk)),
+        "token": default_token_generator.make_token(user),
+    })
+
     context = {
         'partner': partner,
-        'password': password,
+        'set_password_url': set_password_url,
         'login_url': f"{settings.SITE_URL}/partners/login/",
     }
-    
+
     html_message = render_to_string('emails/partner_activation.html', context)
-    
-    send_mail(
+
+    queue_email(
         subject,
-        f"Votre code partenaire : {partner.partner_code}\nMot de passe : {password}",
-        settings.DEFAULT_FROM_EMAIL,
-        [partner.user.email],
-        html_message=html_message,
-        fail_silently=False,
+        f"Votre code partenaire : {partner.partner_code}\n"
+        f"Nom d'utilisateur : {user.username}\n"
+        f"Choisissez votre mot de passe : {set_password_url}",
+        [user.email],
+        html_body=html_message,
+        sensitive=True,
     )
 
 
@@ -132,10 +137,4 @@ def notify_contract_validated(contract):
     Merci pour votre collaboration !
     """
     
-    send_mail(
-        subject,
-        message,
-        settings.DEFAULT_FROM_EMAIL,
-        [contract.partner.user.email],
-        fail_silently=True,
-    )
\ No newline at end of file
+    queue_email(subject, message, [contract.partner.user.email])
\ No newline at end of file
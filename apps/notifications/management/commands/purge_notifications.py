@@ -0,0 +1,51 @@
+from django.core.management.base import BaseCommand
+
+from apps.notifications.retention import RETENTION_BATCH_SIZE, get_retention_days, purge_notifications
+
+
+class Command(BaseCommand):
+    help = "Supprime les notifications lues expirées (durées par type : NOTIFICATION_RETENTION_DAYS)"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=RETENTION_BATCH_SIZE,
+            help="Largeur des tranches d'identifiants supprimées par transaction (défaut : %(default)s)",
+        )
+        parser.add_argument(
+            '--pause',
+            type=float,
+            default=0,
+            help="Pause en secondes entre deux tranches (défaut : %(default)s)",
+        )
+        archive = parser.add_mutually_exclusive_group()
+        archive.add_argument('--archive', dest='archive', action='store_true', default=None,
+                             help="Copier les notifications dans la table d'archive")
+        archive.add_argument('--no-archive', dest='archive', action='store_false',
+                             help="Supprimer sans archiver")
+        parser.add_argument('--no-analyze', action='store_true', help="Ne pas lancer ANALYZE après la purge")
+        parser.add_argument('--dry-run', action='store_true', help="Compter sans supprimer")
+
+    def handle(self, *args, **options):
+        for notification_type, days in get_retention_days().items():
+            self.stdout.write(f"  {notification_type} : {'conservées' if days is None else f'{days} jours'}")
+
+        stats = purge_notifications(
+            batch_size=options['batch_size'],
+            archive=options['archive'],
+            analyze=not options['no_analyze'],
+            dry_run=options['dry_run'],
+            pause=options['pause'],
+        )
+
+        if options['dry_run']:
+            self.stdout.write(f"{stats['deleted']} notification(s) seraient supprimée(s).")
+            return
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"✅ {stats['deleted']} notification(s) supprimée(s) en {stats['batches']} tranche(s), "
+                f"{stats['archived']} archivée(s)."
+            )
+        )
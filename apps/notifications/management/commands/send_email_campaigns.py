@@ -0,0 +1,52 @@
+from django.core.management.base import BaseCommand
+
+from apps.notifications.campaigns import (
+    CAMPAIGN_CHUNK_SIZE,
+    CAMPAIGN_CONNECTIONS,
+    CAMPAIGN_RATE_PER_MINUTE,
+    send_queued_campaigns,
+)
+
+
+class Command(BaseCommand):
+    help = "Envoie les campagnes email en attente ou interrompues (à lancer via cron)"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=CAMPAIGN_CHUNK_SIZE,
+            help="Destinataires traités par bloc (défaut : %(default)s)",
+        )
+        parser.add_argument(
+            '--connections',
+            type=int,
+            default=CAMPAIGN_CONNECTIONS,
+            help="Connexions SMTP ouvertes en parallèle (défaut : %(default)s)",
+        )
+        parser.add_argument(
+            '--rate',
+            type=int,
+            default=CAMPAIGN_RATE_PER_MINUTE,
+            help="Débit maximum en emails par minute, 0 = illimité (défaut : %(default)s)",
+        )
+
+    def handle(self, *args, **options):
+        campaigns = send_queued_campaigns(
+            chunk_size=options['chunk_size'],
+            connections=options['connections'],
+            rate_per_minute=options['rate'],
+        )
+
+        if not campaigns:
+            self.stdout.write("Aucune campagne en attente.")
+            return
+
+        for campaign in campaigns:
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f"✅ {campaign.name} : {campaign.sent_count} envoyé(s), "
+                    f"{campaign.failed_count} échec(s) sur {campaign.total_recipients} "
+                    f"({campaign.get_status_display()})."
+                )
+            )
@@ -0,0 +1,45 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from apps.notifications.outbox import OUTBOX_BATCH_SIZE, send_pending_emails
+
+
+class Command(BaseCommand):
+    help = "Envoie les emails en file d'attente (à lancer via cron, ou en continu avec --loop)"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=OUTBOX_BATCH_SIZE,
+            help="Nombre d'emails réservés par lot (défaut : %(default)s)",
+        )
+        parser.add_argument(
+            '--loop',
+            action='store_true',
+            help="Tourner en continu (worker) au lieu de vider la file une seule fois",
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=5.0,
+            help="Pause en secondes entre deux passages en mode --loop (défaut : %(default)s)",
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            stats = send_pending_emails(batch_size=options['batch_size'])
+            if any(stats.values()):
+                self.stdout.write(
+                    self.style.SUCCESS(
+                        f"✅ {stats['sent']} email(s) envoyé(s), "
+                        f"{stats['retried']} à réessayer, {stats['failed']} en échec définitif."
+                    )
+                )
+            elif not options['loop']:
+                self.stdout.write("Aucun email en attente.")
+
+            if not options['loop']:
+                return
+            time.sleep(options['interval'])
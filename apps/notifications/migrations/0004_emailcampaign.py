@@ -0,0 +1,38 @@
+# Generated by Django 5.0.3 on 2026-10-19 16:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0003_outboxemail'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EmailCampaign',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=200, verbose_name='Nom')),
+                ('subject', models.CharField(max_length=255, verbose_name='Sujet')),
+                ('body', models.TextField(verbose_name='Texte (pré-rendu)')),
+                ('html_body', models.TextField(blank=True, verbose_name='HTML (pré-rendu)')),
+                ('from_email', models.CharField(max_length=254, verbose_name='Expéditeur')),
+                ('audience', models.CharField(choices=[('ACTIVE_USERS', 'Tous les utilisateurs actifs'), ('CUSTOMERS', 'Utilisateurs actifs hors staff')], default='ACTIVE_USERS', max_length=20, verbose_name='Destinataires')),
+                ('status', models.CharField(choices=[('QUEUED', 'En attente'), ('SENDING', "En cours d'envoi"), ('DONE', 'Terminée'), ('CANCELLED', 'Annulée')], default='QUEUED', max_length=10, verbose_name='Statut')),
+                ('total_recipients', models.PositiveIntegerField(default=0, verbose_name='Destinataires')),
+                ('sent_count', models.PositiveIntegerField(default=0, verbose_name='Envoyés')),
+                ('failed_count', models.PositiveIntegerField(default=0, verbose_name='Échecs')),
+                ('last_user_id', models.PositiveIntegerField(default=0, verbose_name='Dernier utilisateur traité')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Créée le')),
+                ('started_at', models.DateTimeField(blank=True, null=True, verbose_name='Démarrée le')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='Terminée le')),
+            ],
+            options={
+                'verbose_name': 'Campagne email',
+                'verbose_name_plural': 'Campagnes email',
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 5.0.3 on 2026-10-19 16:38
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('notifications', '0004_emailcampaign'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NotificationArchive',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('original_id', models.BigIntegerField(unique=True, verbose_name="ID d'origine")),
+                ('notification_type', models.CharField(choices=[('GENERAL', 'Générale'), ('RESERVATION_CREATED', 'Nouvelle réservation'), ('RESERVATION_STATUS_CHANGED', 'Changement de statut de réservation'), ('MESSAGE_RECEIVED', 'Nouveau message'), ('PAYMENT_STATUS', 'Mise à jour paiement'), ('SYSTEM', 'Notification système')], max_length=50, verbose_name='Type de notification')),
+                ('title', models.CharField(max_length=200, verbose_name='Titre')),
+                ('created_at', models.DateTimeField(verbose_name='Créée le')),
+                ('read_at', models.DateTimeField(blank=True, null=True, verbose_name='Lue le')),
+                ('archived_at', models.DateTimeField(auto_now_add=True, verbose_name='Archivée le')),
+            ],
+            options={
+                'verbose_name': 'Notification archivée',
+                'verbose_name_plural': 'Notifications archivées',
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['user', '-created_at'], name='notif_user_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['user', 'is_read'], name='notif_user_read_idx'),
+        ),
+        migrations.AddField(
+            model_name='notificationarchive',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_notifications', to=settings.AUTH_USER_MODEL, verbose_name='Destinataire'),
+        ),
+        migrations.AddIndex(
+            model_name='notificationarchive',
+            index=models.Index(fields=['user', '-created_at'], name='notif_archive_user_idx'),
+        ),
+    ]
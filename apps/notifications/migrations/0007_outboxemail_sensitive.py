@@ -0,0 +1,18 @@
+# Generated by Django 5.0.3 on 2026-10-19 17:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0006_notification_occurrences'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='outboxemail',
+            name='sensitive',
+            field=models.BooleanField(default=False, help_text="Lien d'activation ou équivalent : le contenu est effacé après l'envoi et masqué dans l'admin.", verbose_name='Contenu sensible'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.0.3 on 2026-10-19 17:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0007_outboxemail_sensitive'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='emailcampaign',
+            name='lease_expires_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name="Réservée jusqu'au"),
+        ),
+    ]
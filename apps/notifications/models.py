@@ -2,6 +2,7 @@ from django.db import models
 from django.conf import settings
 from django.contrib.contenttypes.fields import GenericForeignKey
 from django.contrib.contenttypes.models import ContentType
+from django.utils import timezone
 
 User = settings.AUTH_USER_MODEL
 
@@ -63,6 +64,9 @@ class Notification(models.Model):
     # Lien optionnel (URL)
     link = models.CharField("Lien (URL interne)", max_length=255, blank=True)
 
+    # Nombre d'événements regroupés (ex. messages d'une même conversation non encore lus)
+    occurrences = models.PositiveIntegerField("Occurrences", default=1)
+
     # Dates
     created_at = models.DateTimeField("Créée le", auto_now_add=True)
 
@@ -70,6 +74,157 @@ class Notification(models.Model):
         ordering = ['-created_at']
         verbose_name = "Notification"
         verbose_name_plural = "Notifications"
+        indexes = [
+            # Liste paginée / compteur de non lues d'un utilisateur, même avec un long historique
+            models.Index(fields=['user', '-created_at'], name='notif_user_created_idx'),
+            models.Index(fields=['user', 'is_read'], name='notif_user_read_idx'),
+        ]
+
+    def __str__(self):
+        return f"Notif pour {self.user} : {self.title}"
+
+
+class NotificationArchive(models.Model):
+    """
+    Trace compacte d'une notification purgée (sans message, lien ni objet lié).
+    Alimentée par apps.notifications.retention.
+    """
+    original_id = models.BigIntegerField("ID d'origine", unique=True)
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='archived_notifications',
+        verbose_name="Destinataire",
+    )
+    notification_type = models.CharField(
+        "Type de notification",
+        max_length=50,
+        choices=NotificationTypeChoices.choices,
+    )
+    title = models.CharField("Titre", max_length=200)
+    created_at = models.DateTimeField("Créée le")
+    read_at = models.DateTimeField("Lue le", null=True, blank=True)
+    archived_at = models.DateTimeField("Archivée le", auto_now_add=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        verbose_name = "Notification archivée"
+        verbose_name_plural = "Notifications archivées"
+        indexes = [
+            models.Index(fields=['user', '-created_at'], name='notif_archive_user_idx'),
+        ]
+
+    def __str__(self):
+        return f"Archive pour {self.user} : {self.title}"
+
+class OutboxEmailStatus(models.TextChoices):
+    PENDING = 'PENDING', 'En attente'
+    SENDING = 'SENDING', "En cours d'envoi"
+    SENT = 'SENT', 'Envoyé'
+    FAILED = 'FAILED', 'Échec'
+
+
+class OutboxEmail(models.Model):
+    """
+    Email transactionnel en file d'attente : enregistré dans la même transaction
+    que le changement métier, envoyé ensuite par la commande send_outbox_emails.
+    """
+    subject = models.CharField("Sujet", max_length=255)
+    body = models.TextField("Texte")
+    html_body = models.TextField("HTML", blank=True)
+    from_email = models.CharField("Expéditeur", max_length=254)
+    to = models.JSONField("Destinataires", default=list)
+    sensitive = models.BooleanField(
+        "Contenu sensible",
+        default=False,
+        help_text="Lien d'activation ou équivalent : le contenu est effacé après l'envoi et masqué dans l'admin.",
+    )
+
+    status = models.CharField(
+        "Statut",
+        max_length=10,
+        choices=OutboxEmailStatus.choices,
+        default=OutboxEmailStatus.PENDING,
+    )
+    attempts = models.PositiveSmallIntegerField("Tentatives", default=0)
+    last_error = models.TextField("Dernière erreur", blank=True)
+    next_attempt_at = models.DateTimeField("Prochaine tentative", default=timezone.now)
+
+    created_at = models.DateTimeField("Créé le", auto_now_add=True)
+    sent_at = models.DateTimeField("Envoyé le", null=True, blank=True)
+
+    class Meta:
+        ordering = ['created_at']
+        verbose_name = "Email en attente"
+        verbose_name_plural = "Emails en attente"
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at'], name='outbox_status_next_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.subject} -> {', '.join(self.to)}"
+
+
+class EmailCampaignStatus(models.TextChoices):
+    QUEUED = 'QUEUED', 'En attente'
+    SENDING = 'SENDING', "En cours d'envoi"
+    DONE = 'DONE', 'Terminée'
+    CANCELLED = 'CANCELLED', 'Annulée'
+
+
+class EmailCampaignAudience(models.TextChoices):
+    ACTIVE_USERS = 'ACTIVE_USERS', 'Tous les utilisateurs actifs'
+    CUSTOMERS = 'CUSTOMERS', 'Utilisateurs actifs hors staff'
+
+
+class EmailCampaign(models.Model):
+    """
+    Envoi de masse : le contenu est rendu une seule fois (avec des marqueurs
+    pour les champs propres à chaque destinataire), puis envoyé par blocs par
+    la commande send_email_campaigns. `last_user_id` permet de reprendre un
+    envoi interrompu sans doublon, `lease_expires_at` d'éviter que deux workers
+    envoient la même campagne en même temps.
+    """
+    name = models.CharField("Nom", max_length=200)
+    subject = models.CharField("Sujet", max_length=255)
+    body = models.TextField("Texte (pré-rendu)")
+    html_body = models.TextField("HTML (pré-rendu)", blank=True)
+    from_email = models.CharField("Expéditeur", max_length=254)
+    audience = models.CharField(
+        "Destinataires",
+        max_length=20,
+        choices=EmailCampaignAudience.choices,
+        default=EmailCampaignAudience.ACTIVE_USERS,
+    )
+
+    status = models.CharField(
+        "Statut",
+        max_length=10,
+        choices=EmailCampaignStatus.choices,
+        default=EmailCampaignStatus.QUEUED,
+    )
+    total_recipients = models.PositiveIntegerField("Destinataires", default=0)
+    sent_count = models.PositiveIntegerField("Envoyés", default=0)
+    failed_count = models.PositiveIntegerField("Échecs", default=0)
+    last_user_id = models.PositiveIntegerField("Dernier utilisateur traité", default=0)
+    # Réservation par un worker : un envoi en cours n'est repris qu'après expiration
+    lease_expires_at = models.DateTimeField("Réservée jusqu'au", null=True, blank=True)
+
+    created_at = models.DateTimeField("Créée le", auto_now_add=True)
+    started_at = models.DateTimeField("Démarrée le", null=True, blank=True)
+    finished_at = models.DateTimeField("Terminée le", null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        verbose_name = "Campagne email"
+        verbose_name_plural = "Campagnes email"
 
     def __str__(self):
-        return f"Notif pour {self.user} : {self.title}"
\ No newline at end of file
+        return self.name
+
+    @property
+    def progress_percent(self):
+        if not self.total_recipients:
+            return 100 if self.status == EmailCampaignStatus.DONE else 0
+        done = self.sent_count + self.failed_count
+        return min(round(done * 100 / self.total_recipients), 100)
@@ -0,0 +1,153 @@
+# apps/notifications/outbox.py
+"""
+File d'attente des emails transactionnels (pattern "outbox").
+
+Les vues n'envoient plus de mail pendant la requête : `queue_email` insère une
+ligne OutboxEmail dans la transaction en cours (elle disparaît donc avec un
+rollback), puis `send_pending_emails` (commande send_outbox_emails) vide la
+file par lots sur une seule connexion SMTP, avec nouvelles tentatives espacées.
+"""
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db import transaction
+from django.utils import timezone
+
+from .models import OutboxEmail, OutboxEmailStatus
+
+logger = logging.getLogger(__name__)
+
+OUTBOX_BATCH_SIZE = 50
+OUTBOX_MAX_ATTEMPTS = 6
+OUTBOX_RETRY_BASE_DELAY = 60  # secondes, doublé à chaque échec
+OUTBOX_RETRY_MAX_DELAY = 6 * 3600
+# Un lot réservé mais jamais terminé (worker arrêté) redevient disponible après ce délai
+OUTBOX_SENDING_LEASE = 10 * 60
+
+
+def queue_email(subject, body, to, *, html_body="", from_email=None, sensitive=False):
+    """
+    Met un email en file d'attente. Retourne l'OutboxEmail créé (ou None sans destinataire).
+    `sensitive` : le contenu (lien à usage unique...) est effacé une fois l'email envoyé.
+    """
+    recipients = [to] if isinstance(to, str) else [addr for addr in to if addr]
+    if not recipients:
+        return None
+    return OutboxEmail.objects.create(
+        subject=subject,
+        body=body,
+        html_body=html_body or "",
+        from_email=from_email or settings.DEFAULT_FROM_EMAIL,
+        to=recipients,
+        sensitive=sensitive,
+    )
+
+
+def retry_delay(attempts):
+    """Délai avant la prochaine tentative (backoff exponentiel plafonné)."""
+    return timedelta(seconds=min(OUTBOX_RETRY_BASE_DELAY * 2 ** max(attempts - 1, 0), OUTBOX_RETRY_MAX_DELAY))
+
+
+def _claim_batch(batch_size, now):
+    """Réserve un lot d'emails dus (plusieurs workers peuvent tourner en parallèle)."""
+    with transaction.atomic():
+        ids = list(
+            OutboxEmail.objects.select_for_update(skip_locked=True)
+            .filter(
+                status__in=[OutboxEmailStatus.PENDING, OutboxEmailStatus.SENDING],
+                next_attempt_at__lte=now,
+            )
+            .order_by("next_attempt_at", "id")
+            .values_list("id", flat=True)[:batch_size]
+        )
+        if ids:
+            OutboxEmail.objects.filter(id__in=ids).update(
+                status=OutboxEmailStatus.SENDING,
+                next_attempt_at=now + timedelta(seconds=OUTBOX_SENDING_LEASE),
+            )
+    return list(OutboxEmail.objects.filter(id__in=ids).order_by("id"))
+
+
+def _build_message(email, connection):
+    msg = EmailMultiAlternatives(
+        subject=email.subject,
+        body=email.body,
+        from_email=email.from_email,
+        to=email.to,
+        connection=connection,
+    )
+    if email.html_body:
+        msg.attach_alternative(email.html_body, "text/html")
+    return msg
+
+
+def _record_failure(email, exc, stats):
+    """Échec d'envoi : nouvelle tentative plus tard, ou abandon après OUTBOX_MAX_ATTEMPTS."""
+    email.attempts += 1
+    email.last_error = f"{exc.__class__.__name__}: {exc}"[:2000]
+    if email.attempts >= OUTBOX_MAX_ATTEMPTS:
+        email.status = OutboxEmailStatus.FAILED
+        stats["failed"] += 1
+        logger.error("Email #%s abandonné après %s tentatives : %s", email.pk, email.attempts, exc)
+    else:
+        email.status = OutboxEmailStatus.PENDING
+        email.next_attempt_at = timezone.now() + retry_delay(email.attempts)
+        stats["retried"] += 1
+
+
+def send_pending_emails(*, batch_size=OUTBOX_BATCH_SIZE, max_batches=None, connection=None):
+    """
+    Envoie les emails dus, lot par lot, sur une connexion réutilisée.
+    Si le serveur SMTP est injoignable, le lot réservé est remis en file (tentative
+    comptée, backoff appliqué) et l'envoi s'arrête jusqu'au prochain passage.
+    Retourne {"sent": n, "retried": n, "failed": n}.
+    """
+    stats = {"sent": 0, "retried": 0, "failed": 0}
+    connection = connection or get_connection()
+    batches = 0
+    smtp_down = False
+    try:
+        while not smtp_down and (max_batches is None or batches < max_batches):
+            now = timezone.now()
+            emails = _claim_batch(batch_size, now)
+            if not emails:
+                break
+            batches += 1
+
+            try:
+                unsent = emails
+                if batches == 1:
+                    connection.open()  # ouverte une fois, seulement s'il y a quelque chose à envoyer
+                for index, email in enumerate(emails):
+                    unsent = emails[index + 1:]
+                    try:
+                        _build_message(email, connection).send()
+                    except Exception as exc:
+                        _record_failure(email, exc, stats)
+                        # La connexion peut être dans un état incertain : on la rouvre
+                        connection.close()
+                        connection.open()
+                    else:
+                        email.attempts += 1
+                        email.status = OutboxEmailStatus.SENT
+                        email.sent_at = timezone.now()
+                        email.last_error = ""
+                        if email.sensitive:
+                            email.body = email.html_body = ""
+                        stats["sent"] += 1
+            except Exception as exc:
+                # Connexion SMTP impossible à (r)ouvrir : le reste du lot est remis en file
+                smtp_down = True
+                logger.warning("Serveur SMTP injoignable, %s email(s) remis en file : %s", len(unsent), exc)
+                for email in unsent:
+                    _record_failure(email, exc, stats)
+            finally:
+                OutboxEmail.objects.bulk_update(
+                    emails,
+                    ["status", "attempts", "last_error", "next_attempt_at", "sent_at", "body", "html_body"],
+                )
+    finally:
+        connection.close()
+    return stats
@@ -0,0 +1,102 @@
+# apps/notifications/realtime.py
+"""
+Push temps réel des notifications (Channels).
+
+Chaque utilisateur connecté rejoint le groupe `notif_<user_id>` (NotificationConsumer).
+Les services appellent les fonctions ci-dessous ; l'envoi (group_send) n'a lieu
+qu'après le commit de la transaction, pour ne jamais annoncer une notification
+qui serait ensuite annulée par un rollback.
+"""
+import logging
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.db import transaction
+from django.db.models import Count
+
+from .models import Notification
+
+logger = logging.getLogger(__name__)
+
+
+def notification_group_name(user_id):
+    return f"notif_{user_id}"
+
+
+def serialize_notification(notification):
+    return {
+        "id": notification.pk,
+        "type": notification.notification_type,
+        "title": notification.title,
+        "message": notification.message,
+        "link": notification.link,
+        "is_read": notification.is_read,
+        "occurrences": notification.occurrences,
+        "created_at": notification.created_at.isoformat() if notification.created_at else None,
+    }
+
+
+def get_unread_counts(user_ids):
+    """{user_id: nombre de notifications non lues} en une seule requête groupée."""
+    user_ids = set(user_ids)
+    counts = dict.fromkeys(user_ids, 0)
+    rows = (
+        Notification.objects.filter(user_id__in=user_ids, is_read=False)
+        .values("user_id")
+        .annotate(unread=Count("id"))
+        .values_list("user_id", "unread")
+    )
+    counts.update(rows)
+    return counts
+
+
+def _group_send_all(events):
+    channel_layer = get_channel_layer()
+    if channel_layer is None:
+        return
+    send = async_to_sync(channel_layer.group_send)
+    for user_id, event in events:
+        try:
+            send(notification_group_name(user_id), event)
+        except Exception:
+            # Le temps réel est un plus : une couche indisponible ne doit pas casser la requête
+            logger.exception("Push de notification impossible pour l'utilisateur %s", user_id)
+
+
+def push_new_notifications(notifications):
+    """Annonce des notifications créées (+ compteur non lu à jour), après commit."""
+    notifications = list(notifications)
+    # Sans RETURNING (MySQL), bulk_create ne renseigne pas les pk : compteur seul
+    push_unread_counts(n.user_id for n in notifications if not n.pk)
+    notifications = [n for n in notifications if n.pk]
+    if not notifications:
+        return
+
+    def send():
+        counts = get_unread_counts(n.user_id for n in notifications)
+        _group_send_all(
+            (n.user_id, {
+                "type": "notification.created",
+                "notification": serialize_notification(n),
+                "unread_count": counts[n.user_id],
+            })
+            for n in notifications
+        )
+
+    transaction.on_commit(send)
+
+
+def push_unread_counts(user_ids):
+    """Envoie le compteur de notifications non lues à jour, après commit."""
+    user_ids = set(user_ids)
+    if not user_ids:
+        return
+
+    def send():
+        counts = get_unread_counts(user_ids)
+        _group_send_all(
+            (user_id, {"type": "notification.unread", "unread_count": count})
+            for user_id, count in counts.items()
+        )
+
+    transaction.on_commit(send)
@@ -0,0 +1,130 @@
+# apps/notifications/retention.py
+"""
+Rétention des notifications.
+
+Les notifications LUES plus anciennes que la durée configurée pour leur type
+(settings.NOTIFICATION_RETENTION_DAYS) sont supprimées par tranches de clés
+primaires : chaque tranche est une courte transaction, sans verrou prolongé sur
+la table. Elles peuvent être copiées au préalable dans NotificationArchive.
+Un ANALYZE met ensuite à jour les statistiques du planificateur.
+"""
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Max, Min, Q
+from django.utils import timezone
+
+from .models import Notification, NotificationArchive, NotificationTypeChoices
+
+RETENTION_BATCH_SIZE = 5000
+
+DEFAULT_RETENTION_DAYS = {
+    NotificationTypeChoices.GENERAL: 180,
+    NotificationTypeChoices.RESERVATION_CREATED: 90,
+    NotificationTypeChoices.RESERVATION_STATUS_CHANGED: 180,
+    NotificationTypeChoices.MESSAGE_RECEIVED: 30,
+    NotificationTypeChoices.PAYMENT_STATUS: 365,
+    NotificationTypeChoices.SYSTEM: 60,
+}
+
+
+def get_retention_days():
+    """Durées de conservation par type (jours), None = conserver indéfiniment."""
+    retention = dict(DEFAULT_RETENTION_DAYS)
+    retention.update(getattr(settings, "NOTIFICATION_RETENTION_DAYS", {}))
+    return retention
+
+
+def expired_notifications_filter(now=None):
+    """Q des notifications lues dont la durée de conservation est dépassée (None si aucune règle)."""
+    now = now or timezone.now()
+    condition = None
+    for notification_type, days in get_retention_days().items():
+        if days is None:
+            continue
+        rule = Q(notification_type=notification_type, created_at__lt=now - timedelta(days=days))
+        condition = rule if condition is None else condition | rule
+    if condition is None:
+        return None
+    return Q(is_read=True) & condition
+
+
+def _archive(queryset):
+    rows = queryset.values_list("id", "user_id", "notification_type", "title", "created_at", "read_at")
+    NotificationArchive.objects.bulk_create(
+        [
+            NotificationArchive(
+                original_id=pk,
+                user_id=user_id,
+                notification_type=notification_type,
+                title=title,
+                created_at=created_at,
+                read_at=read_at,
+            )
+            for pk, user_id, notification_type, title, created_at, read_at in rows
+        ],
+        ignore_conflicts=True,  # tranche rejouée après une interruption
+    )
+
+
+def analyze_notifications_table():
+    """Met à jour les statistiques du planificateur après une purge importante."""
+    table = connection.ops.quote_name(Notification._meta.db_table)
+    statement = {
+        "mysql": f"ANALYZE TABLE {table}",
+    }.get(connection.vendor, f"ANALYZE {table}")
+    with connection.cursor() as cursor:
+        cursor.execute(statement)
+
+
+def purge_notifications(
+    *,
+    now=None,
+    batch_size=RETENTION_BATCH_SIZE,
+    archive=None,
+    analyze=True,
+    dry_run=False,
+    pause=0,
+):
+    """
+    Supprime (et archive si demandé) les notifications lues expirées.
+    Retourne {"deleted": n, "archived": n, "batches": n}.
+    """
+    stats = {"deleted": 0, "archived": 0, "batches": 0}
+    condition = expired_notifications_filter(now)
+    if condition is None:
+        return stats
+    if archive is None:
+        archive = getattr(settings, "NOTIFICATION_ARCHIVE_ON_PURGE", True)
+
+    expired = Notification.objects.filter(condition)
+    if dry_run:
+        stats["deleted"] = expired.count()
+        return stats
+
+    bounds = expired.aggregate(low=Min("id"), high=Max("id"))
+    if bounds["low"] is None:
+        return stats
+
+    low = bounds["low"]
+    while low <= bounds["high"]:
+        high = low + batch_size
+        with transaction.atomic():
+            window = expired.filter(id__gte=low, id__lt=high)
+            if archive:
+                _archive(window)
+            # Pas de cascade ni de signal sur Notification : un seul DELETE par tranche
+            deleted, _ = window.delete()
+        stats["deleted"] += deleted
+        if archive:
+            stats["archived"] += deleted
+        stats["batches"] += 1
+        low = high
+        if pause:
+            time.sleep(pause)
+
+    if analyze and stats["deleted"]:
+        analyze_notifications_table()
+    return stats
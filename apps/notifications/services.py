@@ -1,8 +1,11 @@
 from django.contrib.contenttypes.models import ContentType
+from django.db.models import F
 from django.utils import timezone
 from django.conf import settings
 
-from .models import Notification, NotificationTypeChoices
+from .campaigns import create_campaign
+from .models import EmailCampaignAudience, Notification, NotificationTypeChoices
+from .realtime import push_new_notifications, push_unread_counts
 from apps.accounts.models import User
 from apps.messaging.models import Conversation, Message
 
@@ -38,9 +41,72 @@ def create_notification(
         object_id=object_id,
         link=link or "",
     )
+    push_new_notifications([notif])
     return notif
 
 
+FAN_OUT_BATCH_SIZE = 500
+
+
+def get_staff_recipient_ids():
+    """
+    Identifiants des membres du staff actifs, en une requête indexée
+    (user_staff_active_idx). Pas de cache : sans cache partagé entre les workers,
+    un staff désactivé ou promu serait vu en retard par les autres processus.
+    """
+    return list(
+        UserModel.objects.filter(is_staff=True, is_active=True)
+        .order_by("id")
+        .values_list("id", flat=True)
+    )
+
+
+def fan_out_notifications(
+    recipient_ids,
+    *,
+    title: str,
+    message: str,
+    notification_type: str = NotificationTypeChoices.GENERAL,
+    actor: UserModel = None,
+    target_object=None,
+    link: str = "",
+    occurrences: int = 1,
+    batch_size: int = FAN_OUT_BATCH_SIZE,
+) -> int:
+    """
+    Crée la même notification pour plusieurs destinataires (identifiants)
+    en INSERT groupés. Retourne le nombre de notifications créées.
+    """
+    content_type = None
+    object_id = None
+    if target_object is not None:
+        content_type = ContentType.objects.get_for_model(target_object.__class__)
+        object_id = target_object.pk
+
+    created = 0
+    batch = []
+    for user_id in recipient_ids:
+        batch.append(Notification(
+            user_id=user_id,
+            actor=actor,
+            notification_type=notification_type,
+            title=title,
+            message=message,
+            content_type=content_type,
+            object_id=object_id,
+            link=link or "",
+            occurrences=occurrences,
+        ))
+        if len(batch) >= batch_size:
+            push_new_notifications(Notification.objects.bulk_create(batch))
+            created += len(batch)
+            batch = []
+    if batch:
+        push_new_notifications(Notification.objects.bulk_create(batch))
+        created += len(batch)
+    return created
+
+
 def mark_notification_as_read(notification: Notification):
     """
     Marque une notification comme lue.
@@ -49,6 +115,7 @@ def mark_notification_as_read(notification: Notification):
         notification.is_read = True
         notification.read_at = timezone.now()
         notification.save(update_fields=['is_read', 'read_at'])
+        push_unread_counts([notification.user_id])
 
 
 def mark_all_notifications_as_read(user: UserModel):
@@ -57,7 +124,24 @@ def mark_all_notifications_as_read(user: UserModel):
     """
     qs = Notification.objects.filter(user=user, is_read=False)
     now = timezone.now()
-    qs.update(is_read=True, read_at=now)
+    if qs.update(is_read=True, read_at=now):
+        push_unread_counts([user.pk])
+
+
+def mark_conversation_notifications_as_read(user_id, conversation):
+    """
+    Marque comme lues les notifications de messages d'une conversation reçues
+    par `user_id` (messages lus dans le chat).
+    """
+    qs = Notification.objects.filter(
+        user_id=user_id,
+        is_read=False,
+        notification_type=NotificationTypeChoices.MESSAGE_RECEIVED,
+        content_type=ContentType.objects.get_for_model(Conversation),
+        object_id=conversation.pk,
+    )
+    if qs.update(is_read=True, read_at=timezone.now()):
+        push_unread_counts([user_id])
 
 
 # ==== EXEMPLES SPÉCIFIQUES POUR RÉSERVATIONS ==== #
@@ -66,7 +150,6 @@ def notify_admins_new_reservation(reservation):
     """
     Notifie les admins / staff d'une nouvelle réservation créée par un utilisateur.
     """
-    admins = UserModel.objects.filter(is_staff=True)
     title = f"Nouvelle réservation #{reservation.id}"
     message = (
         f"L'utilisateur {reservation.user.get_full_name() or reservation.user.username} "
@@ -75,16 +158,15 @@ def notify_admins_new_reservation(reservation):
     )
     link = f"/dashboard/reservations/{reservation.id}/"
 
-    for admin in admins:
-        create_notification(
-            user=admin,
-            actor=reservation.user,
-            title=title,
-            message=message,
-            notification_type=NotificationTypeChoices.RESERVATION_CREATED,
-            target_object=reservation,
-            link=link,
-        )
+    fan_out_notifications(
+        get_staff_recipient_ids(),
+        actor=reservation.user,
+        title=title,
+        message=message,
+        notification_type=NotificationTypeChoices.RESERVATION_CREATED,
+        target_object=reservation,
+        link=link,
+    )
 
 
 def notify_user_reservation_status_change(reservation, old_status, new_status, actor=None):
@@ -110,14 +192,59 @@ def notify_user_reservation_status_change(reservation, old_status, new_status, a
     )
 
 
-from apps.messaging.models import Conversation, Message
+def coalesce_message_notifications(conversation, recipient_ids, *, actor, title, message, link="", occurrences=1):
+    """
+    Notifications MESSAGE_RECEIVED regroupées par conversation : si le destinataire
+    a déjà une notification non lue pour cette conversation, elle est mise à jour
+    (aperçu, nombre de messages, date) par un seul UPDATE ; sinon elle est créée.
+    `occurrences` : nombre de messages représentés (écriture groupée du chat).
+    """
+    content_type = ContentType.objects.get_for_model(Conversation)
+    pending = list(
+        Notification.objects.filter(
+            user_id__in=recipient_ids,
+            is_read=False,
+            notification_type=NotificationTypeChoices.MESSAGE_RECEIVED,
+            content_type=content_type,
+            object_id=conversation.pk,
+        ).only("id", "user_id", "notification_type", "link", "is_read", "occurrences")
+    )
 
+    if pending:
+        now = timezone.now()
+        Notification.objects.filter(pk__in=[n.pk for n in pending]).update(
+            actor=actor,
+            title=title,
+            message=message,
+            occurrences=F("occurrences") + occurrences,
+            created_at=now,
+        )
+        for notification in pending:
+            notification.title = title
+            notification.message = message
+            notification.occurrences += occurrences
+            notification.created_at = now
+        push_new_notifications(pending)
 
-def notify_new_chat_message(message: Message):
+    already_notified = {n.user_id for n in pending}
+    fan_out_notifications(
+        [user_id for user_id in recipient_ids if user_id not in already_notified],
+        actor=actor,
+        title=title,
+        message=message,
+        notification_type=NotificationTypeChoices.MESSAGE_RECEIVED,
+        target_object=conversation,
+        link=link,
+        occurrences=occurrences,
+    )
+
+
+def notify_new_chat_message(message: Message, *, occurrences: int = 1):
     """
     Crée une notification lors d'un nouveau message dans une conversation.
     - Si le message vient de l'utilisateur (conversation.user) -> notifie admin(s)
     - Si le message vient d'un admin/staff                 -> notifie l'utilisateur
+    `occurrences` : `message` est le dernier de plusieurs messages écrits ensemble.
     """
     conversation = message.conversation
     sender = message.sender
@@ -125,26 +252,24 @@ def notify_new_chat_message(message: Message):
     # Si c'est l'utilisateur qui envoie (côté client)
     if sender == conversation.user:
         # Destinataires : admin assigné à la conversation, sinon tous les staff
-        recipients = []
         if conversation.admin and conversation.admin.is_active:
-            recipients.append(conversation.admin)
+            recipient_ids = [conversation.admin_id]
         else:
-            recipients = list(User.objects.filter(is_staff=True, is_active=True))
+            recipient_ids = get_staff_recipient_ids()
 
         title = f"Nouveau message de {sender.get_full_name() or sender.username}"
         preview = (message.content[:120] + "…") if len(message.content) > 120 else message.content
         link = f"/messaging/admin/conversations/{conversation.id}/"
 
-        for admin in recipients:
-            create_notification(
-                user=admin,
-                actor=sender,
-                title=title,
-                message=preview,
-                notification_type=NotificationTypeChoices.MESSAGE_RECEIVED,
-                target_object=conversation,
-                link=link,
-            )
+        coalesce_message_notifications(
+            conversation,
+            recipient_ids,
+            actor=sender,
+            title=title,
+            message=preview,
+            link=link,
+            occurrences=occurrences,
+        )
 
     else:
         # Sinon, on suppose que c'est un admin/staff qui répond -> notifier l'utilisateur
@@ -152,47 +277,85 @@ def notify_new_chat_message(message: Message):
         preview = (message.content[:120] + "…") if len(message.content) > 120 else message.content
         link = "/messaging/chat/"
 
-        create_notification(
-            user=conversation.user,
+        coalesce_message_notifications(
+            conversation,
+            [conversation.user_id],
             actor=sender,
             title=title,
             message=preview,
-            notification_type=NotificationTypeChoices.MESSAGE_RECEIVED,
-            target_object=conversation,
             link=link,
+            occurrences=occurrences,
         )
 
 
 
 def notify_admins_new_service(service):
-    admins = UserModel.objects.filter(is_staff=True, is_active=True)
     title = f"Nouveau service créé : {service.name}"
     message = (service.short_description or "")[:200]
     link = f"/dashboard/services/{service.id}/"
-    for admin in admins:
-        create_notification(
-            user=admin,
-            actor=None,
-            title=title,
-            message=message,
-            notification_type=NotificationTypeChoices.SYSTEM,
-            target_object=service,
-            link=link,
-        )
+    fan_out_notifications(
+        get_staff_recipient_ids(),
+        actor=None,
+        title=title,
+        message=message,
+        notification_type=NotificationTypeChoices.SYSTEM,
+        target_object=service,
+        link=link,
+    )
 
 
-def notify_users_new_training_session(training, users_qs):
+def notify_users_new_training_session(training, users_qs, *, send_email=True):
     title = f"Nouvelle session de formation : {training.title}"
     message = f"La formation '{training.title}' est désormais disponible."
     link = f"/services/trainings/"  # ou une page vitrine à venir
 
-    for user in users_qs:
-        create_notification(
-            user=user,
-            actor=None,
-            title=title,
-            message=message,
-            notification_type=NotificationTypeChoices.GENERAL,
-            target_object=training,
-            link=link,
-        )
\ No newline at end of file
+    # Seuls les identifiants sont lus (par blocs), sans instancier les utilisateurs
+    fan_out_notifications(
+        users_qs.values_list("id", flat=True).iterator(chunk_size=FAN_OUT_BATCH_SIZE),
+        actor=None,
+        title=title,
+        message=message,
+        notification_type=NotificationTypeChoices.GENERAL,
+        target_object=training,
+        link=link,
+    )
+
+    if send_email:
+        # Email à tous les utilisateurs : rendu une fois, envoyé par send_email_campaigns
+        create_campaign(
+            f"Annonce formation : {training.title}",
+            title,
+            text_template="emails/training_announcement.txt",
+            html_template="emails/training_announcement.html",
+            context={"training": training, "trainings_url": settings.SITE_URL + link},
+            audience=EmailCampaignAudience.CUSTOMERS,
+        )
+
+
+def notify_users_new_offer(offer, users_qs, *, send_email=True):
+    title = f"Nouvelle offre : {offer.title}"
+    message = (
+        f"-{offer.discount_percent} % sur {offer.service.name} "
+        f"du {offer.start_date:%d/%m/%Y} au {offer.end_date:%d/%m/%Y}."
+    )
+    link = "/services/offers/"
+
+    fan_out_notifications(
+        users_qs.values_list("id", flat=True).iterator(chunk_size=FAN_OUT_BATCH_SIZE),
+        actor=None,
+        title=title,
+        message=message,
+        notification_type=NotificationTypeChoices.GENERAL,
+        target_object=offer,
+        link=link,
+    )
+
+    if send_email:
+        create_campaign(
+            f"Annonce offre : {offer.title}",
+            title,
+            text_template="emails/offer_announcement.txt",
+            html_template="emails/offer_announcement.html",
+            context={"offer": offer, "offers_url": settings.SITE_URL + link},
+            audience=EmailCampaignAudience.CUSTOMERS,
+        )
@@ -1,3 +1,520 @@
-from django.test import TestCase
+import json
+import shutil
+import tempfile
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from channels.db import database_sync_to_async
+from asgiref.testing import ApplicationCommunicator
+from django.contrib.auth.models import AnonymousUser
+from django.contrib.auth.tokens import default_token_generator
+from django.core import mail
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.mail.backends.locmem import EmailBackend
+from django.db import connection, transaction
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from apps.accounts.models import User
+from apps.business_partners.models import PartnerApplication, Region
+from apps.business_partners.services import activate_partner
+from apps.notifications import campaigns, outbox
+from apps.notifications.consumers import NotificationConsumer
+from apps.notifications.campaigns import create_campaign, send_campaign, send_queued_campaigns
+from apps.notifications.models import (
+    EmailCampaign,
+    EmailCampaignAudience,
+    EmailCampaignStatus,
+    Notification,
+    NotificationArchive,
+    NotificationTypeChoices,
+    OutboxEmail,
+    OutboxEmailStatus,
+)
+from apps.notifications.outbox import queue_email, send_pending_emails
+from apps.notifications.retention import purge_notifications
+from apps.messaging.models import Conversation, Message
+from apps.notifications.services import (
+    create_notification,
+    fan_out_notifications,
+    get_staff_recipient_ids,
+    mark_all_notifications_as_read,
+    notify_new_chat_message,
+)
+from apps.services_app.models import JobApplication, JobOffer, JobOfferStatusChoices, Offer, Service
+
+
+class FlakyBackend(EmailBackend):
+    """
+    Backend locmem qui échoue pour les adresses listées dans `failing`, et dont
+    l'ouverture échoue à partir de la `unreachable_after`-ième.
+    """
+    failing = set()
+    unreachable_after = None
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.opened = 0
+
+    def open(self):
+        self.opened += 1
+        if self.unreachable_after is not None and self.opened > self.unreachable_after:
+            raise ConnectionRefusedError("connexion refusée")
+        return super().open()
+
+    def send_messages(self, messages):
+        for message in messages:
+            if set(message.to) & self.failing:
+                raise ConnectionError("SMTP indisponible")
+        return super().send_messages(messages)
+
+
+@override_settings(EMAIL_BACKEND="django.core.mail.backends.locmem.EmailBackend")
+class OutboxEmailTests(TestCase):
+    def test_queue_is_part_of_the_caller_transaction(self):
+        with self.assertRaises(RuntimeError):
+            with transaction.atomic():
+                queue_email("Sujet", "Texte", ["a@example.com"])
+                raise RuntimeError
+        self.assertFalse(OutboxEmail.objects.exists())
+        self.assertEqual(mail.outbox, [])
+
+        self.assertIsNone(queue_email("Sujet", "Texte", ["", None]))
+
+    def test_drains_in_batches_over_one_connection(self):
+        for i in range(5):
+            queue_email(f"Sujet {i}", "Texte", [f"u{i}@example.com"], html_body="<p>HTML</p>")
+
+        backend = FlakyBackend()
+        stats = send_pending_emails(batch_size=2, connection=backend)
+
+        self.assertEqual(stats, {"sent": 5, "retried": 0, "failed": 0})
+        self.assertEqual(backend.opened, 1)
+        self.assertEqual(len(mail.outbox), 5)
+        self.assertEqual(mail.outbox[0].alternatives, [("<p>HTML</p>", "text/html")])
+        self.assertFalse(OutboxEmail.objects.exclude(status=OutboxEmailStatus.SENT).exists())
+        self.assertEqual(send_pending_emails(), {"sent": 0, "retried": 0, "failed": 0})
+
+    def test_retries_with_backoff_then_gives_up(self):
+        email = queue_email("Sujet", "Texte", ["ko@example.com"])
+        queue_email("Sujet", "Texte", ["ok@example.com"])
+
+        with mock.patch.object(FlakyBackend, "failing", {"ko@example.com"}):
+            stats = send_pending_emails(connection=FlakyBackend())
+            self.assertEqual(stats, {"sent": 1, "retried": 1, "failed": 0})
+
+            email.refresh_from_db()
+            self.assertEqual(email.status, OutboxEmailStatus.PENDING)
+            self.assertEqual(email.attempts, 1)
+            self.assertIn("SMTP indisponible", email.last_error)
+            self.assertGreater(email.next_attempt_at, timezone.now() + timedelta(seconds=50))
+
+            # Pas encore dû : rien n'est renvoyé
+            self.assertEqual(send_pending_emails(connection=FlakyBackend())["retried"], 0)
+
+            OutboxEmail.objects.filter(pk=email.pk).update(
+                attempts=outbox.OUTBOX_MAX_ATTEMPTS - 1,
+                next_attempt_at=timezone.now(),
+            )
+            with self.assertLogs("apps.notifications.outbox", "ERROR"):
+                stats = send_pending_emails(connection=FlakyBackend())
+            self.assertEqual(stats, {"sent": 0, "retried": 0, "failed": 1})
+
+        email.refresh_from_db()
+        self.assertEqual(email.status, OutboxEmailStatus.FAILED)
+        self.assertEqual(len(mail.outbox), 1)
+
+    def test_unreachable_smtp_puts_the_batch_back_with_backoff(self):
+        for i in range(3):
+            queue_email("Sujet", "Texte", [f"u{i}@example.com"])
+
+        with mock.patch.object(FlakyBackend, "unreachable_after", 0), \
+                self.assertLogs("apps.notifications.outbox", "WARNING"):
+            stats = send_pending_emails(batch_size=2, connection=FlakyBackend())
+
+        # Un seul lot tenté, le suivant attend le prochain passage
+        self.assertEqual(stats, {"sent": 0, "retried": 2, "failed": 0})
+        deferred = OutboxEmail.objects.filter(attempts=1)
+        self.assertEqual(deferred.count(), 2)
+        self.assertFalse(deferred.exclude(status=OutboxEmailStatus.PENDING).exists())
+        self.assertFalse(deferred.filter(next_attempt_at__lte=timezone.now()).exists())
+        self.assertIn("connexion refusée", deferred.first().last_error)
+        self.assertEqual(OutboxEmail.objects.get(attempts=0).status, OutboxEmailStatus.PENDING)
+
+    def test_failed_reopen_puts_the_rest_of_the_batch_back(self):
+        queue_email("Sujet", "Texte", ["ko@example.com"])
+        queue_email("Sujet", "Texte", ["ok@example.com"])
+
+        with mock.patch.object(FlakyBackend, "failing", {"ko@example.com"}), \
+                mock.patch.object(FlakyBackend, "unreachable_after", 1), \
+                self.assertLogs("apps.notifications.outbox", "WARNING"):
+            stats = send_pending_emails(connection=FlakyBackend())
+
+        self.assertEqual(stats, {"sent": 0, "retried": 2, "failed": 0})
+        self.assertEqual(
+            list(OutboxEmail.objects.order_by("id").values_list("status", "attempts")),
+            [(OutboxEmailStatus.PENDING, 1), (OutboxEmailStatus.PENDING, 1)],
+        )
+        self.assertEqual(mail.outbox, [])
+
+    def test_retry_delay_is_capped(self):
+        self.assertEqual(outbox.retry_delay(1), timedelta(seconds=outbox.OUTBOX_RETRY_BASE_DELAY))
+        self.assertEqual(outbox.retry_delay(2), timedelta(seconds=2 * outbox.OUTBOX_RETRY_BASE_DELAY))
+        self.assertEqual(outbox.retry_delay(50), timedelta(seconds=outbox.OUTBOX_RETRY_MAX_DELAY))
+
+    def test_stale_sending_rows_are_picked_up_again(self):
+        email = queue_email("Sujet", "Texte", ["a@example.com"])
+        OutboxEmail.objects.filter(pk=email.pk).update(
+            status=OutboxEmailStatus.SENDING,
+            next_attempt_at=timezone.now() - timedelta(seconds=1),
+        )
+        self.assertEqual(send_pending_emails()["sent"], 1)
+
+    def test_partner_activation_queues_a_set_password_link_then_scrubs_it(self):
+        region = Region.objects.create(name="Ouagadougou")
+        application = PartnerApplication.objects.create(
+            full_name="Awa Ouédraogo", phone="70000000", email="awa@example.com", id_number="B123",
+            city=region, current_activity="Commerciale", network_description="ONG",
+            sectors_knowledge="Événementiel", why_oloustream="Motivée",
+        )
+        admin_user = User.objects.create_user(username="staff", password="x", is_staff=True)
+
+        partner = activate_partner(application, admin_user)
+
+        queued = OutboxEmail.objects.get()
+        self.assertTrue(queued.sensitive)
+        self.assertNotIn("Mot de passe :", queued.body)
+        uidb64, token = queued.body.rstrip("/").split("/reset/")[1].split("/")
+        self.assertTrue(default_token_generator.check_token(partner.user, token))
+
+        self.assertEqual(send_pending_emails()["sent"], 1)
+        self.assertIn(token, mail.outbox[0].body)
+        queued.refresh_from_db()
+        self.assertEqual((queued.body, queued.html_body), ("", ""))
+
+
+@override_settings(EMAIL_BACKEND="django.core.mail.backends.locmem.EmailBackend")
+class JobApplicationEmailTests(TestCase):
+    def setUp(self):
+        self.private_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.private_root, ignore_errors=True)
+        override = override_settings(PRIVATE_MEDIA_ROOT=self.private_root)
+        override.enable()
+        self.addCleanup(override.disable)
+
+        self.offer = JobOffer.objects.create(
+            title="Monteur vidéo",
+            description="Montage",
+            status=JobOfferStatusChoices.PUBLISHED,
+        )
+        self.user = User.objects.create_user(username="candidat", email="c@example.com", password="x")
+        self.client.force_login(self.user)
+
+    def test_confirmation_is_queued_not_sent_during_request(self):
+        response = self.client.post(
+            reverse("services_app:user_jobs_apply", args=[self.offer.slug]),
+            {
+                "full_name": "Awa Candidate",
+                "email": "c@example.com",
+                "cv": SimpleUploadedFile("cv.pdf", b"%PDF-1.4", content_type="application/pdf"),
+            },
+        )
+
+        self.assertEqual(response.status_code, 302)
+        self.assertTrue(JobApplication.objects.filter(user=self.user).exists())
+        self.assertEqual(mail.outbox, [])
+        queued = OutboxEmail.objects.get()
+        self.assertEqual(queued.to, ["c@example.com"])
+
+        self.assertEqual(send_pending_emails()["sent"], 1)
+        self.assertEqual(mail.outbox[0].subject, "Confirmation de candidature - Oloustream")
+
+
+@override_settings(EMAIL_BACKEND="django.core.mail.backends.locmem.EmailBackend")
+class EmailCampaignTests(TestCase):
+    def setUp(self):
+        User.objects.create_user(username="staff", email="staff@example.com", password="x", is_staff=True)
+        User.objects.create_user(username="sans-email", email="", password="x")
+        for i in range(7):
+            User.objects.create_user(
+                username=f"client{i}", email=f"client{i}@example.com", password="x",
+                first_name="Awa" if i else "<Awa & Cie>", last_name=f"N{i}",
+            )
+        self.service = Service.objects.create(name="Mixage", slug="mixage", description="Mixage", base_price=10000)
+
+    def _campaign(self, **kwargs):
+        offer = Offer.objects.create(
+            service=self.service,
+            title="Promo mixage",
+            discount_percent=20,
+            start_date=timezone.localdate(),
+            end_date=timezone.localdate() + timedelta(days=7),
+        )
+        return create_campaign(
+            "Annonce",
+            "Nouvelle offre pour @@first_name@@",
+            text_template="emails/offer_announcement.txt",
+            html_template="emails/offer_announcement.html",
+            context={"offer": offer, "offers_url": "https://example.com/services/offers/"},
+            **kwargs,
+        )
+
+    def test_renders_once_and_personalizes_each_recipient(self):
+        with mock.patch("apps.notifications.campaigns.render_to_string", wraps=campaigns.render_to_string) as render:
+            campaign = self._campaign(audience=EmailCampaignAudience.CUSTOMERS)
+        self.assertEqual(render.call_count, 2)  # texte + HTML, quel que soit le nombre de destinataires
+
+        send_campaign(campaign, chunk_size=3, connections=2, rate_per_minute=0)
+
+        campaign.refresh_from_db()
+        self.assertEqual(campaign.status, EmailCampaignStatus.DONE)
+        self.assertEqual((campaign.total_recipients, campaign.sent_count, campaign.failed_count), (7, 7, 0))
+        self.assertEqual(campaign.progress_percent, 100)
+        self.assertEqual(sorted(m.to[0] for m in mail.outbox), [f"client{i}@example.com" for i in range(7)])
+
+        first = next(m for m in mail.outbox if m.to == ["client0@example.com"])
+        self.assertEqual(first.subject, "Nouvelle offre pour <Awa & Cie>")
+        self.assertIn("Bonjour <Awa & Cie>,", first.body)
+        self.assertIn("Bonjour &lt;Awa &amp; Cie&gt;,", first.alternatives[0][0])
+        self.assertNotIn("@@", first.body + first.alternatives[0][0])
+
+    def test_resumes_from_cursor_and_honours_cancellation(self):
+        campaign = self._campaign()
+        campaign.status = EmailCampaignStatus.SENDING
+        campaign.total_recipients = 8
+        campaign.last_user_id = User.objects.get(username="client3").pk
+        campaign.save()
+
+        send_campaign(campaign, rate_per_minute=0)
+        self.assertEqual(sorted(m.to[0] for m in mail.outbox), [f"client{i}@example.com" for i in range(4, 7)])
+
+        cancelled = self._campaign()
+        cancelled.status = EmailCampaignStatus.CANCELLED
+        cancelled.save()
+        mail.outbox = []
+        self.assertEqual(send_queued_campaigns(rate_per_minute=0), [])
+        self.assertEqual(mail.outbox, [])
+
+    def test_campaign_leased_by_another_worker_is_only_resumed_after_expiry(self):
+        campaign = self._campaign(audience=EmailCampaignAudience.CUSTOMERS)
+        EmailCampaign.objects.filter(pk=campaign.pk).update(
+            status=EmailCampaignStatus.SENDING,
+            total_recipients=7,
+            lease_expires_at=timezone.now() + timedelta(minutes=5),
+        )
+
+        self.assertEqual(send_queued_campaigns(rate_per_minute=0), [])
+        self.assertEqual(send_campaign(campaign, rate_per_minute=0).status, EmailCampaignStatus.SENDING)
+        self.assertEqual(mail.outbox, [])
+
+        EmailCampaign.objects.filter(pk=campaign.pk).update(lease_expires_at=timezone.now() - timedelta(seconds=1))
+        [resumed] = send_queued_campaigns(rate_per_minute=0)
+
+        self.assertEqual((resumed.status, resumed.sent_count, resumed.lease_expires_at), (EmailCampaignStatus.DONE, 7, None))
+        self.assertEqual(len(mail.outbox), 7)
+
+    def test_stops_when_the_lease_is_taken_over(self):
+        campaign = self._campaign(audience=EmailCampaignAudience.CUSTOMERS)
+        original = campaigns._build_messages
+
+        def build_then_lose_lease(*args):
+            # Bail expiré et repris par un autre worker pendant l'envoi du bloc
+            EmailCampaign.objects.filter(pk=campaign.pk).update(lease_expires_at=timezone.now() + timedelta(hours=1))
+            return original(*args)
+
+        with mock.patch("apps.notifications.campaigns._build_messages", side_effect=build_then_lose_lease), \
+                self.assertLogs("apps.notifications.campaigns", "WARNING"):
+            send_campaign(campaign, chunk_size=3, connections=1, rate_per_minute=0)
+
+        campaign.refresh_from_db()
+        self.assertEqual((campaign.status, campaign.last_user_id, campaign.sent_count), (EmailCampaignStatus.SENDING, 0, 0))
+        self.assertEqual(len(mail.outbox), 3)
+
+
+class SocketClient(ApplicationCommunicator):
+    """Client WebSocket minimal (channels.testing.WebsocketCommunicator dépend de daphne)."""
+
+    def __init__(self, application, path, user):
+        super().__init__(application, {
+            "type": "websocket",
+            "path": path,
+            "headers": [],
+            "subprotocols": [],
+            "user": user,
+        })
+
+    async def connect(self, timeout=1):
+        await self.send_input({"type": "websocket.connect"})
+        response = await self.receive_output(timeout)
+        return response["type"] == "websocket.accept"
+
+    async def receive_json_from(self, timeout=1):
+        response = await self.receive_output(timeout)
+        return json.loads(response["text"])
+
+    async def disconnect(self, timeout=1):
+        await self.send_input({"type": "websocket.disconnect", "code": 1000})
+        await self.wait(timeout)
+
+
+class NotificationPushTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="u", email="u@example.com", password="x")
+        create_notification(user=self.user, title="Ancienne", message="...")
+
+    async def _connect(self):
+        communicator = SocketClient(NotificationConsumer.as_asgi(), "/ws/notifications/", self.user)
+        connected = await communicator.connect()
+        self.assertTrue(connected)
+        self.assertEqual(await communicator.receive_json_from(), {"event": "unread_count", "unread_count": 1})
+        return communicator
+
+    async def test_pushes_new_notifications_after_commit(self):
+        communicator = await self._connect()
+
+        @database_sync_to_async
+        def create():
+            with self.captureOnCommitCallbacks() as callbacks:
+                create_notification(user=self.user, title="Nouvelle réservation", message="#12")
+            return callbacks
+
+        callbacks = await create()
+        self.assertTrue(await communicator.receive_nothing())  # rien avant le commit
+
+        await database_sync_to_async(callbacks[0])()
+        event = await communicator.receive_json_from()
+        self.assertEqual(event["event"], "notification")
+        self.assertEqual(event["notification"]["title"], "Nouvelle réservation")
+        self.assertEqual(event["unread_count"], 2)
+
+        @database_sync_to_async
+        def mark_all_read():
+            with self.captureOnCommitCallbacks(execute=True):
+                mark_all_notifications_as_read(self.user)
+
+        await mark_all_read()
+        self.assertEqual(await communicator.receive_json_from(), {"event": "unread_count", "unread_count": 0})
+        await communicator.disconnect()
+
+    async def test_rejects_anonymous(self):
+        communicator = SocketClient(NotificationConsumer.as_asgi(), "/ws/notifications/", AnonymousUser())
+        connected = await communicator.connect()
+        self.assertFalse(connected)
+
+
+class NotificationRetentionTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="u", email="u@example.com", password="x")
+        self.now = timezone.now()
+
+    def _notif(self, notification_type, age_days, is_read=True):
+        notif = create_notification(user=self.user, title=f"{notification_type} {age_days}", message="...",
+                                    notification_type=notification_type)
+        Notification.objects.filter(pk=notif.pk).update(
+            created_at=self.now - timedelta(days=age_days),
+            is_read=is_read,
+        )
+        return notif
+
+    @override_settings(NOTIFICATION_RETENTION_DAYS={"MESSAGE_RECEIVED": 30, "PAYMENT_STATUS": None})
+    def test_purges_expired_read_notifications_in_batches(self):
+        expired = [self._notif(NotificationTypeChoices.MESSAGE_RECEIVED, 40) for _ in range(5)]
+        kept = [
+            self._notif(NotificationTypeChoices.MESSAGE_RECEIVED, 10),
+            self._notif(NotificationTypeChoices.MESSAGE_RECEIVED, 40, is_read=False),
+            self._notif(NotificationTypeChoices.PAYMENT_STATUS, 4000),
+        ]
+
+        self.assertEqual(purge_notifications(now=self.now, dry_run=True)["deleted"], 5)
+        stats = purge_notifications(now=self.now, batch_size=2, archive=True)
+
+        self.assertEqual(stats["deleted"], 5)
+        self.assertEqual(stats["archived"], 5)
+        self.assertGreaterEqual(stats["batches"], 3)
+        self.assertEqual(
+            set(Notification.objects.values_list("id", flat=True)),
+            {n.pk for n in kept},
+        )
+        self.assertEqual(
+            set(NotificationArchive.objects.values_list("original_id", flat=True)),
+            {n.pk for n in expired},
+        )
+
+    @override_settings(NOTIFICATION_RETENTION_DAYS={"SYSTEM": 1})
+    def test_can_skip_archive(self):
+        self._notif(NotificationTypeChoices.SYSTEM, 2)
+        stats = purge_notifications(now=self.now, archive=False, analyze=False)
+        self.assertEqual((stats["deleted"], stats["archived"]), (1, 0))
+        self.assertFalse(NotificationArchive.objects.exists())
+
+
+class StaffRecipientsTests(TestCase):
+    def test_staff_changes_are_seen_immediately(self):
+        staff = User.objects.create_user(username="staff", password="x", is_staff=True)
+        other = User.objects.create_user(username="autre", password="x", is_staff=True)
+        User.objects.create_user(username="client", password="x")
+        self.assertEqual(get_staff_recipient_ids(), [staff.pk, other.pk])
+
+        User.objects.filter(pk=staff.pk).update(is_active=False)  # sans signal (autre worker, update())
+        User.objects.filter(pk=other.pk).update(is_staff=False)
+        newcomer = User.objects.create_user(username="nouveau", password="x", is_staff=True)
+        with self.assertNumQueries(1):
+            self.assertEqual(get_staff_recipient_ids(), [newcomer.pk])
+
+    def test_fan_out_inserts_in_batches_and_pushes_each_batch(self):
+        recipients = [User.objects.create_user(username=f"staff{i}", password="x", is_staff=True) for i in range(5)]
+        ids = [user.pk for user in recipients]
+
+        with mock.patch("apps.notifications.services.push_new_notifications") as push, \
+                CaptureQueriesContext(connection) as queries:
+            created = fan_out_notifications(ids, title="Nouvelle demande", message="Réservation #1", batch_size=2)
+
+        self.assertEqual(created, 5)
+        self.assertEqual(sum(q["sql"].startswith("INSERT") for q in queries.captured_queries), 3)
+        self.assertEqual(
+            sorted(Notification.objects.values_list("user_id", flat=True)), sorted(ids),
+        )
+        self.assertEqual(
+            [[n.user_id for n in call.args[0]] for call in push.call_args_list],
+            [ids[:2], ids[2:4], ids[4:]],
+        )
+
+
+class ChatNotificationCoalescingTests(TestCase):
+    def setUp(self):
+        self.client_user = User.objects.create_user(username="client", email="c@example.com", password="x")
+        self.staff = [
+            User.objects.create_user(username=f"staff{i}", email=f"s{i}@example.com", password="x", is_staff=True)
+            for i in range(3)
+        ]
+        self.conversation = Conversation.objects.create(user=self.client_user)
+
+    def _send(self, sender, content):
+        notify_new_chat_message(Message.objects.create(conversation=self.conversation, sender=sender, content=content))
+
+    def test_unread_notification_is_updated_instead_of_duplicated(self):
+        self._send(self.client_user, "Bonjour")
+        message = Message.objects.create(conversation=self.conversation, sender=self.client_user, content="Encore")
+        with self.assertNumQueries(3):  # destinataires staff, notifications en attente, un seul UPDATE
+            notify_new_chat_message(message)
+
+        self._send(self.client_user, "Dernier message")
+        notifications = Notification.objects.filter(notification_type=NotificationTypeChoices.MESSAGE_RECEIVED)
+        self.assertEqual(notifications.count(), 3)  # une par membre du staff
+        for notif in notifications:
+            self.assertEqual(notif.occurrences, 3)
+            self.assertEqual(notif.message, "Dernier message")
+
+        # Une fois lue, la suivante crée une nouvelle notification
+        mark_all_notifications_as_read(self.staff[0])
+        self._send(self.client_user, "Nouveau sujet")
+        self.assertEqual(Notification.objects.filter(user=self.staff[0]).count(), 2)
+        self.assertEqual(Notification.objects.get(user=self.staff[1]).occurrences, 4)
+
+    def test_staff_reply_coalesces_for_the_client(self):
+        for content in ("Réponse 1", "Réponse 2"):
+            self._send(self.staff[0], content)
+        notif = Notification.objects.get(user=self.client_user)
+        self.assertEqual((notif.occurrences, notif.message), (2, "Réponse 2"))
@@ -48,11 +48,16 @@ class Payment(models.Model):
         blank=True,
     )
     created_at = models.DateTimeField("Créé le", auto_now_add=True)
+    # Paiements modifiés depuis le dernier calcul (statistiques matériel, refresh_equipment_stats)
+    updated_at = models.DateTimeField("Modifié le", auto_now=True)
 
     class Meta:
         verbose_name = "Paiement"
         verbose_name_plural = "Paiements"
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['updated_at'], name='payment_updated_at_idx'),
+        ]
 
     def __str__(self):
         return f"Paiement #{self.id} - {self.amount} - {self.get_status_display()}"
\ No newline at end of file
@@ -0,0 +1,19 @@
+# Generated by Django 5.0.3 on 2026-10-19 16:25
+
+import apps.core.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('services_app', '0008_alter_jobapplication_status_and_more'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='jobapplication',
+            name='cv',
+            field=models.FileField(storage=apps.core.storage.get_private_storage, upload_to='job_applications/cv/', verbose_name='CV (PDF)'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.0.3 on 2026-10-19 16:27
+
+import apps.core.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('services_app', '0009_private_document_storage'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='training',
+            name='brochure',
+            field=models.FileField(blank=True, null=True, storage=apps.core.storage.get_cas_storage, upload_to='training_brochures/', verbose_name='Brochure PDF'),
+        ),
+    ]
@@ -1,6 +1,8 @@
 from django.db import models
 from django.conf import settings
 
+from apps.core.storage import get_cas_storage, get_private_storage
+
 User = settings.AUTH_USER_MODEL
 
 
@@ -245,7 +247,9 @@ class Training(models.Model):
 
     # MÉDIA & STATUT
     image = models.ImageField("Image / visuel", upload_to='trainings/', blank=True, null=True)
-    brochure = models.FileField("Brochure PDF", upload_to='training_brochures/', blank=True, null=True)
+    brochure = models.FileField(
+        "Brochure PDF", upload_to='training_brochures/', storage=get_cas_storage, blank=True, null=True
+    )
     is_active = models.BooleanField("Active", default=True)
 
     # MÉTADONNÉES
@@ -438,7 +442,7 @@ class JobApplication(models.Model):
     email = models.EmailField("Email")
     phone = models.CharField("Téléphone", max_length=50, blank=True)
 
-    cv = models.FileField("CV (PDF)", upload_to="job_applications/cv/")
+    cv = models.FileField("CV (PDF)", upload_to="job_applications/cv/", storage=get_private_storage)
     cover_letter = models.TextField("Message / lettre", blank=True)
     portfolio_url = models.URLField("Portfolio / LinkedIn", blank=True)
 
@@ -181,12 +181,14 @@ def user_jobs_detail_view(request, slug):
 #     return render(request, "user/jobs/apply.html", {"offer": offer, "form": form})
 
 
-from django.core.mail import EmailMultiAlternatives
 from django.conf import settings
 from django.contrib import messages
+from django.db import transaction
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 
+from apps.notifications.outbox import queue_email
+
 @login_required
 def user_jobs_apply_view(request, slug):
     offer = get_object_or_404(JobOffer, slug=slug, status=JobOfferStatusChoices.PUBLISHED)
@@ -207,39 +209,27 @@ def user_jobs_apply_view(request, slug):
     if request.method == "POST":
         form = JobApplicationForm(request.POST, request.FILES)
         if form.is_valid():
-            app = form.save(commit=False)
-            app.user = request.user
-            app.offer = offer
-            app.save()
-
             subject = "Confirmation de candidature - Oloustream"
-            to_email = app.email
-
-            text_body = (
-                f"Bonjour {app.full_name},\n\n"
-                f"Nous confirmons la réception de votre candidature pour : {offer.title}.\n"
-                f"Notre équipe reviendra vers vous si votre profil correspond.\n\n"
-                f"Merci,\nOloustream\n"
-                f"www.oloustream.com"
-            )
-
-            try:
-                msg = EmailMultiAlternatives(
-                    subject=subject,
-                    body=text_body,
-                    from_email=settings.DEFAULT_FROM_EMAIL,
-                    to=[to_email],
+
+            # Candidature et email de confirmation (file d'attente) dans la même transaction
+            with transaction.atomic():
+                app = form.save(commit=False)
+                app.user = request.user
+                app.offer = offer
+                app.save()
+
+                text_body = (
+                    f"Bonjour {app.full_name},\n\n"
+                    f"Nous confirmons la réception de votre candidature pour : {offer.title}.\n"
+                    f"Notre équipe reviendra vers vous si votre profil correspond.\n\n"
+                    f"Merci,\nOloustream\n"
+                    f"www.oloustream.com"
                 )
-                # Si tu veux envoyer une version HTML, décommente les lignes suivantes :
-                # html_body = render_to_string("emails/job_application_confirmation.html", {
-                #     "full_name": app.full_name,
-                #     "offer": offer,
-                # })
-                # msg.attach_alternative(html_body, "text/html")
-                msg.send(fail_silently=False)
-                messages.success(request, "Votre candidature a bien été envoyée. Un email de confirmation vous a été adressé.")
-            except Exception as e:
-                messages.warning(request, "Votre candidature a été enregistrée, mais une erreur est survenue lors de l'envoi de l'email de confirmation.")
+                # Si tu veux envoyer une version HTML, passe html_body=render_to_string(
+                #     "emails/job_application_confirmation.html", {"full_name": app.full_name, "offer": offer})
+                queue_email(subject, text_body, [app.email])
+
+            messages.success(request, "Votre candidature a bien été envoyée. Un email de confirmation vous a été adressé.")
 
             return redirect("services_app:user_jobs_detail", slug=offer.slug)
     else:
@@ -7,6 +7,7 @@ from .models import (
     EquipmentCategory,
     Equipment,
     EquipmentUsageHistory,
+    EquipmentDailyStat,
     Reservation,
     ReservationStatusHistory,
 )
@@ -104,12 +105,20 @@ class EquipmentAdmin(admin.ModelAdmin):
 
 @admin.register(EquipmentUsageHistory)
 class EquipmentUsageHistoryAdmin(admin.ModelAdmin):
-    list_display = ("equipment", "start_datetime", "end_datetime", "used_by")
+    list_display = ("equipment", "start_datetime", "due_datetime", "end_datetime", "used_by")
     list_filter = ("equipment", "used_by")
     search_fields = ("equipment__name", "used_by__username")
     date_hierarchy = "start_datetime"
 
 
+@admin.register(EquipmentDailyStat)
+class EquipmentDailyStatAdmin(admin.ModelAdmin):
+    list_display = ("equipment", "day", "hours_used", "reservations_count", "revenue", "computed_at")
+    list_filter = ("equipment__category",)
+    search_fields = ("equipment__name",)
+    date_hierarchy = "day"
+
+
 class ReservationStatusHistoryInline(admin.TabularInline):
     model = ReservationStatusHistory
     extra = 0
@@ -0,0 +1,445 @@
+# apps/studio/analytics.py
+"""
+Statistiques d'occupation des studios (aide aux décisions tarifaires).
+
+Les colonnes utiles sont chargées avec values_list() puis converties en
+tableaux NumPy : le découpage par jour de semaine × heure et les
+distributions de délai de réservation sont calculés de façon vectorisée,
+sans instancier de modèles Django.
+
+Utilisation / rentabilité du matériel : agrégats journaliers stockés dans
+EquipmentDailyStat (recalcul incrémental), fenêtres glissantes lues depuis
+cette seule table.
+"""
+from collections import Counter, defaultdict
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+import numpy as np
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Max, Min, Q, Sum
+from django.utils import timezone
+
+from .choices import EquipmentStatus, ReservationStatus
+from .models import Equipment, EquipmentDailyStat, EquipmentUsageHistory, Reservation, Studio
+
+WEEKDAY_LABELS = ["Lundi", "Mardi", "Mercredi", "Jeudi", "Vendredi", "Samedi", "Dimanche"]
+
+# Réservations réellement occupées (utilisées pour le taux d'occupation)
+OCCUPANCY_STATUSES = (ReservationStatus.CONFIRMED, ReservationStatus.COMPLETED)
+
+# Bornes (en jours) de l'histogramme du délai création -> début
+LEAD_TIME_BINS_DAYS = [0, 1, 2, 3, 7, 14, 30, 60, 90, 180, 365]
+
+ANALYTICS_CACHE_TIMEOUT = 15 * 60
+
+_HOUR = 3600
+_SLOTS_PER_WEEK = 7 * 24
+# 01/01/1970 était un jeudi (lundi = 0)
+_EPOCH_WEEKDAY = 3
+
+
+def _to_seconds(values):
+    """
+    Convertit une liste de datetimes aware en secondes depuis l'epoch (float64).
+    """
+    return np.fromiter((v.timestamp() for v in values), dtype=np.float64, count=len(values))
+
+
+def _hour_slots(starts, ends):
+    """
+    Découpe chaque intervalle [start, end[ (en secondes) en tranches horaires.
+    Retourne (indice de l'intervalle, indice d'heure absolu, secondes occupées).
+    """
+    first_hour = np.floor(starts / _HOUR).astype(np.int64)
+    last_hour = np.ceil(ends / _HOUR).astype(np.int64)
+    counts = np.maximum(last_hour - first_hour, 0)
+
+    rows = np.repeat(np.arange(len(starts)), counts)
+    offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    hours = first_hour[rows] + offsets
+
+    occupied = (
+        np.minimum(ends[rows], (hours + 1) * _HOUR)
+        - np.maximum(starts[rows], hours * _HOUR)
+    )
+    return rows, hours, occupied
+
+
+def _week_slot(hours):
+    """Indice jour de semaine × heure (0..167) d'une heure absolue."""
+    weekday = (hours // 24 + _EPOCH_WEEKDAY) % 7
+    return weekday * 24 + hours % 24
+
+
+def _lead_time_summary(lead_days):
+    edges = LEAD_TIME_BINS_DAYS + [np.inf]
+    counts, _ = np.histogram(lead_days, bins=edges)
+    if len(lead_days):
+        mean, median, p90 = (
+            float(np.mean(lead_days)),
+            float(np.median(lead_days)),
+            float(np.percentile(lead_days, 90)),
+        )
+    else:
+        mean = median = p90 = None
+    return {
+        "bins_days": LEAD_TIME_BINS_DAYS,
+        "counts": counts.tolist(),
+        "mean_days": mean,
+        "median_days": median,
+        "p90_days": p90,
+    }
+
+
+def compute_studio_occupancy(date_from, date_to, studio_id=None, statuses=OCCUPANCY_STATUSES):
+    """
+    Heatmap d'occupation (jour de semaine × heure) et distribution des délais
+    de réservation (created_at -> start_datetime) par studio, sur [date_from, date_to].
+
+    - heatmap_hours : heures occupées cumulées par case (7 × 24)
+    - occupancy_rate : heures occupées / heures disponibles de la case sur la période
+    Les heures sont exprimées dans le fuseau courant (décalage du début de période).
+    """
+    tz = timezone.get_current_timezone()
+    window_start = timezone.make_aware(datetime.combine(date_from, time.min), tz)
+    window_end = timezone.make_aware(datetime.combine(date_to + timedelta(days=1), time.min), tz)
+    utc_offset = window_start.utcoffset().total_seconds()
+
+    studios_qs = Studio.objects.order_by("name")
+    if studio_id:
+        studios_qs = studios_qs.filter(pk=studio_id)
+    studios = list(studios_qs.values_list("id", "name"))
+    position = {pk: i for i, (pk, _) in enumerate(studios)}
+
+    rows_qs = Reservation.objects.filter(
+        studio__isnull=False,
+        status__in=statuses,
+        start_datetime__lt=window_end,
+        end_datetime__gt=window_start,
+    )
+    if studio_id:
+        rows_qs = rows_qs.filter(studio_id=studio_id)
+    columns = list(zip(*rows_qs.values_list("studio_id", "start_datetime", "end_datetime", "created_at")))
+    studio_col, start_col, end_col, created_col = columns or ([], [], [], [])
+
+    n_studios = len(studios)
+    studio_pos = np.fromiter(
+        (position.get(pk, -1) for pk in studio_col), dtype=np.int64, count=len(studio_col)
+    )
+    starts = _to_seconds(start_col)
+    ends = _to_seconds(end_col)
+    created = _to_seconds(created_col)
+
+    # Studios supprimés entre-temps / hors filtre
+    known = studio_pos >= 0
+    studio_pos, starts, ends, created = studio_pos[known], starts[known], ends[known], created[known]
+
+    # --- Heatmap : découpage horaire vectorisé des intervalles bornés à la fenêtre ---
+    w_start = window_start.timestamp()
+    w_end = window_end.timestamp()
+    clipped_starts = np.clip(starts, w_start, w_end) + utc_offset
+    clipped_ends = np.clip(ends, w_start, w_end) + utc_offset
+
+    rows, hours, occupied = _hour_slots(clipped_starts, clipped_ends)
+    bins = studio_pos[rows] * _SLOTS_PER_WEEK + _week_slot(hours)
+    occupied_hours = np.bincount(
+        bins, weights=occupied / _HOUR, minlength=n_studios * _SLOTS_PER_WEEK
+    ).reshape(n_studios, 7, 24)
+
+    # Nombre d'heures "disponibles" de chaque case sur la période
+    window_hours = np.arange(
+        int((w_start + utc_offset) // _HOUR), int((w_end + utc_offset) // _HOUR), dtype=np.int64
+    )
+    available_hours = np.bincount(
+        _week_slot(window_hours), minlength=_SLOTS_PER_WEEK
+    ).reshape(7, 24).astype(np.float64)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        occupancy_rate = np.where(available_hours > 0, occupied_hours / available_hours, 0.0)
+
+    # --- Délais de réservation (jours) ---
+    lead_days = np.maximum(starts - created, 0) / 86400.0
+    reservations_count = np.bincount(studio_pos, minlength=n_studios)
+
+    results = []
+    for i, (pk, name) in enumerate(studios):
+        mask = studio_pos == i
+        results.append({
+            "id": pk,
+            "name": name,
+            "reservations": int(reservations_count[i]),
+            "occupied_hours": round(float(occupied_hours[i].sum()), 2),
+            "heatmap_hours": np.round(occupied_hours[i], 2).tolist(),
+            "occupancy_rate": np.round(occupancy_rate[i], 4).tolist(),
+            "lead_time": _lead_time_summary(lead_days[mask]),
+        })
+
+    # Cases absentes de la fenêtre (période < 7 jours) : 0 plutôt que NaN (JSON invalide)
+    total_available = available_hours * n_studios
+    with np.errstate(divide="ignore", invalid="ignore"):
+        total_rate = np.where(total_available > 0, occupied_hours.sum(axis=0) / total_available, 0.0)
+    return {
+        "window": {"from": date_from.isoformat(), "to": date_to.isoformat()},
+        "weekdays": WEEKDAY_LABELS,
+        "hours": list(range(24)),
+        "studios": results,
+        "all": {
+            "reservations": int(len(starts)),
+            "heatmap_hours": np.round(occupied_hours.sum(axis=0), 2).tolist(),
+            "occupancy_rate": np.round(total_rate, 4).tolist(),
+            "lead_time": _lead_time_summary(lead_days),
+        },
+    }
+
+
+def get_studio_occupancy(date_from, date_to, studio_id=None):
+    """
+    Version mise en cache de compute_studio_occupancy(), par fenêtre (et studio).
+    """
+    key = f"studio_occupancy:{date_from.isoformat()}:{date_to.isoformat()}:{studio_id or 'all'}"
+    data = cache.get(key)
+    if data is None:
+        data = compute_studio_occupancy(date_from, date_to, studio_id=studio_id)
+        cache.set(key, data, ANALYTICS_CACHE_TIMEOUT)
+    return data
+
+
+# ==== UTILISATION & RENTABILITÉ DU MATÉRIEL ==== #
+
+# Réservations prises en compte (nombre et revenus attribués)
+UTILIZATION_RESERVATION_STATUSES = (ReservationStatus.CONFIRMED, ReservationStatus.COMPLETED)
+
+UTILIZATION_WINDOWS_DAYS = (7, 30, 90, 365)
+
+# Fenêtre recalculée par défaut à chaque passage du job (hier + aujourd'hui)
+UTILIZATION_REFRESH_DAYS = 2
+
+# Marge sur la date du dernier calcul : paiements modifiés pendant un passage du job
+UTILIZATION_PAYMENT_OVERLAP = timedelta(minutes=15)
+
+
+def _local_midnight(day, tz):
+    return timezone.make_aware(datetime.combine(day, time.min), tz)
+
+
+def _split_by_day(start, end, tz):
+    """
+    Découpe [start, end[ par jour local. Retourne [(jour, secondes)].
+    """
+    parts = []
+    cursor = timezone.localtime(start, tz)
+    end = timezone.localtime(end, tz)
+    while cursor < end:
+        next_midnight = _local_midnight(cursor.date() + timedelta(days=1), tz)
+        slice_end = min(end, next_midnight)
+        parts.append((cursor.date(), (slice_end - cursor).total_seconds()))
+        cursor = slice_end
+    return parts
+
+
+def get_utilization_data_start():
+    """
+    Premier jour couvert par l'historique d'utilisation ou les réservations de matériel.
+    """
+    first_usage = EquipmentUsageHistory.objects.aggregate(v=Min("start_datetime"))["v"]
+    first_reservation = (
+        Reservation.equipments.through.objects.aggregate(v=Min("reservation__start_datetime"))["v"]
+    )
+    candidates = [timezone.localdate(v) for v in (first_usage, first_reservation) if v]
+    return min(candidates) if candidates else None
+
+
+def get_last_utilization_refresh():
+    """Date du dernier calcul des statistiques matériel (None si jamais calculées)."""
+    return EquipmentDailyStat.objects.aggregate(v=Max("computed_at"))["v"]
+
+
+def get_days_with_payment_changes(since):
+    """
+    Jours (locaux) de début des réservations avec matériel dont un paiement a été
+    créé ou modifié depuis `since` : leurs revenus sont à recalculer, même anciens.
+    Les modifications par queryset.update() (sans updated_at) ne sont pas vues.
+    """
+    tz = timezone.get_current_timezone()
+    starts = (
+        Reservation.objects
+        .filter(payments__updated_at__gte=since, equipments__isnull=False)
+        .values_list("start_datetime", flat=True)
+        .distinct()
+    )
+    return {timezone.localdate(start, tz) for start in starts}
+
+
+def refresh_equipment_daily_stats(date_from, date_to):
+    """
+    Recalcule les lignes EquipmentDailyStat de la période [date_from, date_to] :
+
+    - heures d'utilisation : historique d'utilisation découpé par jour (sorties en cours
+      comptées jusqu'à maintenant),
+    - réservations (confirmées / terminées) comptées au jour de début,
+    - revenus : paiements PAID de la réservation, répartis à parts égales entre
+      ses équipements.
+
+    Trois requêtes de lecture, puis suppression + insertion en masse de la période.
+    Retourne le nombre de lignes écrites.
+    """
+    from apps.payments.models import Payment, PaymentStatus
+
+    tz = timezone.get_current_timezone()
+    window_start = _local_midnight(date_from, tz)
+    window_end = _local_midnight(date_to + timedelta(days=1), tz)
+    now = timezone.now()
+
+    hours = defaultdict(float)
+    reservations = defaultdict(int)
+    revenue = defaultdict(Decimal)
+
+    # --- Heures d'utilisation ---
+    usages = (
+        EquipmentUsageHistory.objects
+        .filter(start_datetime__lt=window_end)
+        .filter(Q(end_datetime__gt=window_start) | Q(end_datetime__isnull=True))
+        .values_list("equipment_id", "start_datetime", "end_datetime")
+    )
+    for equipment_id, start, end in usages:
+        start = max(start, window_start)
+        end = min(end or now, window_end)
+        for day, seconds in _split_by_day(start, end, tz):
+            hours[(equipment_id, day)] += seconds / 3600
+
+    # --- Réservations & revenus ---
+    links = list(
+        Reservation.equipments.through.objects
+        .filter(
+            reservation__start_datetime__gte=window_start,
+            reservation__start_datetime__lt=window_end,
+            reservation__status__in=UTILIZATION_RESERVATION_STATUSES,
+        )
+        .values_list("equipment_id", "reservation_id", "reservation__start_datetime")
+    )
+    equipments_per_reservation = Counter(reservation_id for _, reservation_id, _ in links)
+    paid = dict(
+        Payment.objects
+        .filter(status=PaymentStatus.PAID, reservation_id__in=list(equipments_per_reservation))
+        .values("reservation_id")
+        .annotate(total=Sum("amount"))
+        .values_list("reservation_id", "total")
+    )
+    for equipment_id, reservation_id, start in links:
+        key = (equipment_id, timezone.localdate(start, tz))
+        reservations[key] += 1
+        if reservation_id in paid:
+            revenue[key] += paid[reservation_id] / equipments_per_reservation[reservation_id]
+
+    cent = Decimal("0.01")
+    rows = [
+        EquipmentDailyStat(
+            equipment_id=equipment_id,
+            day=day,
+            hours_used=Decimal(str(round(min(hours.get((equipment_id, day), 0.0), 24.0), 2))),
+            reservations_count=reservations.get((equipment_id, day), 0),
+            revenue=revenue.get((equipment_id, day), Decimal(0)).quantize(cent),
+        )
+        for equipment_id, day in set(hours) | set(reservations)
+    ]
+
+    with transaction.atomic():
+        EquipmentDailyStat.objects.filter(day__range=(date_from, date_to)).delete()
+        EquipmentDailyStat.objects.bulk_create(rows, batch_size=1000)
+    return len(rows)
+
+
+def _roi(revenue, price):
+    return round(float(revenue / price * 100), 1) if price else None
+
+
+def get_equipment_utilization(window_days=30, today=None):
+    """
+    Utilisation et rentabilité par équipement et par catégorie sur les `window_days`
+    derniers jours, lues uniquement depuis EquipmentDailyStat (une agrégation).
+
+    - idle_days : jours de la fenêtre (depuis l'achat / la création) sans utilisation
+      ni réservation,
+    - roi_percent : revenus de la fenêtre / prix d'achat.
+    """
+    today = today or timezone.localdate()
+    date_from = today - timedelta(days=window_days - 1)
+    tz = timezone.get_current_timezone()
+
+    active = Q(hours_used__gt=0) | Q(reservations_count__gt=0)
+    stats = {
+        row["equipment_id"]: row
+        for row in (
+            EquipmentDailyStat.objects
+            .filter(day__range=(date_from, today))
+            .values("equipment_id")
+            .annotate(
+                hours=Sum("hours_used"),
+                reservations=Sum("reservations_count"),
+                revenue=Sum("revenue"),
+                active_days=Count("id", filter=active),
+                computed_at=Max("computed_at"),
+            )
+        )
+    }
+
+    equipments = []
+    categories = {}
+    for eq in (
+        Equipment.objects
+        .exclude(status=EquipmentStatus.RETIRED)
+        .values("id", "name", "category_id", "category__name", "purchase_price", "purchase_date", "created_at")
+    ):
+        row = stats.get(eq["id"], {})
+        since = max(date_from, eq["purchase_date"] or timezone.localdate(eq["created_at"], tz))
+        days = max((today - since).days + 1, 0)
+        hours_used = float(row.get("hours") or 0)
+        revenue = row.get("revenue") or Decimal(0)
+        item = {
+            "id": eq["id"],
+            "name": eq["name"],
+            "category": eq["category__name"] or "Sans catégorie",
+            "hours_used": round(hours_used, 2),
+            "reservations": row.get("reservations") or 0,
+            "idle_days": max(days - (row.get("active_days") or 0), 0),
+            "days": days,
+            "revenue": revenue,
+            "purchase_price": eq["purchase_price"],
+            "roi_percent": _roi(revenue, eq["purchase_price"]),
+        }
+        equipments.append(item)
+
+        cat = categories.setdefault(item["category"], {
+            "name": item["category"],
+            "equipments": 0,
+            "hours_used": 0.0,
+            "reservations": 0,
+            "idle_days": 0,
+            "days": 0,
+            "revenue": Decimal(0),
+            "purchase_price": Decimal(0),
+        })
+        cat["equipments"] += 1
+        cat["hours_used"] += hours_used
+        cat["reservations"] += item["reservations"]
+        cat["idle_days"] += item["idle_days"]
+        cat["days"] += days
+        cat["revenue"] += revenue
+        cat["purchase_price"] += eq["purchase_price"] or 0
+
+    for cat in categories.values():
+        cat["hours_used"] = round(cat["hours_used"], 2)
+        cat["idle_rate"] = round(cat["idle_days"] / cat["days"] * 100, 1) if cat["days"] else None
+        cat["roi_percent"] = _roi(cat["revenue"], cat["purchase_price"])
+
+    equipments.sort(key=lambda e: (-e["revenue"], -e["hours_used"], e["name"]))
+    computed = [row["computed_at"] for row in stats.values() if row["computed_at"]]
+    return {
+        "window_days": window_days,
+        "from": date_from,
+        "to": today,
+        "equipments": equipments,
+        "categories": sorted(categories.values(), key=lambda c: (-c["revenue"], c["name"])),
+        "last_computed_at": max(computed) if computed else None,
+    }
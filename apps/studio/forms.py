@@ -2,6 +2,7 @@
 from datetime import datetime
 
 from django import forms
+from django.contrib.auth import get_user_model
 from django.core.exceptions import ValidationError
 from django.utils import timezone
 
@@ -44,6 +45,69 @@ class EquipmentForm(forms.ModelForm):
         }
 
 
+class EquipmentCheckoutForm(forms.Form):
+    """
+    Sortie de matériel (dashboard) : à qui, jusqu'à quand.
+    """
+    user = forms.ModelChoiceField(
+        label="Utilisateur",
+        queryset=get_user_model().objects.filter(is_active=True).order_by("first_name", "last_name", "username"),
+    )
+    due_datetime = forms.DateTimeField(
+        label="Retour prévu",
+        required=False,
+        widget=forms.DateTimeInput(attrs={"type": "datetime-local"}),
+    )
+    notes = forms.CharField(
+        label="Notes",
+        required=False,
+        widget=forms.Textarea(attrs={"rows": 2}),
+    )
+
+
+class EquipmentBatchCheckoutForm(EquipmentCheckoutForm):
+    """
+    Sortie d'un kit complet en une seule opération.
+    """
+    equipments = forms.ModelMultipleChoiceField(
+        label="Équipements",
+        queryset=Equipment.objects.all(),
+    )
+
+
+class EquipmentCheckinForm(forms.Form):
+    notes = forms.CharField(
+        label="Notes de retour",
+        required=False,
+        widget=forms.Textarea(attrs={"rows": 2}),
+    )
+
+
+class EquipmentBatchCheckinForm(EquipmentCheckinForm):
+    equipments = forms.ModelMultipleChoiceField(
+        label="Équipements",
+        queryset=Equipment.objects.all(),
+    )
+
+
+class EquipmentImportForm(forms.Form):
+    file = forms.FileField(
+        label="Fichier d'inventaire (.xlsx ou .csv)",
+        help_text="Mêmes colonnes que l'export Excel ; la colonne « Nom » est obligatoire.",
+    )
+    create_categories = forms.BooleanField(
+        label="Créer les catégories manquantes",
+        required=False,
+        initial=True,
+    )
+
+    def clean_file(self):
+        f = self.cleaned_data["file"]
+        if not f.name.lower().endswith((".xlsx", ".csv")):
+            raise ValidationError("Format non supporté : utilisez un fichier .xlsx ou .csv.")
+        return f
+
+
 class ReservationAdminForm(forms.ModelForm):
     class Meta:
         model = Reservation
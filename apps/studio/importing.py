@@ -0,0 +1,345 @@
+# apps/studio/importing.py
+"""
+Import en masse de l'inventaire matériel depuis un fichier XLSX ou CSV.
+
+- lecture en flux (openpyxl en mode read_only, csv ligne à ligne),
+- validation par lots de IMPORT_CHUNK_SIZE lignes,
+- catégories résolues par nom avec un seul préchargement,
+- upsert par numéro de série : lecture des existants puis bulk_update / bulk_create
+  (bulk_create(update_conflicts=True) n'accepte pas unique_fields sous MySQL),
+- rapport d'erreurs ligne par ligne.
+"""
+import codecs
+import csv
+import io
+import unicodedata
+from datetime import date, datetime
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+
+from django.db import transaction
+from django.utils.dateparse import parse_date
+from openpyxl import load_workbook
+
+from .choices import EquipmentStatus
+from .models import Equipment, EquipmentCategory
+
+IMPORT_CHUNK_SIZE = 500
+IMPORT_MAX_ERRORS = 1000
+
+# Encodages CSV essayés dans l'ordre : UTF-8 (avec ou sans BOM), puis l'export
+# Excel Windows habituel
+CSV_ENCODINGS = ("utf-8-sig", "cp1252")
+
+# En-têtes acceptés (normalisés) -> champ du modèle.
+# Compatible avec le fichier produit par equipment_export_excel_view.
+HEADER_ALIASES = {
+    "nom": "name",
+    "name": "name",
+    "categorie": "category",
+    "category": "category",
+    "marque": "brand",
+    "brand": "brand",
+    "modele": "model",
+    "model": "model",
+    "n de serie": "serial_number",
+    "numero de serie": "serial_number",
+    "serial_number": "serial_number",
+    "serial": "serial_number",
+    "statut": "status",
+    "status": "status",
+    "disponible a la location": "is_available_for_rent",
+    "is_available_for_rent": "is_available_for_rent",
+    "emplacement": "location",
+    "location": "location",
+    "date d'achat": "purchase_date",
+    "purchase_date": "purchase_date",
+    "prix d'achat": "purchase_price",
+    "purchase_price": "purchase_price",
+    "derniere maintenance": "last_maintenance_date",
+    "last_maintenance_date": "last_maintenance_date",
+    "prochaine maintenance": "next_maintenance_date",
+    "next_maintenance_date": "next_maintenance_date",
+    "specifications techniques": "technical_specs",
+    "technical_specs": "technical_specs",
+    "accessoires inclus": "accessories_included",
+    "accessories_included": "accessories_included",
+    "notes importantes": "important_notes",
+    "important_notes": "important_notes",
+}
+
+DATE_FIELDS = ("purchase_date", "last_maintenance_date", "next_maintenance_date")
+
+_TRUE_VALUES = {"oui", "yes", "true", "vrai", "1", "x"}
+_FALSE_VALUES = {"non", "no", "false", "faux", "0", ""}
+
+_STATUS_LOOKUP = {}
+for _value, _label in EquipmentStatus.choices:
+    _STATUS_LOOKUP[_value.lower()] = _value
+    _STATUS_LOOKUP[_label.lower()] = _value
+
+
+class ImportFileError(Exception):
+    """Fichier illisible ou sans colonne exploitable."""
+
+
+def _normalize(text):
+    text = str(text or "").replace("’", "'")
+    text = unicodedata.normalize("NFKD", text).encode("ascii", "ignore").decode()
+    return " ".join(text.lower().split())
+
+
+def _detect_csv_encoding(raw):
+    """
+    Premier encodage de CSV_ENCODINGS qui décode tout le fichier, lu par blocs
+    (rien n'est gardé en mémoire). Le fichier est rembobiné.
+    """
+    try:
+        for encoding in CSV_ENCODINGS:
+            raw.seek(0)
+            decoder = codecs.getincrementaldecoder(encoding)()
+            try:
+                for block in iter(lambda: raw.read(64 * 1024), b""):
+                    decoder.decode(block)
+                decoder.decode(b"", final=True)
+            except UnicodeDecodeError:
+                continue
+            return encoding
+    finally:
+        raw.seek(0)
+    raise ImportFileError(
+        "Encodage du fichier CSV non reconnu : enregistrez-le en « CSV UTF-8 »."
+    )
+
+
+def iter_uploaded_rows(uploaded_file):
+    """
+    Itère les lignes (tuples de valeurs) d'un fichier XLSX ou CSV sans le charger en mémoire.
+    """
+    name = (uploaded_file.name or "").lower()
+    uploaded_file.seek(0)
+
+    if name.endswith(".xlsx"):
+        try:
+            workbook = load_workbook(uploaded_file, read_only=True, data_only=True)
+        except Exception as e:
+            raise ImportFileError(f"Fichier Excel illisible : {e}")
+        try:
+            yield from workbook.active.iter_rows(values_only=True)
+        finally:
+            workbook.close()
+
+    elif name.endswith(".csv"):
+        raw = getattr(uploaded_file, "file", uploaded_file)
+        stream = io.TextIOWrapper(raw, encoding=_detect_csv_encoding(raw), newline="")
+        try:
+            sample = stream.read(4096)
+            stream.seek(0)
+            try:
+                dialect = csv.Sniffer().sniff(sample, delimiters=";,\t")
+            except csv.Error:
+                dialect = csv.excel
+            yield from csv.reader(stream, dialect)
+        finally:
+            stream.detach()
+
+    else:
+        raise ImportFileError("Format non supporté : utilisez un fichier .xlsx ou .csv.")
+
+
+def _map_headers(header_row):
+    mapping = {}
+    for index, header in enumerate(header_row or ()):
+        field = HEADER_ALIASES.get(_normalize(header))
+        if field and field not in mapping.values():
+            mapping[index] = field
+    if "name" not in mapping.values():
+        raise ImportFileError("Colonne « Nom » introuvable dans l'en-tête.")
+    return mapping
+
+
+def _clean_date(value):
+    if value in (None, ""):
+        return None
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    text = str(value).strip()
+    for fmt in ("%d/%m/%Y", "%d-%m-%Y"):
+        try:
+            return datetime.strptime(text, fmt).date()
+        except ValueError:
+            pass
+    parsed = parse_date(text)
+    if parsed is None:
+        raise ValueError(f"date invalide « {text} »")
+    return parsed
+
+
+def _clean_price(value):
+    if value in (None, ""):
+        return None
+    text = str(value).replace(" ", "").replace(" ", "").replace(",", ".")
+    try:
+        price = Decimal(text).quantize(Decimal("0.01"))
+    except InvalidOperation:
+        raise ValueError(f"prix invalide « {value} »")
+    if price < 0:
+        raise ValueError("prix négatif")
+    return price
+
+
+def _clean_bool(value):
+    if isinstance(value, bool):
+        return value
+    text = _normalize(value)
+    if text in _TRUE_VALUES:
+        return True
+    if text in _FALSE_VALUES:
+        return False
+    raise ValueError(f"valeur oui/non invalide « {value} »")
+
+
+def _clean_row(raw, mapping):
+    """
+    Retourne (valeurs nettoyées, nom de catégorie, erreurs) pour une ligne.
+    """
+    values, errors = {}, []
+    category_name = None
+
+    for index, field in mapping.items():
+        value = raw[index] if index < len(raw) else None
+        try:
+            if field == "category":
+                category_name = str(value).strip() if value not in (None, "") else None
+            elif field == "serial_number":
+                values[field] = str(value).strip() if value is not None else ""
+                values[field] = values[field] or None
+            elif field == "status":
+                # Cellule vide : statut actuel conservé (défaut du modèle à la création)
+                if value not in (None, ""):
+                    status = _STATUS_LOOKUP.get(str(value).strip().lower())
+                    if status is None:
+                        raise ValueError(f"statut inconnu « {value} »")
+                    values[field] = status
+            elif field == "is_available_for_rent":
+                values[field] = _clean_bool(value)
+            elif field == "purchase_price":
+                values[field] = _clean_price(value)
+            elif field in DATE_FIELDS:
+                values[field] = _clean_date(value)
+            else:
+                text = "" if value is None else str(value).strip()
+                max_length = getattr(Equipment._meta.get_field(field), "max_length", None)
+                if max_length and len(text) > max_length:
+                    raise ValueError(f"{field} dépasse {max_length} caractères")
+                values[field] = text
+        except ValueError as e:
+            errors.append(str(e))
+
+    if not values.get("name"):
+        errors.append("le nom est obligatoire")
+    return values, category_name, errors
+
+
+def import_equipments(uploaded_file, *, create_categories=True, chunk_size=IMPORT_CHUNK_SIZE):
+    """
+    Importe / met à jour des équipements depuis un fichier XLSX ou CSV.
+
+    Les lignes avec un numéro de série sont insérées ou mises à jour (upsert),
+    les autres sont toujours créées. Seules les colonnes présentes dans le fichier
+    sont écrasées lors d'une mise à jour ; un statut vide conserve le statut actuel
+    (un équipement sorti le reste). Chaque lot est écrit dans sa propre transaction.
+
+    Retourne {"total", "created", "updated", "errors": [{"row", "errors"}]}.
+    """
+    rows = iter_uploaded_rows(uploaded_file)
+    mapping = _map_headers(next(rows, None))
+    columns = set(mapping.values())
+
+    # Toutes les catégories en une requête (nom normalisé -> catégorie)
+    categories = {_normalize(c.name): c for c in EquipmentCategory.objects.all()}
+
+    model_fields = [f for f in columns if f != "category"]
+    if "category" in columns:
+        model_fields.append("category")
+    update_fields = [f for f in model_fields if f != "serial_number"]
+
+    report = {"total": 0, "created": 0, "updated": 0, "errors": []}
+    seen_serials = set()
+    row_number = 1  # ligne d'en-tête
+
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            break
+
+        valid = []  # (numéro de ligne, valeurs, nom de catégorie)
+        for raw in chunk:
+            row_number += 1
+            if not any(v not in (None, "") for v in raw):
+                continue  # ligne vide
+            report["total"] += 1
+
+            values, category_name, errors = _clean_row(raw, mapping)
+            serial = values.get("serial_number")
+            if serial and serial in seen_serials:
+                errors.append(f"numéro de série « {serial} » en double dans le fichier")
+            if category_name and _normalize(category_name) not in categories and not create_categories:
+                errors.append(f"catégorie inconnue « {category_name} »")
+
+            if errors:
+                if len(report["errors"]) < IMPORT_MAX_ERRORS:
+                    report["errors"].append({"row": row_number, "errors": errors})
+                continue
+
+            if serial:
+                seen_serials.add(serial)
+            valid.append((row_number, values, category_name))
+
+        if not valid:
+            continue
+
+        with transaction.atomic():
+            # Catégories manquantes du lot, créées en une fois
+            missing = {}
+            for _, _, category_name in valid:
+                key = _normalize(category_name)
+                if category_name and key not in categories:
+                    missing.setdefault(key, category_name)
+            if missing:
+                EquipmentCategory.objects.bulk_create(
+                    [EquipmentCategory(name=name) for name in missing.values()]
+                )
+                created_names = set(missing.values())
+                for category in EquipmentCategory.objects.filter(name__in=created_names):
+                    categories.setdefault(_normalize(category.name), category)
+
+            # Équipements existants du lot, verrouillés jusqu'à la fin de la transaction
+            existing = Equipment.objects.select_for_update().in_bulk(
+                [values["serial_number"] for _, values, _ in valid if values.get("serial_number")],
+                field_name="serial_number",
+            )
+
+            to_create, to_update = [], []
+            for _, values, category_name in valid:
+                if "category" in columns:
+                    values["category"] = categories.get(_normalize(category_name)) if category_name else None
+                current = existing.get(values.get("serial_number"))
+                if current is None:
+                    to_create.append(Equipment(**values))
+                    continue
+                for field in update_fields:
+                    if field in values:
+                        setattr(current, field, values[field])
+                to_update.append(current)
+
+            if to_update:
+                Equipment.objects.bulk_update(to_update, update_fields)
+                report["updated"] += len(to_update)
+            if to_create:
+                Equipment.objects.bulk_create(to_create)
+                report["created"] += len(to_create)
+
+    return report
@@ -0,0 +1,77 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from apps.studio.analytics import (
+    UTILIZATION_PAYMENT_OVERLAP,
+    UTILIZATION_REFRESH_DAYS,
+    get_days_with_payment_changes,
+    get_last_utilization_refresh,
+    get_utilization_data_start,
+    refresh_equipment_daily_stats,
+)
+
+
+class Command(BaseCommand):
+    help = "Recalcule les statistiques journalières d'utilisation du matériel (par défaut : derniers jours seulement)"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=UTILIZATION_REFRESH_DAYS,
+            help="Nombre de jours recalculés jusqu'à aujourd'hui inclus (défaut : %(default)s)",
+        )
+        parser.add_argument('--from', dest='date_from', help="Début de période (AAAA-MM-JJ)")
+        parser.add_argument('--to', dest='date_to', help="Fin de période (AAAA-MM-JJ)")
+        parser.add_argument(
+            '--full',
+            action='store_true',
+            help="Recalcule tout l'historique (première utilisation / réservation -> aujourd'hui)",
+        )
+
+    def handle(self, *args, **options):
+        today = timezone.localdate()
+        date_to = parse_date(options['date_to']) if options['date_to'] else today
+        if options['full']:
+            date_from = get_utilization_data_start()
+            if date_from is None:
+                self.stdout.write("Aucune donnée d'utilisation.")
+                return
+        elif options['date_from']:
+            date_from = parse_date(options['date_from'])
+        else:
+            date_from = date_to - timedelta(days=max(options['days'], 1) - 1)
+
+        if not date_from or not date_to or date_from > date_to:
+            raise CommandError("Période invalide.")
+
+        # Paiements reçus / modifiés depuis le dernier passage pour des réservations
+        # plus anciennes : leurs jours de début sont recalculés en plus de la période
+        last_refresh = None if options['full'] else get_last_utilization_refresh()
+        late_days = []
+        if last_refresh is not None:
+            late_days = sorted(
+                day for day in get_days_with_payment_changes(last_refresh - UTILIZATION_PAYMENT_OVERLAP)
+                if not date_from <= day <= date_to
+            )
+
+        # Recalcul par tranches de 31 jours pour limiter la mémoire sur un --full
+        total = 0
+        chunk_start = date_from
+        while chunk_start <= date_to:
+            chunk_end = min(chunk_start + timedelta(days=30), date_to)
+            total += refresh_equipment_daily_stats(chunk_start, chunk_end)
+            chunk_start = chunk_end + timedelta(days=1)
+        for day in late_days:
+            total += refresh_equipment_daily_stats(day, day)
+
+        if late_days:
+            self.stdout.write(f"{len(late_days)} jour(s) antérieur(s) recalculé(s) (paiements modifiés).")
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"✅ {total} ligne(s) recalculée(s) du {date_from:%d/%m/%Y} au {date_to:%d/%m/%Y}."
+            )
+        )
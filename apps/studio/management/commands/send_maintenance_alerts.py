@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+
+from apps.studio.services import MAINTENANCE_LOOKAHEAD_DAYS, send_maintenance_digests
+
+
+class Command(BaseCommand):
+    help = "Envoie le récapitulatif quotidien des maintenances d'équipements au staff (à lancer via cron)"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=MAINTENANCE_LOOKAHEAD_DAYS,
+            help="Inclure les maintenances prévues dans les N prochains jours (défaut : %(default)s)",
+        )
+
+    def handle(self, *args, **options):
+        equipments_count, notifications_count = send_maintenance_digests(days_ahead=options['days'])
+
+        if not equipments_count:
+            self.stdout.write("Aucune maintenance à prévoir.")
+            return
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"✅ {equipments_count} équipement(s) concerné(s), "
+                f"{notifications_count} notification(s) envoyée(s)."
+            )
+        )
@@ -0,0 +1,51 @@
+# Generated by Django 5.0.3 on 2026-10-19 16:12
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def close_duplicate_open_usages(apps, schema_editor):
+    """
+    Avant la contrainte usage_one_open_per_equipment : pour chaque équipement, seule
+    la sortie ouverte la plus récente le reste ; les autres sont clôturées à son début.
+    """
+    EquipmentUsageHistory = apps.get_model('studio', 'EquipmentUsageHistory')
+    open_usages = (
+        EquipmentUsageHistory.objects.filter(end_datetime__isnull=True)
+        .order_by('equipment_id', '-start_datetime', '-id')
+    )
+    latest_start = {}
+    to_close = []
+    for usage in open_usages.iterator():
+        if usage.equipment_id not in latest_start:
+            latest_start[usage.equipment_id] = usage.start_datetime
+            continue
+        usage.end_datetime = max(latest_start[usage.equipment_id], usage.start_datetime)
+        usage.notes = (usage.notes + "\n" if usage.notes else "") + "[Clôture automatique] sortie en double"
+        to_close.append(usage)
+    EquipmentUsageHistory.objects.bulk_update(to_close, ['end_datetime', 'notes'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('studio', '0006_reservation_budget_known_reservation_budget_max_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='equipmentusagehistory',
+            name='due_datetime',
+            field=models.DateTimeField(blank=True, help_text='Date/heure de retour attendue (sert à détecter les retards).', null=True, verbose_name='Retour prévu'),
+        ),
+        migrations.AddIndex(
+            model_name='equipmentusagehistory',
+            index=models.Index(condition=models.Q(('end_datetime__isnull', True)), fields=['due_datetime'], name='usage_open_due_idx'),
+        ),
+        migrations.RunPython(close_duplicate_open_usages, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='equipmentusagehistory',
+            constraint=models.UniqueConstraint(condition=models.Q(('end_datetime__isnull', True)), fields=('equipment',), name='usage_one_open_per_equipment'),
+        ),
+    ]
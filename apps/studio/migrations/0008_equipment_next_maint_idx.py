@@ -0,0 +1,19 @@
+# Generated by Django 5.0.3 on 2026-10-19 16:18
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('studio', '0007_equipmentusagehistory_due_datetime_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='equipment',
+            index=models.Index(fields=['next_maintenance_date'], name='equipment_next_maint_idx'),
+        ),
+    ]
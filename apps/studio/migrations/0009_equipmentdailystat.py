@@ -0,0 +1,35 @@
+# Generated by Django 5.0.3 on 2026-10-19 16:20
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('studio', '0008_equipment_next_maint_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EquipmentDailyStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(verbose_name='Jour')),
+                ('hours_used', models.DecimalField(decimal_places=2, default=0, max_digits=5, verbose_name="Heures d'utilisation")),
+                ('reservations_count', models.PositiveIntegerField(default=0, verbose_name='Réservations')),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=12, verbose_name='Revenus attribués')),
+                ('computed_at', models.DateTimeField(auto_now=True, verbose_name='Calculé le')),
+                ('equipment', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_stats', to='studio.equipment')),
+            ],
+            options={
+                'verbose_name': "Statistique journalière d'équipement",
+                'verbose_name_plural': "Statistiques journalières d'équipements",
+                'indexes': [models.Index(fields=['day'], name='equipment_daily_stat_day_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='equipmentdailystat',
+            constraint=models.UniqueConstraint(fields=('equipment', 'day'), name='equipment_daily_stat_unique'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.0.3 on 2026-10-19 16:27
+
+import apps.core.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('studio', '0009_equipmentdailystat'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='equipment',
+            name='manual',
+            field=models.FileField(blank=True, null=True, storage=apps.core.storage.get_cas_storage, upload_to='equipment_manuals/', verbose_name="Manuel d'utilisation (PDF)"),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.0.3 on 2026-10-19 17:37
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('studio', '0010_content_addressed_storage'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='equipmentusagehistory',
+            index=models.Index(fields=['end_datetime', 'due_datetime'], name='usage_end_due_idx'),
+        ),
+    ]
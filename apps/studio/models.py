@@ -1,7 +1,10 @@
 from django.db import models
 # from django import forms
 from django.conf import settings
+from django.db.models.functions import ExtractYear
 from django.utils import timezone
+
+from apps.core.storage import get_cas_storage
 # from django.core.exceptions import ValidationError
 from .choices import (
     EquipmentStatus,
@@ -205,6 +208,48 @@ class EquipmentCategory(models.Model):
         return self.name
 
 
+class EquipmentQuerySet(models.QuerySet):
+    def with_maintenance_info(self, today=None):
+        """
+        Annote maintenance_due (bool) et age_in_years (int ou NULL), calculés en base,
+        pour pouvoir filtrer / trier sans charger chaque ligne.
+        """
+        today = today or timezone.localdate()
+        anniversary_not_reached = (
+            models.Q(purchase_date__month__gt=today.month)
+            | models.Q(purchase_date__month=today.month, purchase_date__day__gt=today.day)
+        )
+        return self.annotate(
+            maintenance_due=models.Case(
+                models.When(next_maintenance_date__lte=today, then=models.Value(True)),
+                default=models.Value(False),
+                output_field=models.BooleanField(),
+            ),
+            age_in_years=models.Case(
+                models.When(purchase_date__isnull=True, then=models.Value(None)),
+                models.When(purchase_date__gt=today, then=models.Value(0)),
+                models.When(
+                    anniversary_not_reached,
+                    then=models.Value(today.year - 1) - ExtractYear('purchase_date'),
+                ),
+                default=models.Value(today.year) - ExtractYear('purchase_date'),
+                output_field=models.IntegerField(),
+            ),
+        )
+
+    def maintenance_due_between(self, start=None, end=None):
+        """
+        Équipements dont la prochaine maintenance tombe dans [start, end]
+        (requête par plage sur l'index next_maintenance_date).
+        """
+        qs = self.filter(next_maintenance_date__isnull=False)
+        if start:
+            qs = qs.filter(next_maintenance_date__gte=start)
+        if end:
+            qs = qs.filter(next_maintenance_date__lte=end)
+        return qs
+
+
 class Equipment(models.Model):
     # INFORMATIONS DE BASE
     name = models.CharField("Nom de l'équipement", max_length=150)
@@ -286,6 +331,7 @@ class Equipment(models.Model):
     manual = models.FileField(
         "Manuel d'utilisation (PDF)",
         upload_to='equipment_manuals/',
+        storage=get_cas_storage,
         blank=True,
         null=True,
     )
@@ -293,10 +339,15 @@ class Equipment(models.Model):
     # MÉTADONNÉES
     created_at = models.DateTimeField("Créé le", auto_now_add=True)
 
+    objects = EquipmentQuerySet.as_manager()
+
     class Meta:
         verbose_name = "Équipement"
         verbose_name_plural = "Équipements"
         ordering = ['name']
+        indexes = [
+            models.Index(fields=['next_maintenance_date'], name='equipment_next_maint_idx'),
+        ]
 
     def __str__(self):
         return f"{self.name} ({self.brand or ''} {self.model or ''})".strip()
@@ -306,6 +357,8 @@ class Equipment(models.Model):
         """
         Âge de l'équipement (en années, approximatif).
         """
+        if 'age_in_years' in self.__dict__:  # annotation with_maintenance_info()
+            return self.age_in_years
         if not self.purchase_date:
             return None
         # On utilise la date locale Django
@@ -321,6 +374,8 @@ class Equipment(models.Model):
         """
         True si une maintenance est nécessaire (date prochaine <= aujourd'hui).
         """
+        if 'maintenance_due' in self.__dict__:  # annotation with_maintenance_info()
+            return self.maintenance_due
         if not self.next_maintenance_date:
             return False
         # On utilise aussi timezone.localdate()
@@ -332,17 +387,81 @@ class EquipmentUsageHistory(models.Model):
     equipment = models.ForeignKey(Equipment, on_delete=models.CASCADE, related_name='usage_history')
     start_datetime = models.DateTimeField("Début d'utilisation")
     end_datetime = models.DateTimeField("Fin d'utilisation", blank=True, null=True)
+    due_datetime = models.DateTimeField(
+        "Retour prévu",
+        blank=True,
+        null=True,
+        help_text="Date/heure de retour attendue (sert à détecter les retards).",
+    )
     used_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
     notes = models.TextField("Notes", blank=True)
 
     class Meta:
         verbose_name = "Historique d'utilisation"
         verbose_name_plural = "Historiques d'utilisation"
+        # Une seule sortie en cours (end_datetime IS NULL) par équipement : garantie par
+        # checkout_equipments (équipements verrouillés par select_for_update, sortie
+        # ouverte refusée). La contrainte et l'index partiels ci-dessous ne sont qu'un
+        # filet de sécurité sous PostgreSQL / SQLite : MySQL ne les crée pas (W036 / W037).
+        constraints = [
+            models.UniqueConstraint(
+                fields=['equipment'],
+                condition=models.Q(end_datetime__isnull=True),
+                name='usage_one_open_per_equipment',
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=['due_datetime'],
+                condition=models.Q(end_datetime__isnull=True),
+                name='usage_open_due_idx',
+            ),
+            # Équivalent portable : sorties en cours / en retard sous MySQL
+            models.Index(fields=['end_datetime', 'due_datetime'], name='usage_end_due_idx'),
+        ]
+
+    @property
+    def is_open(self):
+        return self.end_datetime is None
+
+    @property
+    def is_overdue(self):
+        return (
+            self.end_datetime is None
+            and self.due_datetime is not None
+            and self.due_datetime < timezone.now()
+        )
 
     def __str__(self):
         return f"{self.equipment} - {self.start_datetime}"
 
 
+class EquipmentDailyStat(models.Model):
+    """
+    Agrégat journalier par équipement (heures d'utilisation, réservations, revenus),
+    recalculé par la commande refresh_equipment_stats et lu par la page d'analyse.
+    """
+    equipment = models.ForeignKey(Equipment, on_delete=models.CASCADE, related_name='daily_stats')
+    day = models.DateField("Jour")
+    hours_used = models.DecimalField("Heures d'utilisation", max_digits=5, decimal_places=2, default=0)
+    reservations_count = models.PositiveIntegerField("Réservations", default=0)
+    revenue = models.DecimalField("Revenus attribués", max_digits=12, decimal_places=2, default=0)
+    computed_at = models.DateTimeField("Calculé le", auto_now=True)
+
+    class Meta:
+        verbose_name = "Statistique journalière d'équipement"
+        verbose_name_plural = "Statistiques journalières d'équipements"
+        constraints = [
+            models.UniqueConstraint(fields=['equipment', 'day'], name='equipment_daily_stat_unique'),
+        ]
+        indexes = [
+            models.Index(fields=['day'], name='equipment_daily_stat_day_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.equipment} - {self.day:%d/%m/%Y}"
+
+
 # class Reservation(models.Model):
 #     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='reservations')
 #     studio = models.ForeignKey(Studio, on_delete=models.SET_NULL, null=True, blank=True)
@@ -1,5 +1,34 @@
 # apps/studio/services.py
-from .models import ReservationStatusHistory, Reservation
+import re
+from bisect import bisect_right
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import Case, F, Q, TextField, Value, When
+from django.db.models.functions import Concat
+from django.utils import timezone
+
+from .choices import (
+    EquipmentStatus,
+    PreferredPeriodChoices,
+    ReservationStatus,
+    StudioStatusChoices,
+)
+from .models import (
+    Equipment,
+    EquipmentUsageHistory,
+    ReservationStatusHistory,
+    Reservation,
+    Studio,
+)
+from apps.notifications.models import Notification, NotificationTypeChoices
+from apps.notifications.outbox import queue_email
+from apps.notifications.realtime import push_new_notifications
+
+User = get_user_model()
 
 
 def log_reservation_status_change(
@@ -22,4 +51,475 @@ def log_reservation_status_change(
         new_status=new_status,
         changed_by=changed_by,
         note=(note or "")[:500],
-    )
\ No newline at end of file
+    )
+
+
+# ==== SUGGESTION DE CRÉNEAUX LIBRES ==== #
+
+# Statuts qui bloquent un créneau (mêmes règles que ProjectReservationForm)
+BLOCKING_RESERVATION_STATUSES = (ReservationStatus.PENDING, ReservationStatus.CONFIRMED)
+
+DEFAULT_OPENING_TIME = time(8, 0)
+DEFAULT_CLOSING_TIME = time(20, 0)
+
+SLOT_SEARCH_DAYS = 14
+SLOT_SUGGESTIONS_LIMIT = 5
+
+_HOUR_RE = re.compile(r"(\d{1,2})\s*[hH:]\s*(\d{2})?")
+
+
+def _parse_opening_hours(opening_hours: str):
+    """
+    Extrait (ouverture, fermeture) d'un texte libre du type "08h00 - 20h00".
+    Retourne les horaires par défaut si le texte n'est pas exploitable.
+    """
+    matches = _HOUR_RE.findall(opening_hours or "")
+    if len(matches) >= 2:
+        try:
+            opening = time(int(matches[0][0]), int(matches[0][1] or 0))
+            closing = time(int(matches[1][0]), int(matches[1][1] or 0))
+        except ValueError:
+            return DEFAULT_OPENING_TIME, DEFAULT_CLOSING_TIME
+        if opening < closing:
+            return opening, closing
+    return DEFAULT_OPENING_TIME, DEFAULT_CLOSING_TIME
+
+
+def _merge_intervals(intervals):
+    """
+    Fusionne des intervalles (début, fin) qui se chevauchent ou se touchent.
+    """
+    merged = []
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1]:
+            if end > merged[-1][1]:
+                merged[-1][1] = end
+        else:
+            merged.append([start, end])
+    return [(start, end) for start, end in merged]
+
+
+def _free_gaps(busy, busy_ends, window_start, window_end):
+    """
+    Retourne les plages libres de [window_start, window_end] en retirant
+    les intervalles occupés (triés et fusionnés).
+    """
+    gaps = []
+    cursor = window_start
+    # Premier intervalle occupé qui se termine après le début de la fenêtre
+    idx = bisect_right(busy_ends, window_start)
+    while idx < len(busy) and busy[idx][0] < window_end:
+        busy_start, busy_end = busy[idx]
+        if busy_start > cursor:
+            gaps.append((cursor, busy_start))
+        cursor = max(cursor, busy_end)
+        idx += 1
+    if cursor < window_end:
+        gaps.append((cursor, window_end))
+    return gaps
+
+
+def _day_allowed(day, preferred_period):
+    if preferred_period == PreferredPeriodChoices.WEEKDAY:
+        return day.weekday() < 5
+    if preferred_period == PreferredPeriodChoices.WEEKEND:
+        return day.weekday() >= 5
+    return True
+
+
+def get_candidate_studios(reservation: Reservation):
+    """
+    Studios où l'on peut proposer un créneau : le studio demandé,
+    puis les studios actifs du même type et de capacité suffisante.
+    """
+    requested = reservation.studio
+    needed_capacity = reservation.participants_count or (requested.capacity if requested else None)
+
+    qs = Studio.objects.filter(is_active=True, status=StudioStatusChoices.AVAILABLE)
+    if requested is not None:
+        qs = qs.filter(Q(pk=requested.pk) | Q(studio_type=requested.studio_type))
+    if needed_capacity:
+        cond = Q(capacity__isnull=True) | Q(capacity__gte=needed_capacity)
+        if requested is not None:
+            cond |= Q(pk=requested.pk)
+        qs = qs.filter(cond)
+
+    studios = list(qs)
+    if requested is not None and requested.pk not in {s.pk for s in studios}:
+        # Le studio demandé reste proposé même s'il est masqué ou indisponible
+        studios.insert(0, requested)
+    return studios
+
+
+def suggest_free_slots(
+    reservation: Reservation,
+    limit: int = SLOT_SUGGESTIONS_LIMIT,
+    search_days: int = SLOT_SEARCH_DAYS,
+):
+    """
+    Propose les créneaux libres les plus proches des dates souhaitées par le client
+    (preferred_date_1 / preferred_date_2, à défaut le créneau demandé).
+
+    Le planning de tous les studios candidats est chargé en UNE requête,
+    puis la recherche se fait en mémoire, jour par jour autour des dates souhaitées.
+    Retourne une liste de dicts triés par proximité :
+    {"studio", "start", "end", "distance", "is_requested_studio"}.
+    """
+    duration = reservation.end_datetime - reservation.start_datetime
+    if duration <= timedelta(0):
+        return []
+
+    tz = timezone.get_current_timezone()
+    anchors = [
+        timezone.localtime(dt, tz)
+        for dt in (reservation.preferred_date_1, reservation.preferred_date_2)
+        if dt is not None
+    ] or [timezone.localtime(reservation.start_datetime, tz)]
+
+    studios = get_candidate_studios(reservation)
+    if not studios:
+        return []
+
+    now = timezone.now()
+    search_start = max(min(anchors) - timedelta(days=search_days), now)
+    search_end = max(anchors) + timedelta(days=search_days + 1)
+    if search_start >= search_end:
+        return []
+
+    # Une seule requête pour tout le planning de la fenêtre de recherche
+    busy_rows = (
+        Reservation.objects
+        .filter(
+            studio__in=studios,
+            status__in=BLOCKING_RESERVATION_STATUSES,
+            start_datetime__lt=search_end,
+            end_datetime__gt=search_start,
+        )
+        .exclude(pk=reservation.pk)
+        .values_list("studio_id", "start_datetime", "end_datetime")
+    )
+    busy_by_studio = {}
+    for studio_id, start, end in busy_rows:
+        busy_by_studio.setdefault(studio_id, []).append((start, end))
+
+    # Jours à explorer, du plus proche au plus éloigné des dates souhaitées
+    first_day = timezone.localtime(search_start, tz).date()
+    last_day = timezone.localtime(search_end, tz).date()
+    days = [first_day + timedelta(days=i) for i in range((last_day - first_day).days + 1)]
+    days = [d for d in days if _day_allowed(d, reservation.preferred_period)]
+    days.sort(key=lambda d: min(abs((d - a.date()).days) for a in anchors))
+
+    requested_pk = reservation.studio_id
+    suggestions = {}
+
+    for studio in studios:
+        busy = _merge_intervals(busy_by_studio.get(studio.pk, []))
+        busy_ends = [end for _, end in busy]
+        opening, closing = _parse_opening_hours(studio.opening_hours)
+
+        for day in days:
+            window_start = max(timezone.make_aware(datetime.combine(day, opening), tz), now)
+            window_end = timezone.make_aware(datetime.combine(day, closing), tz)
+            if window_end - window_start < duration:
+                continue
+
+            for gap_start, gap_end in _free_gaps(busy, busy_ends, window_start, window_end):
+                latest_start = gap_end - duration
+                if latest_start < gap_start:
+                    continue
+
+                # Placer le créneau au plus près de l'heure souhaitée, dans la plage libre
+                best = None
+                for anchor in anchors:
+                    target = timezone.make_aware(datetime.combine(day, anchor.time()), tz)
+                    start = min(max(target, gap_start), latest_start)
+                    distance = abs(start - anchor)
+                    if best is None or distance < best[1]:
+                        best = (start, distance)
+
+                start, distance = best
+                key = (studio.pk, start)
+                if key not in suggestions:
+                    suggestions[key] = {
+                        "studio": studio,
+                        "start": start,
+                        "end": start + duration,
+                        "distance": distance,
+                        "is_requested_studio": studio.pk == requested_pk,
+                    }
+
+    ordered = sorted(
+        suggestions.values(),
+        key=lambda s: (s["distance"], not s["is_requested_studio"], s["start"]),
+    )
+    return ordered[:limit]
+
+
+# ==== SORTIE / RETOUR DE MATÉRIEL ==== #
+
+def checkout_equipments(equipment_ids, user, *, due_datetime=None, notes: str = "", started_at=None):
+    """
+    Sortie de matériel (un équipement ou un kit complet) dans UNE transaction :
+    - verrouille les équipements (select_for_update),
+    - vérifie qu'ils sont tous disponibles,
+    - ouvre un historique d'utilisation par équipement (bulk_create),
+    - passe les équipements "En utilisation" avec l'utilisateur actuel.
+    Lève ValidationError si un équipement est introuvable ou indisponible (rien n'est modifié).
+    """
+    ids = sorted({int(pk) for pk in equipment_ids})
+    if not ids:
+        raise ValidationError("Aucun équipement sélectionné.")
+
+    started_at = started_at or timezone.now()
+    if due_datetime is not None and due_datetime <= started_at:
+        raise ValidationError("La date de retour prévue doit être postérieure à la sortie.")
+
+    with transaction.atomic():
+        equipments = list(
+            Equipment.objects.select_for_update().filter(pk__in=ids).order_by("pk")
+        )
+        if len(equipments) != len(ids):
+            raise ValidationError("Un ou plusieurs équipements sont introuvables.")
+
+        # Sortie encore ouverte (statut modifié à la main) : refusée, la contrainte
+        # usage_one_open_per_equipment n'existe pas sous MySQL
+        still_out = set(
+            EquipmentUsageHistory.objects.filter(equipment_id__in=ids, end_datetime__isnull=True)
+            .values_list("equipment_id", flat=True)
+        )
+        unavailable = [e for e in equipments if e.status != EquipmentStatus.AVAILABLE or e.pk in still_out]
+        if unavailable:
+            names = ", ".join(f"{e.name} ({e.get_status_display()})" for e in unavailable)
+            raise ValidationError(f"Équipement(s) non disponible(s) : {names}.")
+
+        usages = EquipmentUsageHistory.objects.bulk_create([
+            EquipmentUsageHistory(
+                equipment=equipment,
+                start_datetime=started_at,
+                due_datetime=due_datetime,
+                used_by=user,
+                notes=notes or "",
+            )
+            for equipment in equipments
+        ])
+        Equipment.objects.filter(pk__in=ids).update(
+            status=EquipmentStatus.IN_USE,
+            current_user=user,
+        )
+
+    return usages
+
+
+def checkin_equipments(equipment_ids, *, notes: str = "", ended_at=None):
+    """
+    Retour de matériel dans UNE transaction : clôture les sorties en cours,
+    remet les équipements "Disponible" et efface l'utilisateur actuel.
+    Lève ValidationError si un équipement n'est pas sorti.
+    Retourne le nombre d'historiques clôturés.
+    """
+    ids = sorted({int(pk) for pk in equipment_ids})
+    if not ids:
+        raise ValidationError("Aucun équipement sélectionné.")
+
+    ended_at = ended_at or timezone.now()
+
+    with transaction.atomic():
+        equipments = list(
+            Equipment.objects.select_for_update().filter(pk__in=ids).order_by("pk")
+        )
+        if len(equipments) != len(ids):
+            raise ValidationError("Un ou plusieurs équipements sont introuvables.")
+
+        open_usages = EquipmentUsageHistory.objects.filter(
+            equipment_id__in=ids,
+            end_datetime__isnull=True,
+        )
+        open_ids = set(open_usages.values_list("equipment_id", flat=True))
+
+        # Un équipement "En utilisation" sans historique ouvert (saisie manuelle) peut être rendu
+        not_out = [
+            e for e in equipments
+            if e.pk not in open_ids and e.status != EquipmentStatus.IN_USE
+        ]
+        if not_out:
+            names = ", ".join(e.name for e in not_out)
+            raise ValidationError(f"Équipement(s) non sorti(s) : {names}.")
+
+        update_kwargs = {"end_datetime": ended_at}
+        if notes:
+            return_note = f"[Retour] {notes}"
+            update_kwargs["notes"] = Case(
+                When(notes="", then=Value(return_note)),
+                default=Concat(F("notes"), Value(f"\n{return_note}"), output_field=TextField()),
+                output_field=TextField(),
+            )
+        closed = open_usages.update(**update_kwargs)
+
+        Equipment.objects.filter(pk__in=ids).update(
+            status=EquipmentStatus.AVAILABLE,
+            current_user=None,
+        )
+
+    return closed
+
+
+def get_open_equipment_usages():
+    """
+    Matériel actuellement sorti, avec l'utilisateur (index end_datetime, due_datetime).
+    """
+    return (
+        EquipmentUsageHistory.objects
+        .filter(end_datetime__isnull=True)
+        .select_related("equipment", "equipment__category", "used_by")
+        .order_by(F("due_datetime").asc(nulls_last=True), "start_datetime")
+    )
+
+
+def get_overdue_equipment_usages(now=None):
+    """
+    Sorties en cours dont la date de retour prévue est dépassée.
+    """
+    return get_open_equipment_usages().filter(due_datetime__lt=now or timezone.now())
+
+
+# ==== SCAN (N° DE SÉRIE / QR CODE) ==== #
+
+SCAN_MAX_CODES = 200
+
+# QR codes internes : "EQ:<id>", "SN:<numéro de série>" ou URL de la fiche équipement
+_QR_EQUIPMENT_URL_RE = re.compile(r"/equipments/(\d+)/?")
+
+
+def parse_scan_code(code: str):
+    """
+    Interprète un code scanné.
+    Retourne ("id", pk) pour un QR code interne, sinon ("serial", numéro de série).
+    """
+    code = (code or "").strip()
+    upper = code.upper()
+    if upper.startswith("EQ:") and code[3:].strip().isdigit():
+        return "id", int(code[3:].strip())
+    if upper.startswith("SN:"):
+        return "serial", code[3:].strip()
+    if "://" in code or code.startswith("/"):
+        match = _QR_EQUIPMENT_URL_RE.search(code)
+        if match:
+            return "id", int(match.group(1))
+    return "serial", code
+
+
+def lookup_equipments_by_codes(codes):
+    """
+    Résout une liste de codes scannés en UNE requête (correspondance exacte
+    sur serial_number via l'index unique, ou sur la clé primaire pour les QR codes).
+    Retourne une liste [(code, equipment ou None)] dans l'ordre des codes.
+    """
+    parsed = [(code, *parse_scan_code(code)) for code in codes]
+    serials = {value for _, kind, value in parsed if kind == "serial" and value}
+    ids = {value for _, kind, value in parsed if kind == "id"}
+    if not serials and not ids:
+        return [(code, None) for code in codes]
+
+    qs = (
+        Equipment.objects
+        .filter(Q(serial_number__in=serials) | Q(pk__in=ids))
+        .select_related("current_user")
+        .only(
+            "id", "name", "serial_number", "status", "location",
+            "next_maintenance_date",
+            "current_user__id", "current_user__username",
+            "current_user__first_name", "current_user__last_name",
+        )
+    )
+    by_serial, by_id = {}, {}
+    for equipment in qs:
+        by_id[equipment.pk] = equipment
+        if equipment.serial_number:
+            by_serial[equipment.serial_number] = equipment
+
+    return [
+        (code, by_id.get(value) if kind == "id" else by_serial.get(value))
+        for code, kind, value in parsed
+    ]
+
+
+# ==== MAINTENANCE ==== #
+
+MAINTENANCE_LOOKAHEAD_DAYS = 7
+MAINTENANCE_DIGEST_MAX_LINES = 25
+
+
+def get_maintenance_recipients(equipments):
+    """
+    Regroupe les équipements par membre du staff responsable :
+    l'utilisateur actuel s'il fait partie du staff, sinon tout le staff actif.
+    Retourne {user: [équipements]}.
+    """
+    equipments = list(equipments)
+    if not equipments:
+        return {}
+
+    all_staff = None
+    digests = {}
+    for equipment in equipments:
+        holder = equipment.current_user
+        if holder is not None and holder.is_staff and holder.is_active:
+            recipients = [holder]
+        else:
+            if all_staff is None:
+                all_staff = list(User.objects.filter(is_staff=True, is_active=True))
+            recipients = all_staff
+        for user in recipients:
+            digests.setdefault(user, []).append(equipment)
+    return digests
+
+
+def send_maintenance_digests(*, days_ahead: int = MAINTENANCE_LOOKAHEAD_DAYS, today=None):
+    """
+    Crée une notification récapitulative (et met en file le même récapitulatif par
+    email) par membre du staff responsable pour les équipements dont la maintenance
+    est due (en retard ou dans les `days_ahead` jours).
+    Retourne (nombre d'équipements concernés, nombre de notifications créées).
+    """
+    today = today or timezone.localdate()
+    horizon = today + timedelta(days=days_ahead)
+
+    equipments = list(
+        Equipment.objects
+        .maintenance_due_between(end=horizon)
+        .exclude(status=EquipmentStatus.RETIRED)
+        .select_related('current_user')
+        .order_by('next_maintenance_date', 'name')
+        .only('id', 'name', 'serial_number', 'next_maintenance_date', 'current_user')
+    )
+
+    link = "/dashboard/equipments/?maintenance=due"
+    notifications = []
+    for user, items in get_maintenance_recipients(equipments).items():
+        overdue = sum(1 for e in items if e.next_maintenance_date <= today)
+        lines = [
+            f"- {e.name}{f' ({e.serial_number})' if e.serial_number else ''} : "
+            f"{e.next_maintenance_date:%d/%m/%Y}{' (en retard)' if e.next_maintenance_date <= today else ''}"
+            for e in items[:MAINTENANCE_DIGEST_MAX_LINES]
+        ]
+        if len(items) > MAINTENANCE_DIGEST_MAX_LINES:
+            lines.append(f"… et {len(items) - MAINTENANCE_DIGEST_MAX_LINES} autre(s).")
+
+        notifications.append(Notification(
+            user=user,
+            notification_type=NotificationTypeChoices.SYSTEM,
+            title=f"Maintenance : {len(items)} équipement(s) à prévoir, dont {overdue} en retard",
+            message="\n".join(lines),
+            link=link,
+        ))
+
+    with transaction.atomic():
+        created = Notification.objects.bulk_create(notifications)
+        for notification in notifications:
+            queue_email(
+                f"Oloustream – {notification.title}",
+                f"{notification.message}\n\nVoir les équipements : {settings.SITE_URL}{link}",
+                [notification.user.email],
+            )
+        push_new_notifications(created)
+    return len(equipments), len(notifications)
@@ -1,3 +1,346 @@
+import json
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+from io import StringIO
+
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
 from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from apps.accounts.models import User
+from apps.notifications.models import Notification, OutboxEmail
+from apps.payments.models import Payment, PaymentMethod, PaymentStatus
+
+from .analytics import compute_studio_occupancy
+from .choices import EquipmentStatus, PreferredPeriodChoices, ReservationStatus, StudioStatusChoices
+from .importing import import_equipments
+from .models import Equipment, EquipmentDailyStat, EquipmentUsageHistory, Reservation, Studio
+from .services import (
+    SCAN_MAX_CODES,
+    _merge_intervals,
+    _parse_opening_hours,
+    checkin_equipments,
+    checkout_equipments,
+    lookup_equipments_by_codes,
+    parse_scan_code,
+    send_maintenance_digests,
+    suggest_free_slots,
+)
+
+
+def _csv(text, encoding="utf-8"):
+    return SimpleUploadedFile("inventaire.csv", text.encode(encoding), content_type="text/csv")
+
+
+class EquipmentImportTests(TestCase):
+    def test_upserts_on_serial_number_and_keeps_status_when_cell_is_blank(self):
+        Equipment.objects.create(name="Caméra A", serial_number="SN-1", status=EquipmentStatus.IN_USE)
+        Equipment.objects.create(name="Trépied", serial_number="SN-2", status=EquipmentStatus.IN_USE)
+
+        report = import_equipments(_csv(
+            "Nom;N° de série;Statut;Catégorie\n"
+            "Caméra A (révisée);SN-1;;Caméras\n"
+            "Trépied;SN-2;Disponible;\n"
+            "Micro;SN-3;;Audio\n"
+            "Câble;;;\n"
+        ))
+
+        self.assertEqual((report["created"], report["updated"], report["errors"]), (2, 2, []))
+        camera = Equipment.objects.get(serial_number="SN-1")
+        self.assertEqual((camera.name, camera.status, camera.category.name), ("Caméra A (révisée)", EquipmentStatus.IN_USE, "Caméras"))
+        self.assertEqual(Equipment.objects.get(serial_number="SN-2").status, EquipmentStatus.AVAILABLE)
+        self.assertEqual(Equipment.objects.get(serial_number="SN-3").status, EquipmentStatus.AVAILABLE)
+        self.assertEqual(Equipment.objects.count(), 4)
+
+    def test_reads_a_cp1252_excel_export(self):
+        report = import_equipments(_csv(
+            "Nom;N° de série;Catégorie\n"
+            "Caméra épaule;SN-1;Vidéo\n",
+            encoding="cp1252",
+        ))
+
+        self.assertEqual((report["created"], report["errors"]), (1, []))
+        camera = Equipment.objects.get(serial_number="SN-1")
+        self.assertEqual((camera.name, camera.category.name), ("Caméra épaule", "Vidéo"))
+
+    def test_undecodable_csv_is_reported_to_the_user(self):
+        staff = User.objects.create_user(username="admin", password="x", is_staff=True)
+        self.client.force_login(staff)
+        upload = SimpleUploadedFile("inventaire.csv", b"Nom\nCam\x81ra\n", content_type="text/csv")
+
+        response = self.client.post(reverse("dashboard:equipments_import"), {"file": upload})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "Encodage du fichier CSV non reconnu")
+        self.assertFalse(Equipment.objects.exists())
+
+
+class StudioOccupancyTests(TestCase):
+    def test_one_day_window_has_no_nan(self):
+        studio = Studio.objects.create(name="Studio A")
+        user = User.objects.create_user(username="client", password="x")
+        tz = timezone.get_current_timezone()
+        Reservation.objects.create(
+            user=user,
+            studio=studio,
+            status=ReservationStatus.CONFIRMED,
+            start_datetime=timezone.make_aware(datetime(2026, 3, 4, 10), tz),
+            end_datetime=timezone.make_aware(datetime(2026, 3, 4, 12), tz),
+        )
+
+        data = compute_studio_occupancy(date(2026, 3, 4), date(2026, 3, 4))
+
+        json.dumps(data, allow_nan=False)  # ValueError si NaN
+        wednesday = data["all"]["occupancy_rate"][2]
+        self.assertEqual((wednesday[10], wednesday[11], wednesday[12]), (1.0, 1.0, 0.0))
+        self.assertEqual(data["all"]["occupancy_rate"][0], [0.0] * 24)
+
+
+class EquipmentCheckoutTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="technicien", password="x")
+        self.equipment = Equipment.objects.create(name="Caméra")
+
+    def test_checkout_then_checkin(self):
+        checkout_equipments([self.equipment.pk], self.user)
+        self.equipment.refresh_from_db()
+        self.assertEqual((self.equipment.status, self.equipment.current_user), (EquipmentStatus.IN_USE, self.user))
+
+        with self.assertRaises(ValidationError):
+            checkout_equipments([self.equipment.pk], self.user)
+
+        self.assertEqual(checkin_equipments([self.equipment.pk]), 1)
+        self.equipment.refresh_from_db()
+        self.assertEqual(self.equipment.status, EquipmentStatus.AVAILABLE)
+
+    def test_open_usage_blocks_checkout_even_if_status_says_available(self):
+        # Statut remis à "Disponible" à la main sans retour : sous MySQL, seule cette
+        # vérification empêche une seconde sortie ouverte
+        EquipmentUsageHistory.objects.create(equipment=self.equipment, start_datetime=timezone.now())
+
+        with self.assertRaises(ValidationError):
+            checkout_equipments([self.equipment.pk], self.user)
+        self.assertEqual(self.equipment.usage_history.filter(end_datetime__isnull=True).count(), 1)
+
+
+class EquipmentStatsRefreshTests(TestCase):
+    def test_late_payment_for_an_old_reservation_is_counted_by_the_incremental_refresh(self):
+        user = User.objects.create_user(username="client", password="x")
+        equipment = Equipment.objects.create(name="Caméra")
+        start = timezone.now() - timedelta(days=10)
+        reservation = Reservation.objects.create(
+            user=user,
+            status=ReservationStatus.COMPLETED,
+            start_datetime=start,
+            end_datetime=start + timedelta(hours=2),
+        )
+        reservation.equipments.add(equipment)
+        call_command("refresh_equipment_stats", "--full", stdout=StringIO())
+
+        Payment.objects.create(
+            user=user, reservation=reservation, amount=Decimal("50000"),
+            method=PaymentMethod.ORANGE_MONEY, status=PaymentStatus.PAID,
+        )
+        call_command("refresh_equipment_stats", stdout=StringIO())
+
+        stat = EquipmentDailyStat.objects.get(equipment=equipment, day=timezone.localdate(start))
+        self.assertEqual((stat.reservations_count, stat.revenue), (1, Decimal("50000.00")))
+
+
+class SlotSuggestionTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="client", password="x")
+        self.studio = Studio.objects.create(name="Studio A", opening_hours="09h00 - 17h30")
+        self.tz = timezone.get_current_timezone()
+        # Un mercredi assez lointain pour que la fenêtre de recherche ne touche pas le passé
+        day = timezone.localdate() + timedelta(days=30)
+        self.wednesday = day + timedelta(days=(2 - day.weekday()) % 7)
+
+    def _at(self, hour, minute=0, days=0):
+        return timezone.make_aware(datetime.combine(self.wednesday + timedelta(days=days), time(hour, minute)), self.tz)
+
+    def _request(self, start, hours, studio="default", **kwargs):
+        return Reservation.objects.create(
+            user=self.user,
+            studio=self.studio if studio == "default" else studio,
+            start_datetime=start,
+            end_datetime=start + timedelta(hours=hours),
+            **kwargs,
+        )
+
+    def _busy(self, start, end, studio=None):
+        Reservation.objects.create(
+            user=self.user, studio=studio or self.studio, status=ReservationStatus.CONFIRMED,
+            start_datetime=start, end_datetime=end,
+        )
+
+    def test_merges_overlapping_busy_intervals(self):
+        self.assertEqual(
+            _merge_intervals([(16, 17), (10, 12), (11, 14), (14, 15)]),
+            [(10, 15), (16, 17)],
+        )
+
+        self._busy(self._at(10), self._at(12))
+        self._busy(self._at(11), self._at(14))
+        reservation = self._request(self._at(11), 2, preferred_date_1=self._at(11))
+
+        best = suggest_free_slots(reservation)[0]
+        # 9h-10h trop court, puis libre à partir de 14h seulement
+        self.assertEqual((best["studio"], best["start"], best["end"]), (self.studio, self._at(14), self._at(16)))
+        self.assertTrue(best["is_requested_studio"])
+
+    def test_slots_stay_within_opening_hours(self):
+        early = suggest_free_slots(self._request(self._at(7), 2))[0]
+        self.assertEqual(early["start"], self._at(9))
+
+        late = suggest_free_slots(self._request(self._at(16, 30), 2))[0]
+        self.assertEqual((late["start"], late["end"]), (self._at(15, 30), self._at(17, 30)))
+
+        # 9 h demandées pour 8 h 30 d'ouverture : aucun créneau
+        self.assertEqual(suggest_free_slots(self._request(self._at(9), 9)), [])
+
+        self.assertEqual(_parse_opening_hours("sur rendez-vous"), (time(8), time(20)))
+
+    def test_preferred_period_filters_days(self):
+        request = self._request(self._at(10), 2, preferred_period=PreferredPeriodChoices.WEEKEND)
+        weekend = suggest_free_slots(request)
+        self.assertTrue(weekend)
+        self.assertTrue(all(timezone.localtime(s["start"]).weekday() >= 5 for s in weekend))
+        # Dimanche précédent et samedi suivant : à trois jours du mercredi souhaité
+        self.assertEqual(
+            {s["start"] for s in weekend[:2]},
+            {self._at(10, days=-3), self._at(10, days=3)},
+        )
+
+        request.preferred_period = PreferredPeriodChoices.WEEKDAY
+        weekday = suggest_free_slots(request)
+        self.assertEqual(weekday[0]["start"], self._at(10))
+        self.assertTrue(all(timezone.localtime(s["start"]).weekday() < 5 for s in weekday))
+
+    def test_without_studio_searches_every_available_studio(self):
+        other = Studio.objects.create(name="Studio B")
+        Studio.objects.create(name="Studio masqué", is_active=False)
+        Studio.objects.create(name="Studio en travaux", status=StudioStatusChoices.MAINTENANCE)
+        self._busy(self._at(9), self._at(17, 30))  # Studio A complet le jour souhaité
+
+        suggestions = suggest_free_slots(self._request(self._at(10), 2, studio=None))
+
+        self.assertEqual((suggestions[0]["studio"], suggestions[0]["start"]), (other, self._at(10)))
+        self.assertEqual({s["studio"] for s in suggestions}, {self.studio, other})
+        self.assertFalse(any(s["is_requested_studio"] for s in suggestions))
+
+
+class EquipmentScanTests(TestCase):
+    def setUp(self):
+        self.camera = Equipment.objects.create(name="Caméra", serial_number="CAM-001")
+        self.tripod = Equipment.objects.create(name="Trépied", serial_number="TRI-001")
+
+    def test_parse_scan_code(self):
+        self.assertEqual(parse_scan_code(" EQ:12 "), ("id", 12))
+        self.assertEqual(parse_scan_code("eq: 7"), ("id", 7))
+        self.assertEqual(parse_scan_code("SN: CAM-001"), ("serial", "CAM-001"))
+        self.assertEqual(parse_scan_code("https://oloustream.com/dashboard/equipments/42/"), ("id", 42))
+        self.assertEqual(parse_scan_code("/dashboard/equipments/42"), ("id", 42))
+        self.assertEqual(parse_scan_code("https://oloustream.com/contact/"), ("serial", "https://oloustream.com/contact/"))
+        self.assertEqual(parse_scan_code("EQ:abc"), ("serial", "EQ:abc"))
+        self.assertEqual(parse_scan_code("CAM-001"), ("serial", "CAM-001"))
+
+    def test_lookup_keeps_the_order_of_codes_in_one_query(self):
+        codes = ["TRI-001", f"EQ:{self.camera.pk}", "INCONNU", f"/equipments/{self.tripod.pk}/", "SN:CAM-001"]
+        with self.assertNumQueries(1):
+            results = lookup_equipments_by_codes(codes)
+
+        self.assertEqual(
+            results,
+            [("TRI-001", self.tripod), (codes[1], self.camera), ("INCONNU", None), (codes[3], self.tripod), ("SN:CAM-001", self.camera)],
+        )
+        with self.assertNumQueries(0):
+            self.assertEqual(lookup_equipments_by_codes(["SN:"]), [("SN:", None)])
+
+    def test_scan_view(self):
+        staff = User.objects.create_user(username="admin", password="x", is_staff=True)
+        self.client.force_login(staff)
+        url = reverse("dashboard:equipments_scan")
+
+        data = self.client.get(url, {"code": ["CAM-001", "INCONNU"]}).json()
+        self.assertEqual((data["count"], data["found"]), (2, 1))
+        self.assertEqual(
+            [(r["code"], r["found"], r.get("id")) for r in data["results"]],
+            [("CAM-001", True, self.camera.pk), ("INCONNU", False, None)],
+        )
+
+        response = self.client.post(
+            url, json.dumps({"codes": [f"EQ:{self.tripod.pk}"]}), content_type="application/json",
+        )
+        self.assertEqual(response.json()["results"][0]["name"], "Trépied")
+
+        too_many = self.client.post(
+            url, json.dumps({"codes": [f"SN-{i}" for i in range(SCAN_MAX_CODES + 1)]}), content_type="application/json",
+        )
+        self.assertEqual(too_many.status_code, 400)
+        self.assertEqual(self.client.get(url).status_code, 400)
+        self.assertEqual(self.client.post(url, "pas du json", content_type="application/json").status_code, 400)
+
+
+class MaintenanceTests(TestCase):
+    today = date(2026, 3, 15)
+
+    def test_digest_is_grouped_per_staff_member(self):
+        holder = User.objects.create_user(username="tech", email="tech@example.com", password="x", is_staff=True)
+        other = User.objects.create_user(username="admin", email="admin@example.com", password="x", is_staff=True)
+        User.objects.create_user(username="ancien", email="old@example.com", password="x", is_staff=True, is_active=False)
+        client = User.objects.create_user(username="client", email="client@example.com", password="x")
+
+        Equipment.objects.create(name="Caméra", next_maintenance_date=self.today - timedelta(days=2), current_user=holder)
+        Equipment.objects.create(name="Micro", next_maintenance_date=self.today + timedelta(days=3))
+        Equipment.objects.create(name="Projecteur", next_maintenance_date=self.today + timedelta(days=7), current_user=client)
+        Equipment.objects.create(name="Trépied", next_maintenance_date=self.today + timedelta(days=8))
+        Equipment.objects.create(name="Vieux micro", next_maintenance_date=self.today, status=EquipmentStatus.RETIRED)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(send_maintenance_digests(today=self.today), (3, 2))
+
+        digests = {n.user: n for n in Notification.objects.all()}
+        self.assertEqual(set(digests), {holder, other})
+        self.assertEqual(digests[holder].title, "Maintenance : 3 équipement(s) à prévoir, dont 1 en retard")
+        self.assertEqual(
+            digests[holder].message.splitlines(),
+            ["- Caméra : 13/03/2026 (en retard)", "- Micro : 18/03/2026", "- Projecteur : 22/03/2026"],
+        )
+        self.assertEqual(digests[other].title, "Maintenance : 2 équipement(s) à prévoir, dont 0 en retard")
+
+        emails = {tuple(e.to): e for e in OutboxEmail.objects.all()}
+        self.assertEqual(set(emails), {("tech@example.com",), ("admin@example.com",)})
+        self.assertIn("- Caméra : 13/03/2026 (en retard)", emails[("tech@example.com",)].body)
+
+    def test_maintenance_annotations_around_threshold_dates(self):
+        cases = {
+            "due-today": {"next_maintenance_date": self.today},
+            "due-tomorrow": {"next_maintenance_date": self.today + timedelta(days=1)},
+            "bought-anniversary": {"purchase_date": date(2020, 3, 15)},
+            "bought-day-after": {"purchase_date": date(2020, 3, 16)},
+            "bought-leap-day": {"purchase_date": date(2024, 2, 29)},
+            "bought-last-year": {"purchase_date": date(2025, 3, 16)},
+            "bought-later": {"purchase_date": date(2026, 4, 1)},
+            "no-dates": {},
+        }
+        for name, fields in cases.items():
+            Equipment.objects.create(name=name, **fields)
 
-# Create your tests here.
+        annotated = {
+            e.name: (e.maintenance_due, e.age_in_years)
+            for e in Equipment.objects.with_maintenance_info(today=self.today)
+        }
+        self.assertEqual(annotated, {
+            "due-today": (True, None),
+            "due-tomorrow": (False, None),
+            "bought-anniversary": (False, 6),
+            "bought-day-after": (False, 5),
+            "bought-leap-day": (False, 2),
+            "bought-last-year": (False, 0),
+            "bought-later": (False, 0),
+            "no-dates": (False, None),
+        })
@@ -3,6 +3,7 @@ from django.contrib import messages
 from django.contrib.auth.decorators import login_required
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.admin.views.decorators import staff_member_required
+from django.db import transaction
 
 from .forms import (
     ReservationCreateForm,
@@ -140,22 +141,24 @@ def user_project_reservation_create_view(request, studio_pk=None):
     if request.method == "POST":
         form = ProjectReservationForm(request.POST, studio=studio)
         if form.is_valid():
-            reservation = form.save(commit=False)
-            reservation.user = request.user
-            reservation.status = ReservationStatus.PENDING
-            reservation.save()
-
-            log_reservation_status_change(
-                reservation=reservation,
-                old_status=ReservationStatus.PENDING,
-                new_status=ReservationStatus.PENDING,
-                changed_by=request.user,
-                note="Création de la réservation via formulaire projet.",
-                force=True,
-            )
-
-            notify_admins_new_reservation(reservation)
-            send_reservation_received_email(request, reservation)
+            # L'email de confirmation est mis en file dans la même transaction
+            with transaction.atomic():
+                reservation = form.save(commit=False)
+                reservation.user = request.user
+                reservation.status = ReservationStatus.PENDING
+                reservation.save()
+
+                log_reservation_status_change(
+                    reservation=reservation,
+                    old_status=ReservationStatus.PENDING,
+                    new_status=ReservationStatus.PENDING,
+                    changed_by=request.user,
+                    note="Création de la réservation via formulaire projet.",
+                    force=True,
+                )
+
+                notify_admins_new_reservation(reservation)
+                send_reservation_received_email(request, reservation)
 
             messages.success(
                 request,
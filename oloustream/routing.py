@@ -1,5 +1,7 @@
 from apps.messaging import routing as messaging_routing
+from apps.notifications import routing as notifications_routing
 
 websocket_urlpatterns = [
     *messaging_routing.websocket_urlpatterns,
-]
\ No newline at end of file
+    *notifications_routing.websocket_urlpatterns,
+]
@@ -131,6 +131,21 @@ STATIC_ROOT = BASE_DIR / "staticfiles"
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / "media"
 
+# Service des médias par Django (apps.core.media) :
+# - None     : Django envoie le fichier lui-même (Range / 206 gérés)
+# - "nginx"  : délégation via X-Accel-Redirect vers MEDIA_ACCEL_REDIRECT_PREFIX
+#              (location nginx "internal" pointant sur MEDIA_ROOT)
+# - "apache" : délégation via X-Sendfile (mod_xsendfile)
+MEDIA_SENDFILE_BACKEND = os.environ.get("MEDIA_SENDFILE_BACKEND") or None
+MEDIA_ACCEL_REDIRECT_PREFIX = '/internal-media/'
+MEDIA_CACHE_MAX_AGE = 7 * 24 * 3600
+
+# Documents privés (contrats, pièces d'identité, CV, reçus) : hors MEDIA_ROOT,
+# servis uniquement par apps.core (contrôle d'accès puis X-Accel-Redirect / X-Sendfile).
+PRIVATE_MEDIA_ROOT = BASE_DIR / "private_media"
+PRIVATE_MEDIA_URL = '/documents/fichiers/'
+PRIVATE_MEDIA_ACCEL_REDIRECT_PREFIX = '/internal-private-media/'
+
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 REST_FRAMEWORK = {
@@ -170,11 +185,30 @@ DEFAULT_FROM_EMAIL = DEFAULT_FROM_EMAIL
 # CHANNELS
 # =========================
 
-CHANNEL_LAYERS = {
-    'default': {
-        'BACKEND': 'channels.layers.InMemoryChannelLayer',
-    },
-}
+# Un seul processus ASGI : couche en mémoire.
+# Plusieurs workers sur la même machine : CHANNEL_HUB_SOCKET pointe sur la socket
+# du hub (commande run_channel_hub, à lancer avant les workers).
+CHANNEL_HUB_SOCKET = os.environ.get("CHANNEL_HUB_SOCKET") or None
+
+if CHANNEL_HUB_SOCKET:
+    CHANNEL_LAYERS = {
+        'default': {
+            'BACKEND': 'apps.core.channel_layers.HubChannelLayer',
+            'CONFIG': {
+                'path': CHANNEL_HUB_SOCKET,
+            },
+        },
+    }
+else:
+    CHANNEL_LAYERS = {
+        'default': {
+            'BACKEND': 'channels.layers.InMemoryChannelLayer',
+        },
+    }
+
+# Chat WebSocket : diffusion immédiate, messages écrits en base par lots
+# (apps.messaging.write_behind) au lieu d'une écriture par message.
+CHAT_WRITE_BEHIND = os.environ.get("CHAT_WRITE_BEHIND") == "1"
 
 LOGIN_URL = 'accounts:login'
 LOGIN_REDIRECT_URL = 'core:home'
@@ -185,4 +219,21 @@ LOGOUT_REDIRECT_URL = 'core:home'
 ADMIN_EMAIL = 'info@oloustream.com'  # À adapter
 
 # URL du site (pour les emails)
-SITE_URL = 'https://oloustream.com'  # Ou http://localhost:8000 en dev
\ No newline at end of file
+SITE_URL = 'https://oloustream.com'  # Ou http://localhost:8000 en dev
+
+# =========================
+# NOTIFICATIONS (rétention)
+# =========================
+
+# Durée de conservation (jours) des notifications LUES, par type ; None = conserver.
+# Purge : python manage.py purge_notifications (à lancer via cron).
+NOTIFICATION_RETENTION_DAYS = {
+    'GENERAL': 180,
+    'RESERVATION_CREATED': 90,
+    'RESERVATION_STATUS_CHANGED': 180,
+    'MESSAGE_RECEIVED': 30,
+    'PAYMENT_STATUS': 365,
+    'SYSTEM': 60,
+}
+# Copier les notifications purgées dans la table d'archive compacte (NotificationArchive)
+NOTIFICATION_ARCHIVE_ON_PURGE = True
@@ -15,12 +15,15 @@ Including another URLconf
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
 
+import re
+
 from django.contrib import admin
-from django.urls import path, include
+from django.urls import path, include, re_path
 from django.conf import settings
-from django.conf.urls.static import static
 from django.contrib.auth import views as auth_views
 
+from apps.core.views import media_view
+
 urlpatterns = [
     path('admin/', admin.site.urls),
 
@@ -66,5 +69,11 @@ urlpatterns = [
     path('partenaires/', include('apps.business_partners.urls')),
 ]
 
-if settings.DEBUG:
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+# Médias : Range / ETag / cache, et X-Accel-Redirect / X-Sendfile en production
+urlpatterns += [
+    re_path(
+        r'^%s(?P<path>.+)$' % re.escape(settings.MEDIA_URL.lstrip('/')),
+        media_view,
+        name='media',
+    ),
+]